@@ -10,17 +10,9 @@ from gym import spaces
 from luxai2021.env.agent import Agent, AgentWithModel
 from luxai2021.game.actions import *
 from luxai2021.game.game_constants import GAME_CONSTANTS
-from luxai2021.game.position import Position
+from luxai2021.game.spatial_index import SpatialIndex
 
 
-# https://codereview.stackexchange.com/questions/28207/finding-the-closest-point-to-a-list-of-points
-def closest_node(node, nodes):
-    dist_2 = np.sum((nodes - node) ** 2, axis=1)
-    return np.argmin(dist_2)
-def furthest_node(node, nodes):
-    dist_2 = np.sum((nodes - node) ** 2, axis=1)
-    return np.argmax(dist_2)
-
 def smart_transfer_to_nearby(game, team, unit_id, unit, target_type_restriction=None, **kwarg):
     """
     Smart-transfers from the specified unit to a nearby neighbor. Prioritizes any
@@ -174,7 +166,6 @@ class AgentPolicy(AgentWithModel):
         self.observation_space = spaces.Box(low=0, high=1, shape=
         self.observation_shape, dtype=np.float16)
 
-        self.object_nodes = {}
 
     def get_agent_type(self):
         """
@@ -189,63 +180,6 @@ class AgentPolicy(AgentWithModel):
         """
         Implements getting a observation from the current game for this unit or city
         """
-        observation_index = 0
-        if is_new_turn:
-            # It's a new turn this event. This flag is set True for only the first observation from each turn.
-            # Update any per-turn fixed observation space that doesn't change per unit/city controlled.
-
-            # Build a list of object nodes by type for quick distance-searches
-            self.object_nodes = {}
-
-            # Add resources
-            for cell in game.map.resources:
-                if cell.resource.type not in self.object_nodes:
-                    self.object_nodes[cell.resource.type] = np.array([[cell.pos.x, cell.pos.y]])
-                else:
-                    self.object_nodes[cell.resource.type] = np.concatenate(
-                        (
-                            self.object_nodes[cell.resource.type],
-                            [[cell.pos.x, cell.pos.y]]
-                        ),
-                        axis=0
-                    )
-
-            # Add your own and opponent units
-            for t in [team, (team + 1) % 2]:
-                for u in game.state["teamStates"][team]["units"].values():
-                    key = str(u.type)
-                    if t != team:
-                        key = str(u.type) + "_opponent"
-
-                    if key not in self.object_nodes:
-                        self.object_nodes[key] = np.array([[u.pos.x, u.pos.y]])
-                    else:
-                        self.object_nodes[key] = np.concatenate(
-                            (
-                                self.object_nodes[key],
-                                [[u.pos.x, u.pos.y]]
-                            )
-                            , axis=0
-                        )
-
-            # Add your own and opponent cities
-            for city in game.cities.values():
-                for cells in city.city_cells:
-                    key = "city"
-                    if city.team != team:
-                        key = "city_opponent"
-
-                    if key not in self.object_nodes:
-                        self.object_nodes[key] = np.array([[cells.pos.x, cells.pos.y]])
-                    else:
-                        self.object_nodes[key] = np.concatenate(
-                            (
-                                self.object_nodes[key],
-                                [[cells.pos.x, cells.pos.y]]
-                            )
-                            , axis=0
-                        )
-
         # Observation space: (Basic minimum for a miner agent)
         # Object:
         #   1x is worker
@@ -312,75 +246,67 @@ class AgentPolicy(AgentWithModel):
             # Encode the direction to the nearest objects
             #   5x direction_nearest
             #   1x distance
-            for distance_function in [closest_node, furthest_node]:
-                for key in [
-                    Constants.RESOURCE_TYPES.WOOD,
-                    Constants.RESOURCE_TYPES.COAL,
-                    Constants.RESOURCE_TYPES.URANIUM,
-                    "city",
-                    str(Constants.UNIT_TYPES.WORKER)]:
+            # The spatial index is built once per turn by the game and shared by all units and city tiles
+            spatial_index = game.get_spatial_index()
+            for find_furthest in [False, True]:
+                for object_type, object_team in [
+                    (Constants.RESOURCE_TYPES.WOOD, None),
+                    (Constants.RESOURCE_TYPES.COAL, None),
+                    (Constants.RESOURCE_TYPES.URANIUM, None),
+                    (SpatialIndex.CITY_TILE, team),
+                    (Constants.UNIT_TYPES.WORKER, team)]:
                     # Process the direction to and distance to this object type
 
                     # Encode the direction to the nearest object (excluding itself)
                     #   5x direction
                     #   1x distance
-                    if key in self.object_nodes:
-                        if (
-                                (key == "city" and city_tile is not None) or
-                                (unit is not None and str(unit.type) == key and len(game.map.get_cell_by_pos(unit.pos).units) <= 1 )
-                        ):
-                            # Filter out the current unit from the closest-search
-                            closest_index = closest_node((pos.x, pos.y), self.object_nodes[key])
-                            filtered_nodes = np.delete(self.object_nodes[key], closest_index, axis=0)
+                    if spatial_index.count(object_type, object_team) > 0:
+                        # Filter out the current unit or city tile from the search
+                        exclude = unit if unit is not None else city_tile
+                        if find_furthest:
+                            found = spatial_index.furthest(pos, object_type, object_team, exclude=exclude)
                         else:
-                            filtered_nodes = self.object_nodes[key]
+                            found = next(iter(spatial_index.nearest(pos, object_type, object_team, exclude=exclude)), None)
 
-                        if len(filtered_nodes) == 0:
+                        if found is None:
                             # No other object of this type
                             obs[observation_index + 5] = 1.0
                         else:
                             # There is another object of this type
-                            closest_index = distance_function((pos.x, pos.y), filtered_nodes)
-
-                            if closest_index is not None and closest_index >= 0:
-                                closest = filtered_nodes[closest_index]
-                                closest_position = Position(closest[0], closest[1])
-                                direction = pos.direction_to(closest_position)
-                                mapping = {
-                                    Constants.DIRECTIONS.CENTER: 0,
-                                    Constants.DIRECTIONS.NORTH: 1,
-                                    Constants.DIRECTIONS.WEST: 2,
-                                    Constants.DIRECTIONS.SOUTH: 3,
-                                    Constants.DIRECTIONS.EAST: 4,
-                                }
-                                obs[observation_index + mapping[direction]] = 1.0  # One-hot encoding direction
-
-                                # 0 to 1 distance
-                                distance = pos.distance_to(closest_position)
-                                obs[observation_index + 5] = min(distance / 20.0, 1.0)
-
-                                # 0 to 1 value (amount of resource, cargo for unit, or fuel for city)
-                                if key == "city":
-                                    # City fuel as % of upkeep for 200 turns
-                                    c = game.cities[game.map.get_cell_by_pos(closest_position).city_tile.city_id]
-                                    obs[observation_index + 6] = min(
-                                        c.fuel / (c.get_light_upkeep() * 200.0),
-                                        1.0
-                                    )
-                                elif key in [Constants.RESOURCE_TYPES.WOOD, Constants.RESOURCE_TYPES.COAL,
-                                             Constants.RESOURCE_TYPES.URANIUM]:
-                                    # Resource amount
-                                    obs[observation_index + 6] = min(
-                                        game.map.get_cell_by_pos(closest_position).resource.amount / 500,
-                                        1.0
-                                    )
-                                else:
-                                    # Unit cargo
-                                    obs[observation_index + 6] = min(
-                                        next(iter(game.map.get_cell_by_pos(
-                                            closest_position).units.values())).get_cargo_space_left() / 100,
-                                        1.0
-                                    )
+                            distance, closest = found
+                            direction = pos.direction_to(closest.pos)
+                            mapping = {
+                                Constants.DIRECTIONS.CENTER: 0,
+                                Constants.DIRECTIONS.NORTH: 1,
+                                Constants.DIRECTIONS.WEST: 2,
+                                Constants.DIRECTIONS.SOUTH: 3,
+                                Constants.DIRECTIONS.EAST: 4,
+                            }
+                            obs[observation_index + mapping[direction]] = 1.0  # One-hot encoding direction
+
+                            # 0 to 1 distance
+                            obs[observation_index + 5] = min(distance / 20.0, 1.0)
+
+                            # 0 to 1 value (amount of resource, cargo for unit, or fuel for city)
+                            if object_type == SpatialIndex.CITY_TILE:
+                                # City fuel as % of upkeep for 200 turns
+                                c = game.cities[closest.city_id]
+                                obs[observation_index + 6] = min(
+                                    c.fuel / (c.get_light_upkeep() * 200.0),
+                                    1.0
+                                )
+                            elif object_team is None:
+                                # Resource amount
+                                obs[observation_index + 6] = min(
+                                    closest.resource.amount / 500,
+                                    1.0
+                                )
+                            else:
+                                # Unit cargo
+                                obs[observation_index + 6] = min(
+                                    closest.get_cargo_space_left() / 100,
+                                    1.0
+                                )
 
                     observation_index += 7
 
@@ -407,11 +333,10 @@ class AgentPolicy(AgentWithModel):
         #   2x worker counts [cur player, opponent]
         #   2x cart counts [cur player, opponent]
         max_count = 30
-        for key in ["city", str(Constants.UNIT_TYPES.WORKER), str(Constants.UNIT_TYPES.CART)]:
-            if key in self.object_nodes:
-                obs[observation_index] = len(self.object_nodes[key]) / max_count
-            if (key + "_opponent") in self.object_nodes:
-                obs[observation_index + 1] = len(self.object_nodes[(key + "_opponent")]) / max_count
+        spatial_index = game.get_spatial_index()
+        for object_type in [SpatialIndex.CITY_TILE, Constants.UNIT_TYPES.WORKER, Constants.UNIT_TYPES.CART]:
+            obs[observation_index] = spatial_index.count(object_type, team) / max_count
+            obs[observation_index + 1] = spatial_index.count(object_type, (team + 1) % 2) / max_count
             observation_index += 2
 
         #   1x research points [cur player]
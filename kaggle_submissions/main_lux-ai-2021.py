@@ -28,6 +28,11 @@ if __name__ == "__main__":
     # Create a RL agent in inference mode
     player = AgentPolicy(mode="inference", model=model)
 
+    # Inference the model once per turn for all units, and fall back to default actions instead of going over the
+    # 1 second turn limit
+    player.batched_inference = True
+    player.turn_time_budget = 0.8
+
     # Run the environment
     env = LuxEnvironment(configs, player, opponent)
     env.reset()  # This will automatically run the game since there is
@@ -4,6 +4,7 @@ import time
 import numpy as np
 from gym import spaces
 from ..game.constants import Constants
+from ..game.replay_index import IndexedReplay
 
 """
 Implements the base class for a training Agent
@@ -93,6 +94,7 @@ class AgentFromReplay(Agent):
     def __init__(self, replay=None) -> None:
         """
         Implements an agent opponent
+        :param replay: Kaggle replay JSON data, or an IndexedReplay.
         """
         super().__init__()
         self.replay = replay
@@ -113,7 +115,11 @@ class AgentFromReplay(Agent):
         actions = []
         turn = game.state["turn"]
 
-        if self.replay is not None:
+        if isinstance(self.replay, IndexedReplay):
+            acts = self.replay.get_commands(turn, team)
+            acts = [game.action_from_string(a, team) for a in acts]
+            actions.extend([a for a in acts if a is not None])
+        elif self.replay is not None:
             acts = self.replay['steps'][turn+1][team]["action"]
             acts = [game.action_from_string(a, team) for a in acts]
             acts = [a for a in acts if a is not None]
@@ -127,9 +133,15 @@ class AgentWithModel(Agent):
     """
     Base class for a stable_baselines3 reinforcement learning agent.
     """
-    def __init__(self, mode="train", model=None) -> None:
+    def __init__(self, mode="train", model=None, batched_inference=False, turn_time_budget=None) -> None:
         """
         Implements an agent opponent
+        :param mode: "train" for a learning agent, or "inference".
+        :param model: Model to inference.
+        :param batched_inference: Inference the model once per turn on the stacked observations of all units and
+            city tiles, instead of once per unit and city tile.
+        :param turn_time_budget: Optional time budget in seconds for computing the actions of a turn. Once the
+            budget is about to run out, the remaining units and city tiles get get_default_action().
         """
         super().__init__()
         self.action_space = spaces.Discrete(10)
@@ -137,6 +149,9 @@ class AgentWithModel(Agent):
 
         self.model = model
         self.mode = mode
+        self.batched_inference = batched_inference
+        self.turn_time_budget = turn_time_budget
+        self.last_predict_time = 0.0
     
     def get_agent_type(self):
         """
@@ -160,6 +175,51 @@ class AgentWithModel(Agent):
         """
         return np.zeros((10,1))
 
+    def get_default_action(self, game, unit, city_tile, team):
+        """
+        Cheap action for a unit or city tile that is used when the turn time budget runs out. Defaults to
+        doing nothing.
+        Returns: An action, or None.
+        """
+        return None
+
+    def get_action_code(self, action, game, unit=None, city_tile=None, team=None):
+        """
+        Inverse of action_code_to_action(), used to label replayed actions for imitation learning. Defaults to the
+        action code whose action has the same command message, or else the same command, actor and target, eg. a
+        transfer to the same unit of another amount.
+        Returns: The action code, or None if no action code matches.
+        """
+        message = action.to_message(game)
+        key = message.split(" ")[:3]
+        code_for_key = None
+        for action_code in range(self.action_space.n):
+            candidate = self.action_code_to_action(action_code, game, unit=unit, city_tile=city_tile, team=team)
+            if candidate is None:
+                continue
+            candidate_message = candidate.to_message(game)
+            if candidate_message == message:
+                return action_code
+            if code_for_key is None and candidate_message.split(" ")[:3] == key:
+                code_for_key = action_code
+        return code_for_key
+
+    def get_turn_decisions(self, game, team):
+        """
+        Returns: List of (unit, city_tile) of the units and city tiles that can act this turn, units first.
+        """
+        decisions = []
+        for unit in game.state["teamStates"][team]["units"].values():
+            if unit.can_act():
+                decisions.append((unit, None))
+
+        for city in game.cities.values():
+            if city.team == team:
+                for cell in city.city_cells:
+                    if cell.city_tile.can_act():
+                        decisions.append((None, cell.city_tile))
+        return decisions
+
     def process_turn(self, game, team):
         """
         Decides on a set of actions for the current turn. Not used in training, only inference. Generally
@@ -167,44 +227,95 @@ class AgentWithModel(Agent):
         Returns: Array of actions to perform.
         """
         start_time = time.time()
-        actions = []
-        new_turn = True
-
-        # Inference the model per-unit
-        units = game.state["teamStates"][team]["units"].values()
-        for unit in units:
-            if unit.can_act():
-                obs = self.get_observation(game, unit, None, unit.team, new_turn)
-                # IMPORTANT: You can change deterministic=True to disable randomness in model inference. Generally,
-                # I've found the agents get stuck sometimes if they are fully deterministic.
-                action_code, _states = self.model.predict(obs, deterministic=False)
-                if action_code is not None:
-                    actions.append(
-                        self.action_code_to_action(action_code, game=game, unit=unit, city_tile=None, team=unit.team))
-                new_turn = False
-
-        # Inference the model per-city
-        cities = game.cities.values()
-        for city in cities:
-            if city.team == team:
-                for cell in city.city_cells:
-                    city_tile = cell.city_tile
-                    if city_tile.can_act():
-                        obs = self.get_observation(game, None, city_tile, city.team, new_turn)
-                        # IMPORTANT: You can change deterministic=True to disable randomness in model inference. Generally,
-                        # I've found the agents get stuck sometimes if they are fully deterministic.
-                        action_code, _states = self.model.predict(obs, deterministic=False)
-                        if action_code is not None:
-                            actions.append(
-                                self.action_code_to_action(action_code, game=game, unit=None, city_tile=city_tile,
-                                                           team=city.team))
-                        new_turn = False
+        decisions = self.get_turn_decisions(game, team)
+        if self.batched_inference:
+            actions = self._process_turn_batched(game, team, decisions, start_time)
+        else:
+            actions = self._process_turn_per_unit(game, team, decisions, start_time)
 
         time_taken = time.time() - start_time
         if time_taken > 0.5:  # Warn if larger than 0.5 seconds.
             print("WARNING: Inference took %.3f seconds for computing actions. Limit is 1 second." % time_taken,
                   file=sys.stderr)
 
+        return [action for action in actions if action is not None]
+
+    def _is_out_of_time(self, start_time, time_needed):
+        """
+        Returns: True if the turn time budget would run out within time_needed seconds.
+        """
+        if self.turn_time_budget is None:
+            return False
+        return time.time() - start_time + time_needed > self.turn_time_budget
+
+    def _process_turn_per_unit(self, game, team, decisions, start_time):
+        """
+        Inferences the model per-unit and per-city tile.
+        """
+        actions = []
+        new_turn = True
+        decision_time = 0.0
+        for i, (unit, city_tile) in enumerate(decisions):
+            actor_team = unit.team if unit is not None else city_tile.team
+            if self._is_out_of_time(start_time, decision_time):
+                actions.append(self.get_default_action(game, unit, city_tile, actor_team))
+                continue
+
+            decision_start_time = time.time()
+            obs = self.get_observation(game, unit, city_tile, actor_team, new_turn)
+            # IMPORTANT: You can change deterministic=True to disable randomness in model inference. Generally,
+            # I've found the agents get stuck sometimes if they are fully deterministic.
+            action_code, _states = self.model.predict(obs, deterministic=False)
+            if action_code is not None:
+                actions.append(
+                    self.action_code_to_action(action_code, game=game, unit=unit, city_tile=city_tile,
+                                               team=actor_team))
+            new_turn = False
+
+            # Slowest decision so far, to stop before the budget runs out
+            decision_time = max(decision_time, time.time() - decision_start_time)
+
+        return actions
+
+    def _process_turn_batched(self, game, team, decisions, start_time):
+        """
+        Inferences the model once on the stacked observations of all units and city tiles.
+        """
+        if len(decisions) == 0:
+            return []
+
+        observations = []
+        new_turn = True
+        observation_time = 0.0
+        for unit, city_tile in decisions:
+            # Keep enough time to inference the model on the observations
+            if self._is_out_of_time(start_time, observation_time + self.last_predict_time):
+                break
+
+            observation_start_time = time.time()
+            actor_team = unit.team if unit is not None else city_tile.team
+            observations.append(self.get_observation(game, unit, city_tile, actor_team, new_turn))
+            new_turn = False
+            observation_time = max(observation_time, time.time() - observation_start_time)
+
+        actions = []
+        if len(observations) > 0:
+            predict_start_time = time.time()
+            # IMPORTANT: You can change deterministic=True to disable randomness in model inference. Generally,
+            # I've found the agents get stuck sometimes if they are fully deterministic.
+            action_codes, _states = self.model.predict(np.stack(observations), deterministic=False)
+            self.last_predict_time = time.time() - predict_start_time
+
+            for (unit, city_tile), action_code in zip(decisions, action_codes):
+                actor_team = unit.team if unit is not None else city_tile.team
+                actions.append(self.action_code_to_action(action_code, game=game, unit=unit, city_tile=city_tile,
+                                                          team=actor_team))
+
+        # Units and city tiles that didn't fit in the time budget
+        for unit, city_tile in decisions[len(observations):]:
+            actor_team = unit.team if unit is not None else city_tile.team
+            actions.append(self.get_default_action(game, unit, city_tile, actor_team))
+
         return actions
 
 
@@ -212,13 +323,16 @@ class AgentFromStdInOut(Agent):
     """
     Wrapper for an external agent where this agent's commands are coming in through standard input.
     """
-    def __init__(self) -> None:
+    def __init__(self, in_place_updates=True) -> None:
         """
         Implements an agent opponent
+        :param in_place_updates: After the first turn, update the game in place from the observation with
+            Game.apply_updates(), instead of resetting it and building the map and units again each turn.
         """
         super().__init__()
         self.initialized_player = False
         self.initialized_map = False
+        self.in_place_updates = in_place_updates
 
     def pre_turn(self, game, is_first_turn=False):
         """
@@ -259,7 +373,10 @@ class AgentFromStdInOut(Agent):
                 break
         
         # Reset the game to the specified state. Don't increment turn counter on first turn of game.
-        game.reset(updates=updates, increment_turn=not is_first_turn)
+        if self.in_place_updates and not is_first_turn:
+            game.apply_updates(updates)
+        else:
+            game.reset(updates=updates, increment_turn=not is_first_turn)
 
     def post_turn(self, game, actions) -> bool:
         """
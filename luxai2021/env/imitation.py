@@ -0,0 +1,243 @@
+"""
+Imitation learning datasets built from replays. Replays are played through the game in a process pool, and every
+replayed action is recorded as the observation of an agent together with the agent's action code for it. Samples
+are written in shards of NumPy arrays, which are loaded memory-mapped.
+"""
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from ..game.constants import LuxMatchConfigs_Default
+from ..game.game import Game
+from ..game.match_controller import GameStepFailedException, MatchController
+from ..game.replay_index import IndexedReplay
+from .agent import AgentFromReplay
+
+# Name of the file that lists the shards of a dataset
+MANIFEST_FILENAME = "dataset.json"
+
+# Arrays stored for every sample
+ARRAY_NAMES = ["observations", "actions", "turns", "teams", "replays"]
+
+
+class _RecordingAgent(AgentFromReplay):
+    """
+    Replays the commands of a team, and records the observation and action code of the observing agent for each
+    replayed action before it is played, if the team is one of the recorded teams.
+    """
+    def __init__(self, replay, observer, samples, teams):
+        super().__init__(replay)
+        self.observer = observer
+        self.samples = samples
+        self.teams = teams
+        self.unmatched = 0
+
+    def game_start(self, game):
+        self.observer.set_team(self.team)
+        self.observer.game_start(game)
+
+    def process_turn(self, game, team):
+        actions = super().process_turn(game, team)
+        if team not in self.teams:
+            return actions
+
+        is_new_turn = True
+        for action in actions:
+            unit = None
+            city_tile = None
+            # Transfers are acted by their source unit
+            unit_id = getattr(action, "unit_id", None) or getattr(action, "source_id", None)
+            if unit_id is not None:
+                unit = game.state["teamStates"][team]["units"].get(unit_id)
+                if unit is None:
+                    continue
+            else:
+                cell = game.map.get_cell(action.x, action.y)
+                if cell is None or not cell.is_city_tile():
+                    continue
+                city_tile = cell.city_tile
+
+            action_code = self.observer.get_action_code(action, game, unit=unit, city_tile=city_tile, team=team)
+            if action_code is None:
+                self.unmatched += 1
+                continue
+            observation = self.observer.get_observation(game, unit, city_tile, team, is_new_turn)
+            self.samples.append((observation, action_code, game.state["turn"], team))
+            is_new_turn = False
+        return actions
+
+
+def _load_replay(path):
+    if path.endswith(".json"):
+        with open(path, "r") as f:
+            replay = json.load(f)
+        return replay, replay["configuration"]["seed"]
+    replay = IndexedReplay(path)
+    return replay, replay.seed
+
+
+def replay_samples(path, observer, configs=None, teams=(0, 1)):
+    """
+    Plays a replay and records the samples of the replayed actions.
+    :param path: Path of a Kaggle replay JSON file, or of an indexed replay written by convert_replay().
+    :param observer: AgentWithModel whose get_observation() and get_action_code() make the samples.
+    :param configs: Game configs, the seed is taken from the replay.
+    :param teams: Teams whose actions are recorded.
+    :return: Tuple of the list of (observation, action code, turn, team) samples, the number of replayed actions
+        without an action code, and whether the replay failed to play.
+    """
+    replay, seed = _load_replay(path)
+    try:
+        game_configs = dict(LuxMatchConfigs_Default)
+        if configs is not None:
+            game_configs.update(configs)
+        game_configs["seed"] = seed
+
+        samples = []
+        agents = [_RecordingAgent(replay, observer, samples, teams) for _ in range(2)]
+        controller = MatchController(Game(game_configs), agents)
+        # The controller shuffles the teams of the agents, play the teams in the order of the replay
+        for team, agent in enumerate(agents):
+            agent.set_team(team)
+        controller.reset(randomize_team_order=False)
+        failed = False
+        try:
+            for _ in controller.run_to_next_observation():
+                pass
+        except GameStepFailedException:
+            failed = True
+        return samples, sum(agent.unmatched for agent in agents), failed
+    finally:
+        if isinstance(replay, IndexedReplay):
+            replay.close()
+
+
+def _write_shard(directory, index, samples, observation_dtype):
+    arrays = {
+        "observations": np.stack([np.asarray(s[0], dtype=observation_dtype) for s in samples]),
+        "actions": np.array([s[1] for s in samples], dtype=np.int32),
+        "turns": np.array([s[2] for s in samples], dtype=np.int16),
+        "teams": np.array([s[3] for s in samples], dtype=np.int8),
+        "replays": np.array([s[4] for s in samples], dtype=np.int32),
+    }
+    prefix = "shard_%05i" % index
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, "%s.%s.npy" % (prefix, name)), array)
+    return {"prefix": prefix, "samples": len(samples)}
+
+
+# Observing agent of each worker process
+_worker_observer = None
+
+
+def _init_worker(agent_factory):
+    global _worker_observer
+    _worker_observer = agent_factory()
+
+
+def _run_worker_replay(task):
+    path, configs, teams = task
+    return replay_samples(path, _worker_observer, configs, teams)
+
+
+def build_dataset(replay_paths, agent_factory, directory, processes=0, shard_size=100000, configs=None,
+                  teams=(0, 1)):
+    """
+    Builds an imitation learning dataset from replays. Replays are played in a process pool, and the samples are
+    written in the order of the replays, in shards of shard_size samples.
+    :param replay_paths: Paths of Kaggle replay JSON files, or of indexed replays written by convert_replay().
+    :param agent_factory: Function that creates the AgentWithModel that makes the samples, eg. the agent class.
+        Called once per process, so it must be picklable when processes > 0.
+    :param directory: Directory to write the shards and the manifest to.
+    :param processes: Number of worker processes, or 0 to play the replays in this process.
+    :param shard_size: Number of samples per shard.
+    :param configs: Game configs, the seed is taken from each replay.
+    :param teams: Teams whose actions are recorded.
+    :return: The manifest, also written to dataset.json in the directory.
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    observation_dtype = agent_factory().observation_space.dtype
+    tasks = [(path, configs, teams) for path in replay_paths]
+
+    manifest = {
+        "replays": list(replay_paths),
+        "failedReplays": [],
+        "unmatchedActions": 0,
+        "observationDtype": np.dtype(observation_dtype).name,
+        "shards": [],
+    }
+    buffer = []
+
+    def add_results(results):
+        for replay_index, (samples, unmatched, failed) in enumerate(results):
+            if failed:
+                manifest["failedReplays"].append(replay_index)
+            manifest["unmatchedActions"] += unmatched
+            for observation, action_code, turn, team in samples:
+                buffer.append((observation, action_code, turn, team, replay_index))
+                if len(buffer) == shard_size:
+                    manifest["shards"].append(_write_shard(directory, len(manifest["shards"]), buffer, observation_dtype))
+                    buffer.clear()
+
+    if processes > 0:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(agent_factory,)) as pool:
+            add_results(pool.imap(_run_worker_replay, tasks))
+    else:
+        observer = agent_factory()
+        add_results(replay_samples(path, observer, configs, teams) for path, configs, teams in tasks)
+
+    if len(buffer) > 0:
+        manifest["shards"].append(_write_shard(directory, len(manifest["shards"]), buffer, observation_dtype))
+
+    with open(os.path.join(directory, MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+class ImitationDataset:
+    """
+    Dataset written by build_dataset(). The shards are memory-mapped, so datasets larger than memory can be
+    sampled from.
+    """
+    def __init__(self, directory):
+        """
+
+        :param directory: Directory of the dataset.
+        """
+        with open(os.path.join(directory, MANIFEST_FILENAME), "r") as f:
+            self.manifest = json.load(f)
+
+        # List of dicts of array name to the memory-mapped array, one per shard
+        self.shards = [
+            {
+                name: np.load(os.path.join(directory, "%s.%s.npy" % (shard["prefix"], name)), mmap_mode="r")
+                for name in ARRAY_NAMES
+            }
+            for shard in self.manifest["shards"]
+        ]
+        self.shard_starts = np.cumsum([0] + [shard["samples"] for shard in self.manifest["shards"]])
+
+    def __len__(self):
+        return int(self.shard_starts[-1])
+
+    def __getitem__(self, index):
+        """
+        :param index: Sample index.
+        :return: Tuple of the observation and the action code of the sample.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("Sample %i is out of range of the %i samples of the dataset." % (index, len(self)))
+        shard_index = int(np.searchsorted(self.shard_starts, index, side="right")) - 1
+        shard = self.shards[shard_index]
+        i = index - self.shard_starts[shard_index]
+        return shard["observations"][i], int(shard["actions"][i])
+
+    def get_array(self, name):
+        """
+        Concatenates an array of all shards in memory.
+        :param name: One of "observations", "actions", "turns", "teams" or "replays".
+        """
+        return np.concatenate([shard[name] for shard in self.shards])
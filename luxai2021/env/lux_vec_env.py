@@ -0,0 +1,163 @@
+"""
+Implements a vectorized Lux environment, that steps the decisions of all units and city tiles of many games at once
+"""
+import numpy as np
+
+from ..game.constants import Constants
+from ..game.game import Game
+from ..game.match_controller import GameStepFailedException, MatchController
+
+
+class LuxVecEnv:
+    """
+    Runs several games, and batches the decisions for every unit and city tile of the learning agent that can act
+    this turn, in every game. Each step takes the actions for all of them at once and runs one turn of each game,
+    instead of one step and one observation per unit like LuxEnvironment.
+
+    Observations are returned as an array of shape (n_envs, max_decisions) + observation shape, with a mask of
+    the entries that are pending decisions. obs[mask] stacks the decisions of all games so a model can predict
+    them in one call, and actions are passed back in the same layout.
+    """
+    def __init__(self, configs, learning_agents, opponent_agents, max_decisions=None):
+        """
+
+        :param configs: Game configs, or a list of game configs, one per game.
+        :param learning_agents: List of learning agents, one per game. Agents keep per-game state, like their team.
+        :param opponent_agents: List of opponent agents, one per game.
+        :param max_decisions: Number of decision slots per game. Decisions that don't fit get no action. Defaults to
+            the largest number of pending decisions of any game in the step.
+        """
+        assert len(learning_agents) == len(opponent_agents), "Specify one learning and one opponent agent per game"
+        self.n_envs = len(learning_agents)
+        if not isinstance(configs, list):
+            configs = [configs] * self.n_envs
+
+        self.learning_agents = learning_agents
+        self.games = []
+        self.match_controllers = []
+        for i in range(self.n_envs):
+            assert learning_agents[i].get_agent_type() == Constants.AGENT_TYPE.LEARNING, \
+                "Learning agents must be in training mode"
+            game = Game(configs[i])
+            self.games.append(game)
+            self.match_controllers.append(MatchController(game, agents=[learning_agents[i], opponent_agents[i]]))
+
+        self.action_space = learning_agents[0].action_space
+        self.observation_space = learning_agents[0].observation_space
+        self.max_decisions = max_decisions
+
+        # Pending (unit, city_tile, team) decisions of the learning agent in each game
+        self.decisions = [[] for _ in range(self.n_envs)]
+
+    def reset(self):
+        """
+        Resets all games.
+        :return: (observations, mask)
+        """
+        for i in range(self.n_envs):
+            self._reset_game(i)
+        return self._get_observations()
+
+    def step(self, actions):
+        """
+        Takes the actions for the pending decisions and runs a turn of every game. Finished games are reset, and
+        their returned observations are of the new game.
+        :param actions: Array of action codes of shape (n_envs, max_decisions), entries outside the mask are ignored.
+        :return: (observations, mask, rewards, dones, infos)
+        """
+        rewards = np.zeros(self.n_envs, dtype=np.float32)
+        dones = np.zeros(self.n_envs, dtype=bool)
+        infos = [{} for _ in range(self.n_envs)]
+
+        for i in range(self.n_envs):
+            game = self.games[i]
+            agent = self.learning_agents[i]
+            for k, (unit, city_tile, team) in enumerate(self.decisions[i][:np.shape(actions)[1]]):
+                agent.take_action(actions[i][k], game, unit=unit, city_tile=city_tile, team=team)
+
+            is_game_over, is_game_error = self._finish_turn(i)
+            if not is_game_over:
+                is_game_over, is_game_error = self._run_to_decisions(i, is_first_turn=False)
+
+            rewards[i] = agent.get_reward(game, is_game_over, True, is_game_error)
+            if is_game_over:
+                dones[i] = True
+                infos[i]["is_game_error"] = is_game_error
+                infos[i]["team"] = agent.team
+                self._reset_game(i)
+
+        obs, mask = self._get_observations()
+        return obs, mask, rewards, dones, infos
+
+    def _reset_game(self, index):
+        self.match_controllers[index].reset()
+        self.decisions[index] = []
+        self._run_to_decisions(index, is_first_turn=True)
+
+    def _run_to_decisions(self, index, is_first_turn):
+        """
+        Runs turns of the game until the learning agent has decisions to make.
+        :return: (is_game_over, is_game_error)
+        """
+        match_controller = self.match_controllers[index]
+        agent = self.learning_agents[index]
+        while True:
+            match_controller.begin_turn(is_first_turn)
+            is_first_turn = False
+
+            # Agents before the learning agent act first, like in MatchController.run_to_next_observation()
+            for other in match_controller.agents[:match_controller.agents.index(agent)]:
+                if other.get_agent_type() == Constants.AGENT_TYPE.AGENT:
+                    match_controller.process_agent_turn(other)
+
+            self.decisions[index] = list(match_controller.iter_pending_decisions(agent.team))
+            if len(self.decisions[index]) > 0:
+                return False, False
+
+            is_game_over, is_game_error = self._finish_turn(index)
+            if is_game_over:
+                return is_game_over, is_game_error
+
+    def _finish_turn(self, index):
+        """
+        Runs the agents after the learning agent, and the turn.
+        :return: (is_game_over, is_game_error)
+        """
+        match_controller = self.match_controllers[index]
+        agent = self.learning_agents[index]
+        self.decisions[index] = []
+        for other in match_controller.agents[match_controller.agents.index(agent) + 1:]:
+            if other.get_agent_type() == Constants.AGENT_TYPE.AGENT:
+                match_controller.process_agent_turn(other)
+
+        try:
+            return match_controller.end_turn(), False
+        except GameStepFailedException:
+            # Game step failed, the learning agent gets a game lost reward to not incentivise this
+            return True, True
+
+    def _get_observations(self):
+        """
+        :return: (observations, mask) of the pending decisions
+        """
+        max_decisions = self.max_decisions
+        if max_decisions is None:
+            max_decisions = max(1, max(len(decisions) for decisions in self.decisions))
+
+        obs = np.zeros(
+            (self.n_envs, max_decisions) + self.observation_space.shape, dtype=self.observation_space.dtype
+        )
+        mask = np.zeros((self.n_envs, max_decisions), dtype=bool)
+        for i in range(self.n_envs):
+            is_new_turn = True
+            for k, (unit, city_tile, team) in enumerate(self.decisions[i][:max_decisions]):
+                obs[i, k] = self.learning_agents[i].get_observation(self.games[i], unit, city_tile, team, is_new_turn)
+                mask[i, k] = True
+                is_new_turn = False
+        return obs, mask
+
+    def get_decisions(self, index):
+        """
+        :return: List of the pending (unit, city_tile, team) decisions of a game, in the order of the observations.
+        """
+        return self.decisions[index]
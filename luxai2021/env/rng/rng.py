@@ -1,13 +1,129 @@
 import os
+import re
 from subprocess import Popen, PIPE
 
 
+class SeedRandom:
+    """
+    Pure-python port of the ARC4-based generator from seedrandom.js, which is the
+    random number generator used by the lux ai CLI tool. Produces the same bit-exact
+    stream of doubles as `seedrandom(seed)()` in javascript, one value at a time.
+    """
+    WIDTH = 256  # Each RC4 output is 0 <= x < 256
+    CHUNKS = 6  # At least six RC4 outputs for each double
+    DIGITS = 52  # There are 52 significant digits in a double
+    MASK = WIDTH - 1
+    START_DENOM = float(WIDTH ** CHUNKS)
+    SIGNIFICANCE = float(2 ** DIGITS)
+    OVERFLOW = SIGNIFICANCE * 2
+
+    def __init__(self, seed: str):
+        """
+        :param seed: String seed, identical to the seed passed to seedrandom() in javascript.
+        """
+        key = self._mixkey(str(seed))
+        if len(key) == 0:
+            key = [0]
+
+        # Initialize the ARC4 state from the key
+        mask = self.MASK
+        s = list(range(self.WIDTH))
+        j = 0
+        for i in range(self.WIDTH):
+            t = s[i]
+            j = mask & (j + key[i % len(key)] + t)
+            s[i] = s[j]
+            s[j] = t
+        self._s = s
+        self._i = 0
+        self._j = 0
+
+        # For robust unpredictability, seedrandom discards an initial batch of values
+        self._g(self.WIDTH)
+
+    def _mixkey(self, seed):
+        """
+        Mixes a string seed into a key that is an array of integers. Mirrors mixkey() in seedrandom.js.
+        """
+        key = {}
+        smear = 0
+        mask = self.MASK
+        for j, char in enumerate(seed):
+            smear ^= key.get(mask & j, 0) * 19
+            key[mask & j] = mask & (smear + ord(char))
+        return [key[i] for i in range(len(key))]
+
+    def _g(self, count):
+        """
+        Returns the next (count) outputs of ARC4 as one number.
+        """
+        mask = self.MASK
+        s = self._s
+        i = self._i
+        j = self._j
+        r = 0
+        for _ in range(count):
+            i = mask & (i + 1)
+            t = s[i]
+            j = mask & (j + t)
+            s[i] = s[j]
+            s[j] = t
+            r = r * self.WIDTH + s[mask & (s[i] + t)]
+        self._i = i
+        self._j = j
+        return r
+
+    def random(self):
+        """
+        Returns a random double in [0, 1) that contains randomness in every bit of the mantissa.
+        """
+        n = float(self._g(self.CHUNKS))  # Start with a numerator n < 2 ^ 48
+        d = self.START_DENOM  # and denominator d = 2 ^ 48.
+        x = 0  # and no 'extra last byte'.
+        while n < self.SIGNIFICANCE:  # Fill up all significant digits by
+            n = (n + x) * self.WIDTH  # shifting numerator and
+            d *= self.WIDTH  # denominator and generating a
+            x = self._g(1)  # new least-significant-byte.
+        while n >= self.OVERFLOW:  # To avoid rounding up, before adding
+            n /= 2  # last byte, shift everything
+            d /= 2  # right using integer math until
+            x >>= 1  # we have exactly the desired bits.
+        return (n + x) / d  # Form the number within [0, 1).
+
+
+def _js_parse_int(value):
+    """
+    Mirrors javascript's parseInt() for the seed argument handed to rng.js.
+    """
+    if isinstance(value, int):
+        return str(value)
+    match = re.match(r"\s*([+-]?\d+)", str(value))
+    if match is None:
+        return "NaN"
+    return str(int(match.group(1)))
+
+
+def lux_rng(seed):
+    """
+    Creates the random number generator the lux ai CLI tool uses for map generation of the numerical seed.
+    """
+    return SeedRandom(f"gen_{_js_parse_int(seed)}")
+
+
 def get_n_values(seed, N=100):
     """
-    Generates the same random numbers as the lux ai CLI tool given the numerical seed and a number of values to generate. 10k values is generally more than enough
+    Generates the same random numbers as the lux ai CLI tool given the numerical seed and a number of values to generate.
+    """
+    rng = lux_rng(seed)
+    return [rng.random() for _ in range(N)]
+
+
+def get_n_values_js(seed, N=100):
+    """
+    Generates the random numbers by running the original javascript implementation through node. Used to validate
+    the python port, requires Node.js.
     """
     p = Popen(["node", f"{os.path.dirname(__file__)}/rng.js", str(seed), str(N)], stdout=PIPE)
-    # p.stdin.write(str(seed).encode())
     output = p.stdout.readline()
     vals = [float(v) for v in output.decode().split(",")]
     p.stdout.close()
@@ -0,0 +1,314 @@
+"""
+Monte-Carlo rollout search. Candidate action sets for the current turn are played out from a snapshot of the game
+with cheap default policies, and scored by the state they lead to.
+"""
+import math
+import multiprocessing
+import random
+import time
+from collections import namedtuple
+
+from ..game.actions import MoveAction, ResearchAction, SpawnCityAction, SpawnWorkerAction
+from ..game.constants import Constants
+from ..game.game import Game
+
+DIRECTIONS = [
+    Constants.DIRECTIONS.NORTH,
+    Constants.DIRECTIONS.EAST,
+    Constants.DIRECTIONS.SOUTH,
+    Constants.DIRECTIONS.WEST,
+]
+
+"""
+Search results of a candidate action set. Value is the mean rollout value, from 0 (lost) to 1 (won).
+"""
+CandidateStats = namedtuple("CandidateStats", ["actions", "visits", "value"])
+
+
+def idle_policy(game, team):
+    """
+    Default policy that does nothing.
+    """
+    return []
+
+
+class RandomPolicy:
+    """
+    Default policy that moves units in random directions, builds a city tile when a worker can, and builds workers or
+    researches on city tiles. Only picks actions the game accepts, so rollouts don't log rejected actions.
+    """
+    def __init__(self, build_probability=0.5, seed=None):
+        """
+
+        :param build_probability: Probability that a worker that can build a city tile builds one.
+        :param seed: Random seed. The rollout engine reseeds the policy for every rollout.
+        """
+        self.build_probability = build_probability
+        self.rng = random.Random(seed)
+
+    def seed(self, seed):
+        self.rng.seed(seed)
+
+    def __call__(self, game, team):
+        actions = []
+        for unit in game.state["teamStates"][team]["units"].values():
+            if not unit.can_act():
+                continue
+            if unit.is_worker() and unit.can_build(game.map) and self.rng.random() < self.build_probability:
+                actions.append(SpawnCityAction(team, unit.id))
+                continue
+
+            direction = self.rng.choice(DIRECTIONS)
+            cell = game.map.get_cell_by_pos(unit.pos.translate(direction, 1))
+            if cell is not None and (not cell.is_city_tile() or cell.city_tile.team == team):
+                actions.append(MoveAction(team, unit.id, direction))
+
+        units_built = 0
+        for city in game.cities.values():
+            if city.team != team:
+                continue
+            for cell in city.city_cells:
+                if not cell.city_tile.can_act():
+                    continue
+                if not game.worker_unit_cap_reached(team, units_built):
+                    actions.append(SpawnWorkerAction(team, None, cell.pos.x, cell.pos.y))
+                    units_built += 1
+                else:
+                    actions.append(ResearchAction(team, cell.pos.x, cell.pos.y, None))
+        return actions
+
+
+def leader_value(game, team):
+    """
+    Default rollout value. 1 if the team is ahead, 0 if it is behind and 0.5 if tied, by city tiles, then units,
+    then the fuel stored in cities.
+    """
+    scores = []
+    for t in [Constants.TEAM.A, Constants.TEAM.B]:
+        cities = [city for city in game.cities.values() if city.team == t]
+        scores.append((
+            sum(len(city.city_cells) for city in cities),
+            len(game.state["teamStates"][t]["units"]),
+            sum(city.fuel for city in cities),
+        ))
+    if scores[team] > scores[1 - team]:
+        return 1.0
+    if scores[team] < scores[1 - team]:
+        return 0.0
+    return 0.5
+
+
+class RolloutEngine:
+    """
+    Scores candidate action sets of a team for the current turn. Each rollout restores a snapshot of the game into
+    a headless simulation game, plays the candidate together with the opponent policy for this turn, plays on with
+    the default policies for up to depth turns and evaluates the resulting state.
+
+    Rollouts are spread over the candidates with UCB1, and run until the time budget or the number of rollouts
+    runs out. With processes > 0 rollouts run in a process pool, so policies and the value function must be
+    picklable, eg. module level functions or RandomPolicy. Every search starts a new generation of rollouts, and
+    the workers drop the rollouts of earlier searches, so rollouts left in flight when a time budget runs out
+    stop within a turn of simulation instead of delaying the next search.
+    """
+    def __init__(self, configs, policy=None, opponent_policy=None, value=leader_value, depth=8, processes=0,
+                 exploration=math.sqrt(2), seed=None):
+        """
+
+        :param configs: Game configs of the games to search.
+        :param policy: Default policy of the searching team, a function of (game, team) to a list of actions.
+            Agent.process_turn can be used as a policy. Policies with a seed(seed) method are reseeded for every
+            rollout. Defaults to RandomPolicy().
+        :param opponent_policy: Default policy of the opponent. Defaults to the policy.
+        :param value: Function of (game, team) to the value of a rollout, from 0 (lost) to 1 (won).
+        :param depth: Number of turns each rollout plays, including the turn of the candidate.
+        :param processes: Number of worker processes to run rollouts in, or 0 to run them in this process.
+        :param exploration: UCB1 exploration constant.
+        :param seed: Seed of the rollout seeds.
+        """
+        self.configs = dict(configs)
+        self.configs["log"] = False
+        self.configs["headless"] = True
+        self.policy = policy if policy is not None else RandomPolicy()
+        self.opponent_policy = opponent_policy if opponent_policy is not None else self.policy
+        self.value = value
+        self.depth = depth
+        self.processes = processes
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+
+        self.game = None
+        self.pool = None
+        # Generation of the current search, shared with the workers
+        self.generation = None
+        if processes > 0:
+            self.generation = multiprocessing.Value("i", 0)
+            self.pool = multiprocessing.Pool(
+                processes,
+                initializer=_init_worker,
+                initargs=(self.configs, self.policy, self.opponent_policy, self.value, depth, self.generation),
+            )
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def rollout(self, snapshot, team, actions, seed, cancelled=None):
+        """
+        Plays one rollout in this process.
+        :param snapshot: GameSnapshot to start from.
+        :param team: Searching team.
+        :param actions: Candidate actions of the team for the first turn.
+        :param seed: Seed of the policies.
+        :param cancelled: Optional function that returns True once the rollout is no longer needed, checked before
+            every turn.
+        :return: Value of the rollout, or None if it was cancelled.
+        """
+        if self.game is None:
+            # The simulation game is headless, its state is replaced by every restore
+            self.game = Game(self.configs)
+        game = self.game
+        game.restore(snapshot)
+        for policy in [self.policy, self.opponent_policy]:
+            if hasattr(policy, "seed"):
+                policy.seed(seed)
+
+        done = game.run_turn_with_actions(list(actions) + self.opponent_policy(game, 1 - team))
+        for _ in range(self.depth - 1):
+            if done:
+                break
+            if cancelled is not None and cancelled():
+                return None
+            done = game.run_turn_with_actions(self.policy(game, team) + self.opponent_policy(game, 1 - team))
+        return self.value(game, team)
+
+    def search(self, game, team, candidates, time_budget=None, max_rollouts=None):
+        """
+        Runs rollouts of the candidates from the current state of the game, which is left unchanged.
+        :param game: Game to search from, between turns.
+        :param team: Searching team.
+        :param candidates: List of candidate action sets, each a list of actions of the team for this turn.
+        :param time_budget: Wall-clock time budget in seconds. No rollout is started once the slowest rollout so far
+            would not fit in the time left, but the first rollout always runs, so a rollout slower than the budget
+            overruns it.
+        :param max_rollouts: Maximum number of rollouts. One of time_budget and max_rollouts must be given.
+        :return: List of CandidateStats, in the order of the candidates.
+        """
+        assert time_budget is not None or max_rollouts is not None, "Specify a time budget or number of rollouts"
+        start_time = time.time()
+        snapshot = game.snapshot()
+        visits = [0] * len(candidates)
+        totals = [0.0] * len(candidates)
+        pending = [0] * len(candidates)
+
+        def out_of_time(time_needed):
+            return time_budget is not None and time.time() - start_time + time_needed > time_budget
+
+        if self.pool is None:
+            rollout_time = 0.0
+            while max_rollouts is None or sum(visits) < max_rollouts:
+                if len(candidates) == 0 or out_of_time(rollout_time):
+                    break
+                i = self._select(visits, totals, pending)
+                rollout_start_time = time.time()
+                totals[i] += self.rollout(snapshot, team, candidates[i], self.rng.getrandbits(32))
+                visits[i] += 1
+                # Slowest rollout so far, to stop before the budget runs out
+                rollout_time = max(rollout_time, time.time() - rollout_start_time)
+        else:
+            # Keep one rollout per worker in flight, results that arrive after the budget are dropped
+            generation = self._next_generation()
+            in_flight = []
+            started = 0
+            while True:
+                while (len(candidates) > 0 and len(in_flight) < self.processes and not out_of_time(0.0) and
+                       (max_rollouts is None or started < max_rollouts)):
+                    i = self._select(visits, totals, pending)
+                    task = (snapshot, team, candidates[i], self.rng.getrandbits(32), generation)
+                    in_flight.append((i, self.pool.apply_async(_run_worker_rollout, (task,))))
+                    pending[i] += 1
+                    started += 1
+                if len(in_flight) == 0:
+                    break
+
+                i, result = in_flight[0]
+                timeout = None if time_budget is None else max(time_budget - (time.time() - start_time), 0.0)
+                result.wait(timeout)
+                if not result.ready():
+                    break
+                in_flight.pop(0)
+                pending[i] -= 1
+                totals[i] += result.get()
+                visits[i] += 1
+
+            if len(in_flight) > 0:
+                # Stop the rollouts left in flight
+                self._next_generation()
+
+        return [
+            CandidateStats(actions, visits[i], totals[i] / visits[i] if visits[i] > 0 else 0.0)
+            for i, actions in enumerate(candidates)
+        ]
+
+    def best_actions(self, game, team, candidates, time_budget=None, max_rollouts=None):
+        """
+        Searches the candidates and picks the most visited one.
+        :return: Actions of the best candidate, or the first candidate if there was no time for any rollout.
+        """
+        stats = self.search(game, team, candidates, time_budget, max_rollouts)
+        if len(stats) == 0:
+            return []
+        return max(stats, key=lambda s: (s.visits, s.value)).actions
+
+    def _next_generation(self):
+        with self.generation.get_lock():
+            self.generation.value += 1
+            return self.generation.value
+
+    def _select(self, visits, totals, pending):
+        """
+        Picks the candidate to roll out next with UCB1. Rollouts in flight count as visits with value 0, so
+        parallel rollouts spread over the candidates.
+        """
+        best = None
+        best_score = None
+        n = sum(visits) + sum(pending)
+        for i in range(len(visits)):
+            count = visits[i] + pending[i]
+            if count == 0:
+                return i
+            score = totals[i] / count + self.exploration * math.sqrt(math.log(n) / count)
+            if best_score is None or score > best_score:
+                best = i
+                best_score = score
+        return best
+
+
+# RolloutEngine of each worker process, and the generation of the current search shared with the searching process
+_worker_engine = None
+_worker_generation = None
+
+
+def _init_worker(configs, policy, opponent_policy, value, depth, generation):
+    global _worker_engine, _worker_generation
+    _worker_engine = RolloutEngine(configs, policy, opponent_policy, value, depth)
+    _worker_generation = generation
+
+
+def _run_worker_rollout(task):
+    snapshot, team, actions, seed, generation = task
+    cancelled = lambda: _worker_generation.value != generation
+    if cancelled():
+        # Rollout of an earlier search
+        return None
+    return _worker_engine.rollout(snapshot, team, actions, seed, cancelled)
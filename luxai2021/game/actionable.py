@@ -2,6 +2,9 @@
 Implements /src/Actionable/index.ts
 """
 
+# Shared by every object without actions this turn, the action list is only allocated by give_action()
+NO_ACTIONS = ()
+
 
 class Actionable:
     """
@@ -13,6 +16,8 @@ class Actionable:
         COAL = 'coal'
         URANIUM = 'uranium'
 
+    __slots__ = ("configs", "current_actions", "cooldown", "can_act_override")
+
     def __init__(self, configs, cooldown=0.0) -> None:
         """
 
@@ -20,7 +25,7 @@ class Actionable:
         :param cooldown:
         """
         self.configs = configs
-        self.current_actions = []
+        self.current_actions = NO_ACTIONS
         self.cooldown = cooldown
         self.can_act_override = None
 
@@ -52,7 +57,7 @@ class Actionable:
             # ToDo self.turn() is not implemented
             self.turn(game)
         finally:
-            self.current_actions = []
+            self.current_actions = NO_ACTIONS
         # reset actions to empty
 
     def give_action(self, action):
@@ -61,4 +66,7 @@ class Actionable:
         :param action:
         :return:
         """
-        self.current_actions.append(action)
+        if len(self.current_actions) == 0:
+            self.current_actions = [action]
+        else:
+            self.current_actions.append(action)
@@ -6,6 +6,84 @@ from .constants import Constants
 UNIT_TYPES = Constants.UNIT_TYPES
 
 
+class ValidatedActions(list):
+    """
+    List of the actions validated for a turn, that indexes the move targets of the units as actions are added, so
+    that actions can be validated in constant time. Passed to Action.is_valid() as actions_validated.
+
+    The index relies on the units not moving while the list is in use, so a new list is made every turn.
+    """
+    def __init__(self, game, actions=()):
+        """
+
+        :param game:
+        :param actions: Actions already validated this turn.
+        """
+        super().__init__()
+        self.game = game
+
+        # Move target of each unit with a validated move, and the units moving to each position by team
+        self.move_targets = {}
+        self.units_moving_to = {Constants.TEAM.A: {}, Constants.TEAM.B: {}}
+
+        # Number of units on each position by team, built on first use
+        self.unit_counts = None
+
+        self.extend(actions)
+
+    def append(self, action):
+        super().append(action)
+        if action.action == Constants.ACTIONS.MOVE:
+            self._index_move(action)
+
+    def extend(self, actions):
+        for action in actions:
+            self.append(action)
+
+    def __iadd__(self, actions):
+        self.extend(actions)
+        return self
+
+    def _index_move(self, action):
+        # The last move of a unit is its target, like indexing the moves of the validated actions in order
+        previous = self.move_targets.get(action.unit_id)
+        if previous is not None:
+            self.units_moving_to[previous[0]][previous[1]].discard(action.unit_id)
+
+        pos = self.game.get_unit(action.team, action.unit_id).pos.translate(action.direction, 1)
+        self.move_targets[action.unit_id] = (action.team, pos)
+        units = self.units_moving_to[action.team].get(pos)
+        if units is None:
+            self.units_moving_to[action.team][pos] = {action.unit_id}
+        else:
+            units.add(action.unit_id)
+
+    def is_move_target(self, team, pos, exclude_unit_id=None):
+        """
+        :param team:
+        :param pos:
+        :param exclude_unit_id: Unit to ignore, eg. the unit being validated.
+        :return: True if another unit of the team has a validated move to the position.
+        """
+        units = self.units_moving_to[team].get(pos)
+        if not units:
+            return False
+        return len(units) > 1 or exclude_unit_id not in units
+
+    def count_units(self, team, pos):
+        """
+        :param team:
+        :param pos:
+        :return: Number of units of the team on the position at the start of the turn.
+        """
+        if self.unit_counts is None:
+            self.unit_counts = {Constants.TEAM.A: {}, Constants.TEAM.B: {}}
+            for unit_team, counts in self.unit_counts.items():
+                for unit in self.game.get_teams_units(unit_team).values():
+                    counts[unit.pos] = counts.get(unit.pos, 0) + 1
+        return self.unit_counts[team].get(pos, 0)
+
+
 class Action:
     def __init__(self, action, team):
         self.action = action
@@ -59,7 +137,8 @@ class MoveAction(Action):
         """
         Validates the command.
         :param game:
-        :param actions_validated: Other actions that have already been validated for this turn.
+        :param actions_validated: Other actions that have already been validated for this turn, preferably as
+            ValidatedActions.
         :return: True if it's valid, False otherwise
         """
         if self.unit_id is None or self.team is None or self.direction is None:
@@ -85,32 +164,18 @@ class MoveAction(Action):
             return False
 
         if not target_cell.is_city_tile():
-            # Get units adjacent to target. Ignore opponents, because they might move.
-            adjacent_cells = game.map.get_adjacent_cells(target_cell)
-            adjacent_cells.append(target_cell) # Also look at the target cell
-
-            # Index move actions
-            moves = {}
-            for action in actions_validated:
-                if action.action == Constants.ACTIONS.MOVE:
-                    moves[action.unit_id] = game.get_unit(action.team, action.unit_id).pos.translate(action.direction, 1)
-
-            # Get potential collision units from our team
-            for c in adjacent_cells:
-                for id, u in c.units.items():
-                    if u.team == self.team:
-                        if id != self.unit_id:
-                            # This unit is a potential collision
-                            if id in moves:
-                                # Check the unit move target for collision
-                                if new_pos == moves[id]:
-                                    # Collides with move target of existing unit
-                                    return False
-                            
-                            # Check this unit's current position for a collision
-                            if new_pos == unit.pos:
-                                # Collides with a unit in the way
-                                return False
+            if not isinstance(actions_validated, ValidatedActions):
+                actions_validated = ValidatedActions(game, actions_validated)
+
+            # Collides with the move target of another unit of our team. Ignore opponents, because they might move.
+            if actions_validated.is_move_target(self.team, new_pos, self.unit_id):
+                return False
+
+            # Staying in place collides with any other unit of our team on or adjacent to this cell
+            if new_pos == unit.pos:
+                for c in game.map.get_adjacent_cells(target_cell) + (target_cell,):
+                    if actions_validated.count_units(self.team, c.pos) > (1 if c is target_cell else 0):
+                        return False
 
         # Note: True collisions are handled in the turn loop as both players move
         return True
@@ -0,0 +1,732 @@
+"""
+Array-backed (structure-of-arrays) representation of the game state. Resources, roads, city tiles,
+units and research are kept in typed numpy arrays indexed by map cell and by unit and city slot,
+instead of nested dicts of Cell, Unit and City objects.
+
+Thin views (CellView, UnitView, CityTileView, CityView) read and write the arrays directly and mirror
+the Cell, Unit, CityTile and City api that agents use, so agent code can run on either backend. The
+map arrays are (height, width) and can be used as observation planes without copying.
+"""
+import numpy as np
+
+from .constants import Constants
+from .game_map_vectorized import NO_RESOURCE, RESOURCE_TYPE_ORDER
+from .position import Position
+
+NO_TEAM = -1
+NO_SLOT = -1
+RESOURCE_TYPE_INDEX = {resource_type: i for i, resource_type in enumerate(RESOURCE_TYPE_ORDER)}
+RESOURCE_CONFIG_NAMES = ["WOOD", "COAL", "URANIUM"]
+
+
+class ArrayGameState:
+    """
+    Game state stored in typed numpy arrays. Unit and city slots are allocated in creation order as units
+    and cities are created, so iterating slots visits them in the same order as the Game dicts. Slots are not
+    reused within a game. Arrays may be views into the stacked arrays of a BatchedGame.
+    """
+    def __init__(self, configs, width, height, unit_capacity=64, city_capacity=32, arrays=None):
+        """
+
+        :param configs: Game configs.
+        :param width:
+        :param height:
+        :param unit_capacity: Initial number of unit slots.
+        :param city_capacity: Initial number of city slots.
+        :param arrays: Optional dict of preallocated arrays to use as storage, as created by allocate_arrays().
+        """
+        self.configs = configs
+        self.width = width
+        self.height = height
+        self.turn = 0
+        self.global_unit_id_count = 0
+        self.global_city_id_count = 0
+        if arrays is None:
+            arrays = allocate_arrays(height, width, unit_capacity, city_capacity)
+        self.bind_arrays(arrays)
+        self.unit_ids = [None] * len(self.unit_alive)
+        self.city_ids = [None] * len(self.city_alive)
+        self.unit_slot_by_id = {}
+        self.city_slot_by_id = {}
+        # (x, y) -> unit slots on the cell, kept up to date by add_unit(), move_unit() and remove_unit()
+        self.unit_slots_by_cell = {}
+        self.unit_slots_used = 0
+        self.city_slots_used = 0
+        self.city_tile_order_count = 0
+
+    def bind_arrays(self, arrays):
+        """
+        Points the state at the given storage arrays.
+        :param arrays: dict of arrays, as created by allocate_arrays().
+        """
+        # Per map cell, indexed [y, x]
+        self.resource_type = arrays["resource_type"]
+        self.resource_amount = arrays["resource_amount"]
+        self.road = arrays["road"]
+        self.city_tile_team = arrays["city_tile_team"]
+        self.city_tile_city = arrays["city_tile_city"]
+        self.city_tile_cooldown = arrays["city_tile_cooldown"]
+        self.city_tile_adjacent = arrays["city_tile_adjacent"]
+        # Order the tiles were added to their city, the city_cells order of the City
+        self.city_tile_order = arrays["city_tile_order"]
+
+        # Per unit slot
+        self.unit_alive = arrays["unit_alive"]
+        self.unit_team = arrays["unit_team"]
+        self.unit_type = arrays["unit_type"]
+        self.unit_x = arrays["unit_x"]
+        self.unit_y = arrays["unit_y"]
+        self.unit_cargo = arrays["unit_cargo"]
+        self.unit_cooldown = arrays["unit_cooldown"]
+
+        # Per city slot
+        self.city_alive = arrays["city_alive"]
+        self.city_team = arrays["city_team"]
+        self.city_fuel = arrays["city_fuel"]
+
+        # Per team
+        self.research_points = arrays["research_points"]
+        self.researched = arrays["researched"]
+        self.fuel_generated = arrays["fuel_generated"]
+
+    def get_arrays(self):
+        """
+        :return: dict of the storage arrays.
+        """
+        return {name: getattr(self, name) for name in ARRAY_SPECS}
+
+    @classmethod
+    def from_game(cls, game, unit_capacity=None, city_capacity=None):
+        """
+        Creates an array state of a Game.
+        :param game:
+        :return: ArrayGameState
+        """
+        state = cls(
+            game.configs,
+            game.map.width,
+            game.map.height,
+            unit_capacity or max(64, _count_units(game)),
+            city_capacity or max(32, len(game.cities)),
+        )
+        state.load_game(game)
+        return state
+
+    def load_game(self, game):
+        """
+        Overwrites this state with the state of the Game. The map size must match.
+        :param game:
+        """
+        assert game.map.width == self.width and game.map.height == self.height, "Map size mismatch"
+        self.configs = game.configs
+        self.turn = game.state["turn"]
+        self.global_unit_id_count = game.global_unit_id_count
+        self.global_city_id_count = game.global_city_id_count
+        self.clear()
+
+        for y in range(self.height):
+            for x, cell in enumerate(game.map.map[y]):
+                if cell.resource is not None:
+                    self.resource_type[y, x] = RESOURCE_TYPE_INDEX[cell.resource.type]
+                    self.resource_amount[y, x] = cell.resource.amount
+                self.road[y, x] = cell.road
+
+        for city in game.cities.values():
+            slot = self.add_city(city.id, city.team, city.fuel)
+            for cell in city.city_cells:
+                self.add_city_tile(slot, cell.pos.x, cell.pos.y, cell.city_tile.cooldown)
+                self.city_tile_adjacent[cell.pos.y, cell.pos.x] = cell.city_tile.adjacent_city_tiles
+
+        for team in [Constants.TEAM.A, Constants.TEAM.B]:
+            team_state = game.state["teamStates"][team]
+            self.research_points[team] = team_state["researchPoints"]
+            self.fuel_generated[team] = game.stats["teamStats"][team]["fuelGenerated"]
+            for i, resource_type in enumerate(RESOURCE_TYPE_ORDER):
+                self.researched[team, i] = team_state["researched"][resource_type]
+            for unit in team_state["units"].values():
+                self.add_unit(
+                    unit.id, team, unit.type, unit.pos.x, unit.pos.y, unit.cooldown,
+                    [unit.cargo[resource_type] for resource_type in RESOURCE_TYPE_ORDER]
+                )
+
+    def clear(self):
+        """
+        Removes all resources, roads, cities and units.
+        """
+        self.resource_type[...] = NO_RESOURCE
+        self.resource_amount[...] = 0
+        self.road[...] = self.configs["parameters"]["MIN_ROAD"]
+        self.city_tile_team[...] = NO_TEAM
+        self.city_tile_city[...] = NO_SLOT
+        self.city_tile_cooldown[...] = 0
+        self.city_tile_adjacent[...] = 0
+        self.city_tile_order[...] = 0
+        self.unit_alive[...] = False
+        self.city_alive[...] = False
+        self.research_points[...] = 0
+        self.researched[...] = False
+        self.researched[:, RESOURCE_TYPE_INDEX[Constants.RESOURCE_TYPES.WOOD]] = True
+        self.fuel_generated[...] = 0
+        self.unit_ids = [None] * len(self.unit_alive)
+        self.city_ids = [None] * len(self.city_alive)
+        self.unit_slot_by_id = {}
+        self.city_slot_by_id = {}
+        self.unit_slots_by_cell = {}
+        self.unit_slots_used = 0
+        self.city_slots_used = 0
+        self.city_tile_order_count = 0
+
+    def _grow(self, names, capacity):
+        """
+        Grows the slot arrays to at least the specified capacity.
+        """
+        for name in names:
+            old = getattr(self, name)
+            new_capacity = max(capacity, 2 * len(old))
+            new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add_unit(self, unit_id, team, unit_type, x, y, cooldown=0.0, cargo=(0, 0, 0)):
+        """
+        Adds a unit in the next unit slot.
+        :return: The unit slot.
+        """
+        slot = self.unit_slots_used
+        if slot >= len(self.unit_alive):
+            self._grow(UNIT_ARRAYS, slot + 1)
+        if slot >= len(self.unit_ids):
+            self.unit_ids += [None] * (len(self.unit_alive) - len(self.unit_ids))
+        self.unit_slots_used += 1
+        self.unit_alive[slot] = True
+        self.unit_team[slot] = team
+        self.unit_type[slot] = unit_type
+        self.unit_x[slot] = x
+        self.unit_y[slot] = y
+        self.unit_cooldown[slot] = cooldown
+        self.unit_cargo[slot] = cargo
+        self.unit_ids[slot] = unit_id
+        self.unit_slot_by_id[unit_id] = slot
+        self.unit_slots_by_cell.setdefault((int(x), int(y)), []).append(slot)
+        return slot
+
+    def move_unit(self, slot, x, y):
+        """
+        Moves a unit to the cell.
+        """
+        self._remove_from_cell(slot)
+        self.unit_x[slot] = x
+        self.unit_y[slot] = y
+        self.unit_slots_by_cell.setdefault((int(x), int(y)), []).append(slot)
+
+    def remove_unit(self, slot):
+        self._remove_from_cell(slot)
+        self.unit_alive[slot] = False
+        self.unit_slot_by_id.pop(self.unit_ids[slot], None)
+        self.unit_ids[slot] = None
+
+    def _remove_from_cell(self, slot):
+        cell = (int(self.unit_x[slot]), int(self.unit_y[slot]))
+        slots = self.unit_slots_by_cell[cell]
+        slots.remove(slot)
+        if len(slots) == 0:
+            del self.unit_slots_by_cell[cell]
+
+    def add_city(self, city_id, team, fuel=0.0):
+        """
+        Adds a city in the next city slot.
+        :return: The city slot.
+        """
+        slot = self.city_slots_used
+        if slot >= len(self.city_alive):
+            self._grow(CITY_ARRAYS, slot + 1)
+        if slot >= len(self.city_ids):
+            self.city_ids += [None] * (len(self.city_alive) - len(self.city_ids))
+        self.city_slots_used += 1
+        self.city_alive[slot] = True
+        self.city_team[slot] = team
+        self.city_fuel[slot] = fuel
+        self.city_ids[slot] = city_id
+        self.city_slot_by_id[city_id] = slot
+        return slot
+
+    def add_city_tile(self, city_slot, x, y, cooldown=0.0):
+        """
+        Adds a city tile to the end of the city's tiles.
+        """
+        self.city_tile_team[y, x] = self.city_team[city_slot]
+        self.city_tile_city[y, x] = city_slot
+        self.city_tile_cooldown[y, x] = cooldown
+        self.city_tile_order[y, x] = self.city_tile_order_count
+        self.city_tile_order_count += 1
+
+    def get_city_tiles(self, city_slot):
+        """
+        :return: List of (x, y) of the city's tiles, in the order they were added.
+        """
+        ys, xs = np.nonzero(self.city_tile_city == city_slot)
+        order = np.argsort(self.city_tile_order[ys, xs], kind="stable")
+        return [(int(xs[i]), int(ys[i])) for i in order]
+
+    def remove_city(self, slot):
+        """
+        Removes the city and all its city tiles.
+        """
+        tiles = self.city_tile_city == slot
+        self.city_tile_team[tiles] = NO_TEAM
+        self.city_tile_city[tiles] = NO_SLOT
+        self.city_tile_cooldown[tiles] = 0
+        self.city_tile_adjacent[tiles] = 0
+        self.road[tiles] = self.configs["parameters"]["MIN_ROAD"]
+        self._free_city_slot(slot)
+
+    def _free_city_slot(self, slot):
+        self.city_alive[slot] = False
+        self.city_slot_by_id.pop(self.city_ids[slot], None)
+        self.city_ids[slot] = None
+
+    """
+    Game logic operating on a single game. Mirrors the Game methods of the same names.
+    """
+
+    def spawn_unit(self, team, unit_type, x, y):
+        """
+        Spawns a new worker or cart.
+        :return: The unit slot.
+        """
+        self.global_unit_id_count += 1
+        return self.add_unit("u_%i" % self.global_unit_id_count, team, unit_type, x, y)
+
+    def spawn_city_tile(self, team, x, y):
+        """
+        Spawns a new city tile, merging the adjacent cities of the team.
+        Implements src/Game/index.ts -> Game.spawnCityTile()
+        """
+        adj_same_team_tiles = []
+        city_slots_found = []
+        for nx, ny in [(x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y)]:
+            if 0 <= nx < self.width and 0 <= ny < self.height and self.city_tile_team[ny, nx] == team:
+                adj_same_team_tiles.append((nx, ny))
+                city_slot = int(self.city_tile_city[ny, nx])
+                if city_slot not in city_slots_found:
+                    city_slots_found.append(city_slot)
+
+        # if no adjacent city cells of same team, generate new city
+        if len(adj_same_team_tiles) == 0:
+            self.global_city_id_count += 1
+            city_slot = self.add_city("c_%i" % self.global_city_id_count, team)
+            self.add_city_tile(city_slot, x, y)
+            self.city_tile_adjacent[y, x] = 0
+            return city_slot
+
+        # otherwise add tile to city
+        city_slot = city_slots_found[0]
+        self.add_city_tile(city_slot, x, y)
+
+        # update adjacency counts for bonuses
+        self.city_tile_adjacent[y, x] = len(adj_same_team_tiles)
+        for nx, ny in adj_same_team_tiles:
+            self.city_tile_adjacent[ny, nx] += 1
+
+        # move the tiles of all merged cities to the merged city, and delete the old cities
+        for old_city_slot in city_slots_found[1:]:
+            for tx, ty in self.get_city_tiles(old_city_slot):
+                self.add_city_tile(city_slot, tx, ty, self.city_tile_cooldown[ty, tx])
+            self.city_fuel[city_slot] += self.city_fuel[old_city_slot]
+            self._free_city_slot(old_city_slot)
+
+        return city_slot
+
+    def is_night(self):
+        day_length = self.configs["parameters"]["DAY_LENGTH"]
+        cycle_length = day_length + self.configs["parameters"]["NIGHT_LENGTH"]
+        return (self.turn % cycle_length) >= day_length
+
+    """
+    Views mirroring the object api
+    """
+
+    def get_cell(self, x, y):
+        """
+        :return: CellView, or None if outside the map.
+        """
+        if y >= self.height or x >= self.width or y < 0 or x < 0:
+            return None
+        return CellView(self, x, y)
+
+    def get_cell_by_pos(self, pos):
+        return self.get_cell(pos.x, pos.y)
+
+    def get_adjacent_cells(self, cell):
+        cells = []
+        for x, y in [(cell.pos.x, cell.pos.y - 1), (cell.pos.x + 1, cell.pos.y),
+                     (cell.pos.x, cell.pos.y + 1), (cell.pos.x - 1, cell.pos.y)]:
+            if 0 <= x < self.width and 0 <= y < self.height:
+                cells.append(CellView(self, x, y))
+        return cells
+
+    def in_map(self, pos):
+        return not (pos.x < 0 or pos.y < 0 or pos.x >= self.width or pos.y >= self.height)
+
+    def get_teams_units(self, team):
+        """
+        :return: dict of unit id -> UnitView
+        """
+        slots = np.flatnonzero(self.unit_alive & (self.unit_team == team))
+        return {self.unit_ids[slot]: UnitView(self, int(slot)) for slot in slots}
+
+    def get_unit(self, team, unit_id):
+        slot = self.unit_slot_by_id[unit_id]
+        if self.unit_team[slot] != team:
+            raise KeyError(unit_id)
+        return UnitView(self, slot)
+
+    def get_cities(self):
+        """
+        :return: dict of city id -> CityView
+        """
+        return {self.city_ids[slot]: CityView(self, int(slot)) for slot in np.flatnonzero(self.city_alive)}
+
+    def units_at(self, x, y):
+        """
+        :return: dict of unit id -> UnitView of the units on the cell.
+        """
+        slots = self.unit_slots_by_cell.get((x, y), ())
+        return {self.unit_ids[slot]: UnitView(self, slot) for slot in slots}
+
+    def unit_count_map(self, team):
+        """
+        :return: (height, width) array of the number of units of the team on each cell.
+        """
+        counts = np.zeros((self.height, self.width), dtype=np.int32)
+        alive = self.unit_alive & (self.unit_team == team)
+        np.add.at(counts, (self.unit_y[alive], self.unit_x[alive]), 1)
+        return counts
+
+
+def _count_units(game):
+    return sum(len(game.state["teamStates"][team]["units"]) for team in [Constants.TEAM.A, Constants.TEAM.B])
+
+
+# Storage array dtypes. Slot arrays also have the shape of each slot's value.
+CELL_ARRAYS = {
+    "resource_type": np.int8,
+    "resource_amount": np.int32,
+    "road": np.float64,
+    "city_tile_team": np.int8,
+    "city_tile_city": np.int32,
+    "city_tile_cooldown": np.float64,
+    "city_tile_adjacent": np.int8,
+    "city_tile_order": np.int32,
+}
+UNIT_ARRAYS = {
+    "unit_alive": (bool, ()),
+    "unit_team": (np.int8, ()),
+    "unit_type": (np.int8, ()),
+    "unit_x": (np.int16, ()),
+    "unit_y": (np.int16, ()),
+    "unit_cargo": (np.int32, (len(RESOURCE_TYPE_ORDER),)),
+    "unit_cooldown": (np.float64, ()),
+}
+CITY_ARRAYS = {
+    "city_alive": (bool, ()),
+    "city_team": (np.int8, ()),
+    "city_fuel": (np.float64, ()),
+}
+TEAM_ARRAYS = {
+    "research_points": (np.int32, ()),
+    "researched": (bool, (len(RESOURCE_TYPE_ORDER),)),
+    "fuel_generated": (np.float64, ()),
+}
+ARRAY_SPECS = list(CELL_ARRAYS) + list(UNIT_ARRAYS) + list(CITY_ARRAYS) + list(TEAM_ARRAYS)
+
+
+def allocate_arrays(height, width, unit_capacity, city_capacity, batch_shape=()):
+    """
+    Allocates the storage arrays of a game state, optionally stacked with a leading batch shape.
+    :return: dict of name -> array
+    """
+    arrays = {}
+    for name, dtype in CELL_ARRAYS.items():
+        arrays[name] = np.zeros(batch_shape + (height, width), dtype=dtype)
+    for specs, count in [(UNIT_ARRAYS, unit_capacity), (CITY_ARRAYS, city_capacity), (TEAM_ARRAYS, 2)]:
+        for name, (dtype, suffix) in specs.items():
+            arrays[name] = np.zeros(batch_shape + (count,) + suffix, dtype=dtype)
+    return arrays
+
+
+class ResourceView:
+    """
+    Mirrors Resource for a cell of an ArrayGameState.
+    """
+    def __init__(self, state, x, y):
+        self._state = state
+        self._x = x
+        self._y = y
+
+    @property
+    def type(self):
+        return RESOURCE_TYPE_ORDER[self._state.resource_type[self._y, self._x]]
+
+    @property
+    def amount(self):
+        return int(self._state.resource_amount[self._y, self._x])
+
+    @amount.setter
+    def amount(self, value):
+        self._state.resource_amount[self._y, self._x] = value
+
+
+class CityTileView:
+    """
+    Mirrors CityTile for a cell of an ArrayGameState.
+    """
+    def __init__(self, state, x, y):
+        self._state = state
+        self.pos = Position(x, y)
+        self.can_act_override = None
+
+    @property
+    def team(self):
+        return int(self._state.city_tile_team[self.pos.y, self.pos.x])
+
+    @property
+    def city_id(self):
+        return self._state.city_ids[self._state.city_tile_city[self.pos.y, self.pos.x]]
+
+    @property
+    def cooldown(self):
+        return float(self._state.city_tile_cooldown[self.pos.y, self.pos.x])
+
+    @cooldown.setter
+    def cooldown(self, value):
+        self._state.city_tile_cooldown[self.pos.y, self.pos.x] = value
+
+    @property
+    def adjacent_city_tiles(self):
+        return int(self._state.city_tile_adjacent[self.pos.y, self.pos.x])
+
+    def get_tile_id(self):
+        return f"{self.city_id}_{self.pos.x}_{self.pos.y}"
+
+    def can_act(self):
+        if self.can_act_override is None:
+            return self.cooldown < 1
+        return self.can_act_override
+
+    def set_can_act_override(self, can_act_override):
+        self.can_act_override = can_act_override
+
+    def can_build_unit(self):
+        return self.can_act()
+
+    def can_research(self):
+        return self.can_act()
+
+    def get_cargo_space_left(self):
+        return 9999999  # Infinite space
+
+
+class CellView:
+    """
+    Mirrors Cell for a cell of an ArrayGameState.
+    """
+    def __init__(self, state, x, y):
+        self._state = state
+        self.pos = Position(x, y)
+
+    def __eq__(self, other):
+        return isinstance(other, CellView) and self._state is other._state and self.pos == other.pos
+
+    def __hash__(self):
+        return hash(self.pos)
+
+    @property
+    def resource(self):
+        if self._state.resource_type[self.pos.y, self.pos.x] == NO_RESOURCE:
+            return None
+        return ResourceView(self._state, self.pos.x, self.pos.y)
+
+    @property
+    def city_tile(self):
+        if self._state.city_tile_team[self.pos.y, self.pos.x] == NO_TEAM:
+            return None
+        return CityTileView(self._state, self.pos.x, self.pos.y)
+
+    @property
+    def units(self):
+        return self._state.units_at(self.pos.x, self.pos.y)
+
+    @property
+    def road(self):
+        return float(self._state.road[self.pos.y, self.pos.x])
+
+    @road.setter
+    def road(self, value):
+        self._state.road[self.pos.y, self.pos.x] = value
+
+    def has_resource(self):
+        return (
+            self._state.resource_type[self.pos.y, self.pos.x] != NO_RESOURCE and
+            self._state.resource_amount[self.pos.y, self.pos.x] > 0
+        )
+
+    def is_city_tile(self):
+        return self._state.city_tile_team[self.pos.y, self.pos.x] != NO_TEAM
+
+    def has_units(self):
+        return (self.pos.x, self.pos.y) in self._state.unit_slots_by_cell
+
+    def get_road(self):
+        if self.is_city_tile():
+            return self._state.configs["parameters"]["MAX_ROAD"]
+        return self.road
+
+
+class CargoView:
+    """
+    Mirrors the Unit.cargo dict for a unit slot of an ArrayGameState.
+    """
+    def __init__(self, state, slot):
+        self._state = state
+        self._slot = slot
+
+    def __getitem__(self, resource_type):
+        return int(self._state.unit_cargo[self._slot, RESOURCE_TYPE_INDEX[resource_type]])
+
+    def __setitem__(self, resource_type, value):
+        self._state.unit_cargo[self._slot, RESOURCE_TYPE_INDEX[resource_type]] = value
+
+    def keys(self):
+        return list(RESOURCE_TYPE_ORDER)
+
+    def values(self):
+        return [self[resource_type] for resource_type in RESOURCE_TYPE_ORDER]
+
+    def items(self):
+        return [(resource_type, self[resource_type]) for resource_type in RESOURCE_TYPE_ORDER]
+
+    def __iter__(self):
+        return iter(RESOURCE_TYPE_ORDER)
+
+    def __len__(self):
+        return len(RESOURCE_TYPE_ORDER)
+
+    def __eq__(self, other):
+        return dict(self.items()) == dict(other.items())
+
+
+class UnitView:
+    """
+    Mirrors Unit for a unit slot of an ArrayGameState.
+    """
+    def __init__(self, state, slot):
+        self._state = state
+        self.slot = slot
+        self.can_act_override = None
+
+    @property
+    def id(self):
+        return self._state.unit_ids[self.slot]
+
+    @property
+    def team(self):
+        return int(self._state.unit_team[self.slot])
+
+    @property
+    def type(self):
+        return int(self._state.unit_type[self.slot])
+
+    @property
+    def pos(self):
+        return Position(int(self._state.unit_x[self.slot]), int(self._state.unit_y[self.slot]))
+
+    @property
+    def cargo(self):
+        return CargoView(self._state, self.slot)
+
+    @property
+    def cooldown(self):
+        return float(self._state.unit_cooldown[self.slot])
+
+    @cooldown.setter
+    def cooldown(self, value):
+        self._state.unit_cooldown[self.slot] = value
+
+    def is_worker(self):
+        return self.type == Constants.UNIT_TYPES.WORKER
+
+    def is_cart(self):
+        return self.type == Constants.UNIT_TYPES.CART
+
+    def can_act(self):
+        if self.can_act_override is None:
+            return self.cooldown < 1
+        return self.can_act_override
+
+    def set_can_act_override(self, can_act_override):
+        self.can_act_override = can_act_override
+
+    def can_move(self):
+        return self.can_act()
+
+    def get_cargo_space_left(self):
+        capacity = self._state.configs["parameters"]["RESOURCE_CAPACITY"]
+        space_used = int(self._state.unit_cargo[self.slot].sum())
+        if self.is_worker():
+            return capacity["WORKER"] - space_used
+        return capacity["CART"] - space_used
+
+    def get_cargo_fuel_value(self):
+        rates = self._state.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]
+        cargo = self._state.unit_cargo[self.slot]
+        return sum(int(cargo[i]) * rates[name] for i, name in enumerate(RESOURCE_CONFIG_NAMES))
+
+    def get_light_upkeep(self):
+        if self.is_worker():
+            return self._state.configs["parameters"]["LIGHT_UPKEEP"]["WORKER"]
+        return self._state.configs["parameters"]["LIGHT_UPKEEP"]["CART"]
+
+    def can_build(self, game_map):
+        cell = game_map.get_cell_by_pos(self.pos)
+        return (
+            not cell.has_resource() and self.can_act() and
+            int(self._state.unit_cargo[self.slot].sum()) >= self._state.configs["parameters"]["CITY_BUILD_COST"]
+        )
+
+
+class CityView:
+    """
+    Mirrors City for a city slot of an ArrayGameState.
+    """
+    def __init__(self, state, slot):
+        self._state = state
+        self.slot = slot
+
+    @property
+    def id(self):
+        return self._state.city_ids[self.slot]
+
+    @property
+    def team(self):
+        return int(self._state.city_team[self.slot])
+
+    @property
+    def fuel(self):
+        return float(self._state.city_fuel[self.slot])
+
+    @fuel.setter
+    def fuel(self, value):
+        self._state.city_fuel[self.slot] = value
+
+    @property
+    def city_cells(self):
+        return [CellView(self._state, x, y) for x, y in self._state.get_city_tiles(self.slot)]
+
+    def get_light_upkeep(self):
+        tiles = self._state.city_tile_city == self.slot
+        parameters = self._state.configs["parameters"]
+        return (
+            int(tiles.sum()) * parameters["LIGHT_UPKEEP"]["CITY"] -
+            int(self._state.city_tile_adjacent[tiles].sum()) * parameters["CITY_ADJACENCY_BONUS"]
+        )
@@ -0,0 +1,711 @@
+"""
+Steps many games at once. The games are held as stacked ArrayGameState arrays, with a leading game axis, and
+the per-turn game logic that touches every unit, city and cell (resource distribution, deposits, night upkeep,
+tree regrowth, road development and cooldowns) runs for all games at once with numpy.
+
+Actions are validated and executed per game since they are few and their order matters, the same way as
+Game.run_turn_with_actions(). Games produce the same states, unit ids and city ids as Game given the same
+actions, which is checked by tests/test_batched_game.py.
+"""
+import random
+
+import numpy as np
+
+from .actions import MoveAction, PillageAction, ResearchAction, SpawnCartAction, SpawnCityAction, \
+    SpawnWorkerAction, TransferAction
+from .array_state import ArrayGameState, CELL_ARRAYS, CITY_ARRAYS, NO_SLOT, NO_TEAM, RESOURCE_CONFIG_NAMES, \
+    RESOURCE_TYPE_INDEX, TEAM_ARRAYS, UNIT_ARRAYS, allocate_arrays
+from .constants import Constants, LuxMatchConfigs_Default
+from .game import Game, MatchWarn
+from .game_map_vectorized import NO_RESOURCE, RESOURCE_TYPE_ORDER
+from .move_collisions import DIRECTION_DELTAS, resolve_move_collisions
+from .position import Position
+from .resource_distribution import fill_requests_in_equal_shares
+
+WOOD = RESOURCE_TYPE_INDEX[Constants.RESOURCE_TYPES.WOOD]
+COAL = RESOURCE_TYPE_INDEX[Constants.RESOURCE_TYPES.COAL]
+URANIUM = RESOURCE_TYPE_INDEX[Constants.RESOURCE_TYPES.URANIUM]
+
+# Cells a worker mines from: its own cell, then north, east, south and west
+MINING_OFFSETS_X = np.array([0, 0, 1, 0, -1])
+MINING_OFFSETS_Y = np.array([0, -1, 0, 1, 0])
+
+VALID_DIRECTIONS = [
+    Constants.DIRECTIONS.CENTER,
+    Constants.DIRECTIONS.EAST,
+    Constants.DIRECTIONS.NORTH,
+    Constants.DIRECTIONS.SOUTH,
+    Constants.DIRECTIONS.WEST,
+]
+
+
+class BatchedGameState(ArrayGameState):
+    """
+    State of one game of a BatchedGame. The arrays are views into the stacked arrays of the batch, so the object
+    api views of ArrayGameState work on batched games too. Runs the action phase of a turn for its game.
+    """
+    def __init__(self, batch, index, width, height):
+        """
+
+        :param batch: The BatchedGame.
+        :param index: Index of this game in the batch.
+        :param width:
+        :param height:
+        """
+        self.batch = batch
+        self.index = index
+        super().__init__(batch.configs, width, height, arrays=batch.get_game_arrays(index, width, height))
+
+    @property
+    def turn(self):
+        return int(self.batch.turns[self.index])
+
+    @turn.setter
+    def turn(self, value):
+        self.batch.turns[self.index] = value
+
+    def _grow(self, names, capacity):
+        # Slots are grown for all games of the batch at once to keep the arrays stacked
+        self.batch.grow(names, capacity)
+
+    def validate_command(self, cmd, accumulated_action_stats):
+        """
+        Returns the action if valid. If invalid, throws MatchWarn
+        Mirrors Game.validate_command()
+        """
+        acc = accumulated_action_stats[cmd.team]
+        parameters = self.configs["parameters"]
+        if isinstance(cmd, SpawnCityAction):
+            slot = self._get_unit_slot(cmd.team, cmd.unit_id)
+            x, y = int(self.unit_x[slot]), int(self.unit_y[slot])
+            if self.city_tile_team[y, x] != NO_TEAM:
+                raise MatchWarn("Agent tried to build CityTile on existing CityTile")
+            if self.resource_type[y, x] != NO_RESOURCE and self.resource_amount[y, x] > 0:
+                raise MatchWarn("Agent tried to build CityTile on non-empty resource tile")
+            if not self.unit_cooldown[slot] < 1:
+                raise MatchWarn("Agent tried to build CityTile with cooldown: {}".format(self.unit_cooldown[slot]))
+            cargo_total = int(self.unit_cargo[slot].sum())
+            if cargo_total < parameters["CITY_BUILD_COST"]:
+                raise MatchWarn("Agent tried to build CityTile with insufficient materials wood + coal + uranium: {}".format(cargo_total))
+            return cmd
+        elif isinstance(cmd, MoveAction):
+            slot = self._get_unit_slot(cmd.team, cmd.unit_id)
+            if not self.unit_cooldown[slot] < 1:
+                raise MatchWarn("Agent tried to move unit {} with cooldown: {}".format(cmd.unit_id, self.unit_cooldown[slot]))
+            if cmd.direction not in VALID_DIRECTIONS:
+                raise MatchWarn("Agent tried to move unit {} in invalid direction {}".format(cmd.unit_id, cmd.direction))
+            if cmd.direction != Constants.DIRECTIONS.CENTER:
+                new_pos = self._unit_pos(slot).translate(cmd.direction, 1)
+                if not self.in_map(new_pos):
+                    raise MatchWarn("Agent tried to move unit {} off map".format(cmd.unit_id))
+                team = self.city_tile_team[new_pos.y, new_pos.x]
+                if team != NO_TEAM and team != cmd.team:
+                    raise MatchWarn("Agent tried to move unit {} onto opponent CityTile".format(cmd.unit_id))
+            return cmd
+        elif isinstance(cmd, SpawnWorkerAction) or isinstance(cmd, SpawnCartAction):
+            if not self.in_map(Position(cmd.x, cmd.y)):
+                raise MatchWarn("Agent tried to build unit with invalid coordinates")
+            if self.city_tile_team[cmd.y, cmd.x] != cmd.team:
+                raise MatchWarn("Agent tried to build unit on tile ({}, {}) that it does not own".format(cmd.x, cmd.y))
+            if not self.city_tile_cooldown[cmd.y, cmd.x] < 1:
+                raise MatchWarn("Agent tried to build unit on tile ({}, {}) but CityTile still with cooldown of {}".format(cmd.x, cmd.y, self.city_tile_cooldown[cmd.y, cmd.x]))
+            if acc["units"] + acc["cartsBuilt"] + acc["workersBuilt"] >= acc["cityTiles"]:
+                raise MatchWarn("Agent tried to build unit on tile ({}, {}) but unit cap reached. Build more CityTiles!".format(cmd.x, cmd.y))
+            if isinstance(cmd, SpawnCartAction):
+                acc["cartsBuilt"] += 1
+            else:
+                acc["workersBuilt"] += 1
+            return cmd
+        else:
+            # no check, like the Game
+            return cmd
+
+    def _get_unit_slot(self, team, unit_id):
+        slot = self.unit_slot_by_id.get(unit_id)
+        if slot is None or self.unit_team[slot] != team:
+            raise MatchWarn("Agent tried to use unit {} that it does not own".format(unit_id))
+        return slot
+
+    def _unit_pos(self, slot):
+        return Position(int(self.unit_x[slot]), int(self.unit_y[slot]))
+
+    def handle_movement_actions(self, actions):
+        """
+        Process given move actions and returns a pruned array of actions that can all be executed with no collisions
+        Mirrors Game.handle_movement_actions().
+        """
+        width = self.width
+        height = self.height
+        unit_ids = []
+        sources = []
+        targets = []
+        for action in actions:
+            slot = self.unit_slot_by_id[action.unit_id]
+            x = int(self.unit_x[slot])
+            y = int(self.unit_y[slot])
+            dx, dy = DIRECTION_DELTAS[action.direction]
+            unit_ids.append(action.unit_id)
+            sources.append(y * width + x)
+            targets.append((y + dy) * width + x + dx if 0 <= x + dx < width and 0 <= y + dy < height else None)
+
+        pruned = resolve_move_collisions(
+            unit_ids,
+            sources,
+            targets,
+            lambda cell: self.city_tile_team[cell // width, cell % width] != NO_TEAM,
+            lambda cell: list(self.units_at(cell % width, cell // width)),
+        )
+        return [actions[i] for i in pruned]
+
+    def transfer_resources(self, team, source_id, destination_id, resource_type, amount):
+        """
+        Mirrors Game.transfer_resources(). Raises KeyError for unknown units or resource types, like the Game.
+        """
+        source = self.get_unit(team, source_id).slot
+        destination = self.get_unit(team, destination_id).slot
+        resource_index = RESOURCE_TYPE_INDEX[resource_type]
+        transfer_amount = min(
+            amount,
+            int(self.unit_cargo[source, resource_index]),
+            self.get_cargo_space_left(destination),
+        )
+        self.unit_cargo[source, resource_index] -= transfer_amount
+        self.unit_cargo[destination, resource_index] += transfer_amount
+
+    def get_cargo_space_left(self, slot):
+        capacity = self.configs["parameters"]["RESOURCE_CAPACITY"]
+        space_used = int(self.unit_cargo[slot].sum())
+        if self.unit_type[slot] == Constants.UNIT_TYPES.WORKER:
+            return capacity["WORKER"] - space_used
+        return capacity["CART"] - space_used
+
+    def expend_resources_for_city(self, slot):
+        """
+        Mirrors Worker.expend_resources_for_city()
+        """
+        cost = self.configs["parameters"]["CITY_BUILD_COST"]
+        spent_resources = 0
+        for i in range(len(RESOURCE_TYPE_ORDER)):
+            cargo = int(self.unit_cargo[slot, i])
+            if spent_resources + cargo > cost:
+                self.unit_cargo[slot, i] -= cost - spent_resources
+                break
+            spent_resources += cargo
+            self.unit_cargo[slot, i] = 0
+
+    def run_actions(self, actions):
+        """
+        Runs the action phase of a turn: validates the actions and executes them for the city tiles and units
+        that got exactly one action, in the same order as Game.run_turn_with_actions(). City tile cooldowns and
+        cart road development are left to the BatchedGame.
+        :param actions: List of Action objects.
+        :return: Set of unit slots of carts whose turn failed, which don't develop roads this turn.
+        """
+        parameters = self.configs["parameters"]
+
+        # Unit caps only change once the actions run
+        units = np.bincount(self.unit_team[self.unit_alive], minlength=2)
+        city_tiles = np.bincount(self.city_tile_team[self.city_tile_team != NO_TEAM], minlength=2)
+        accumulated_action_stats = {
+            team: {"units": int(units[team]), "cityTiles": int(city_tiles[team]), "workersBuilt": 0,
+                   "cartsBuilt": 0}
+            for team in [Constants.TEAM.A, Constants.TEAM.B]
+        }
+
+        actions_map = {}
+        for action in actions:
+            try:
+                action = self.validate_command(action, accumulated_action_stats)
+            except MatchWarn:
+                continue
+            if action is not None:
+                actions_map.setdefault(action.action, []).append(action)
+
+        # give units and city tiles their validated actions, in the order of the Game
+        unit_actions = {}
+        tile_actions = {}
+        for action_type in [Constants.ACTIONS.BUILD_CITY, Constants.ACTIONS.BUILD_WORKER,
+                            Constants.ACTIONS.BUILD_CART, Constants.ACTIONS.PILLAGE, Constants.ACTIONS.RESEARCH,
+                            Constants.ACTIONS.TRANSFER]:
+            for action in actions_map.get(action_type, []):
+                if action_type in [Constants.ACTIONS.BUILD_WORKER, Constants.ACTIONS.BUILD_CART,
+                                   Constants.ACTIONS.RESEARCH]:
+                    if not (0 <= action.x < self.width and 0 <= action.y < self.height) or \
+                            self.city_tile_team[action.y, action.x] == NO_TEAM:
+                        raise MatchWarn("City tile action on ({}, {}) which is not a CityTile".format(action.x, action.y))
+                    tile_actions.setdefault((action.x, action.y), []).append(action)
+                elif action_type == Constants.ACTIONS.TRANSFER:
+                    unit_actions.setdefault(self.get_unit(action.team, action.source_id).slot, []).append(action)
+                else:
+                    unit_actions.setdefault(self.get_unit(action.team, action.unit_id).slot, []).append(action)
+
+        if Constants.ACTIONS.MOVE in actions_map:
+            for action in self.handle_movement_actions(actions_map[Constants.ACTIONS.MOVE]):
+                if action.direction != Constants.DIRECTIONS.CENTER:
+                    unit_actions.setdefault(self.get_unit(action.team, action.unit_id).slot, []).append(action)
+
+        # city tiles act in the order of their cities, then the order of the tiles in the city
+        tiles = sorted(
+            tile_actions.items(),
+            key=lambda item: (self.city_tile_city[item[0][1], item[0][0]], self.city_tile_order[item[0][1], item[0][0]])
+        )
+        for (x, y), current_actions in tiles:
+            if len(current_actions) != 1:
+                continue
+            action = current_actions[0]
+            if isinstance(action, SpawnCartAction):
+                self.spawn_unit(action.team, Constants.UNIT_TYPES.CART, x, y)
+                self.city_tile_cooldown[y, x] = parameters["CITY_ACTION_COOLDOWN"]
+            elif isinstance(action, SpawnWorkerAction):
+                self.spawn_unit(action.team, Constants.UNIT_TYPES.WORKER, x, y)
+                self.city_tile_cooldown[y, x] = parameters["CITY_ACTION_COOLDOWN"]
+            elif isinstance(action, ResearchAction):
+                self.city_tile_cooldown[y, x] = parameters["CITY_ACTION_COOLDOWN"]
+                team = self.city_tile_team[y, x]
+                self.research_points[team] += 1
+                if self.research_points[team] >= parameters["RESEARCH_REQUIREMENTS"]["COAL"]:
+                    self.researched[team, COAL] = True
+                if self.research_points[team] >= parameters["RESEARCH_REQUIREMENTS"]["URANIUM"]:
+                    self.researched[team, URANIUM] = True
+
+        # units act team by team, in creation order
+        cooldown_multiplier = 2 if self.is_night() else 1
+        failed_carts = set()
+        for slot in sorted(unit_actions, key=lambda slot: (self.unit_team[slot], slot)):
+            current_actions = unit_actions[slot]
+            if len(current_actions) != 1:
+                continue
+            action = current_actions[0]
+            is_worker = self.unit_type[slot] == Constants.UNIT_TYPES.WORKER
+            try:
+                if isinstance(action, MoveAction):
+                    pos = self._unit_pos(slot).translate(action.direction, 1)
+                    self.move_unit(slot, pos.x, pos.y)
+                elif isinstance(action, TransferAction):
+                    self.transfer_resources(action.team, action.source_id, action.destination_id,
+                                            action.resource_type, action.amount)
+                elif is_worker and isinstance(action, SpawnCityAction):
+                    self.spawn_city_tile(action.team, int(self.unit_x[slot]), int(self.unit_y[slot]))
+                    self.expend_resources_for_city(slot)
+                elif is_worker and isinstance(action, PillageAction):
+                    x, y = int(self.unit_x[slot]), int(self.unit_y[slot])
+                    self.road[y, x] = max(self.road[y, x] - parameters["PILLAGE_RATE"], parameters["MIN_ROAD"])
+                elif is_worker:
+                    continue
+            except KeyError:
+                # the Game logs and skips the rest of the unit's turn
+                if not is_worker:
+                    failed_carts.add(slot)
+                continue
+
+            unit_type = "WORKER" if is_worker else "CART"
+            self.unit_cooldown[slot] += parameters["UNIT_ACTION_COOLDOWN"][unit_type] * cooldown_multiplier
+
+        return failed_carts
+
+
+class BatchedGame:
+    """
+    Holds many games as stacked arrays and runs their turns at once. Maps smaller than the batch map size are
+    padded, padding cells have no resources or city tiles and no unit ever enters them.
+    """
+    def __init__(self, configs=None, n_games=None, games=None, max_width=32, max_height=32, unit_capacity=64,
+                 city_capacity=32):
+        """
+
+        :param configs: Game configs, applied on top of the default configs.
+        :param n_games: Number of games. New games are generated if no games are specified.
+        :param games: Optional list of Game objects to load into the batch.
+        :param max_width: Width of the largest map the batch can hold.
+        :param max_height: Height of the largest map the batch can hold.
+        :param unit_capacity: Initial number of unit slots per game.
+        :param city_capacity: Initial number of city slots per game.
+        """
+        self.configs = dict(LuxMatchConfigs_Default)
+        if configs is not None:
+            self.configs.update(configs)
+        if games is not None:
+            n_games = len(games)
+        assert n_games is not None, "Specify the number of games or the games to load"
+
+        self.n_games = n_games
+        self.max_width = max_width
+        self.max_height = max_height
+        self.arrays = allocate_arrays(max_height, max_width, unit_capacity, city_capacity, (n_games,))
+        self.turns = np.zeros(n_games, dtype=np.int64)
+        self.widths = np.zeros(n_games, dtype=np.int64)
+        self.heights = np.zeros(n_games, dtype=np.int64)
+        self.states = [None] * n_games
+        self._clear_game(slice(None))
+
+        for index in range(n_games):
+            if games is not None:
+                self.load_game(index, games[index])
+            else:
+                self.reset(index)
+
+    def get_game_arrays(self, index, width, height):
+        """
+        :return: dict of the arrays of one game, as views into the stacked arrays.
+        """
+        arrays = {}
+        for name, array in self.arrays.items():
+            if name in CELL_ARRAYS:
+                arrays[name] = array[index, :height, :width]
+            else:
+                arrays[name] = array[index]
+        return arrays
+
+    def grow(self, names, capacity):
+        """
+        Grows the slot arrays of all games to at least the specified capacity.
+        """
+        for name in names:
+            old = self.arrays[name]
+            new_capacity = max(capacity, 2 * old.shape[1])
+            new = np.zeros((old.shape[0], new_capacity) + old.shape[2:], dtype=old.dtype)
+            new[:, :old.shape[1]] = old
+            self.arrays[name] = new
+        for index, state in enumerate(self.states):
+            if state is not None:
+                state.bind_arrays(self.get_game_arrays(index, state.width, state.height))
+
+    def _clear_game(self, index):
+        """
+        Clears the whole padded area of a game.
+        """
+        arrays = self.arrays
+        arrays["resource_type"][index] = NO_RESOURCE
+        arrays["city_tile_team"][index] = NO_TEAM
+        arrays["city_tile_city"][index] = NO_SLOT
+        for name in ["resource_amount", "road", "city_tile_cooldown", "city_tile_adjacent", "city_tile_order"]:
+            arrays[name][index] = 0
+        for name in list(UNIT_ARRAYS) + list(CITY_ARRAYS) + list(TEAM_ARRAYS):
+            arrays[name][index] = 0
+
+    def load_game(self, index, game):
+        """
+        Replaces a game of the batch with the state of a Game.
+        :param index: Index of the game in the batch.
+        :param game: Game object.
+        """
+        width, height = game.map.width, game.map.height
+        assert width <= self.max_width and height <= self.max_height, "Map is larger than the batch map size"
+        self._clear_game(index)
+        self.widths[index] = width
+        self.heights[index] = height
+        self.states[index] = BatchedGameState(self, index, width, height)
+        self.states[index].load_game(game)
+
+    def reset(self, index, seed=None):
+        """
+        Replaces a game of the batch with a newly generated game.
+        :param index: Index of the game in the batch.
+        :param seed: Map seed. Defaults to the seed of the configs.
+        """
+        configs = dict(self.configs)
+        if seed is not None:
+            configs["seed"] = seed
+        self.load_game(index, Game(configs))
+
+    def is_night(self):
+        """
+        :return: Bool array of whether it's night in each game.
+        """
+        day_length = self.configs["parameters"]["DAY_LENGTH"]
+        cycle_length = day_length + self.configs["parameters"]["NIGHT_LENGTH"]
+        return (self.turns % cycle_length) >= day_length
+
+    def run_turn_with_actions(self, actions):
+        """
+        Runs a single turn of every game with the specified actions
+        :param actions: List of the list of actions of each game.
+        :return: Bool array of whether each game is over. Finished games should be reset or loaded with a new game.
+        """
+        failed_carts = []
+        for state, game_actions in zip(self.states, actions):
+            failed_carts.append(state.run_actions(game_actions))
+
+        self.run_city_tile_cooldowns()
+        self.develop_roads(failed_carts)
+
+        # distribute all resources in order of decreasing fuel efficiency
+        for resource_index in [URANIUM, COAL, WOOD]:
+            self.handle_resource_type_release(resource_index)
+
+        self.handle_resource_deposits()
+        self.handle_night()
+        self.regenerate_trees()
+
+        match_over = self.match_over()
+        self.turns += 1
+        self.run_cooldowns()
+        return match_over
+
+    def _unit_cells(self, mask):
+        """
+        :return: (game indices, unit slots, x, y) of the units in the mask
+        """
+        games, slots = np.nonzero(mask)
+        return games, slots, self.arrays["unit_x"][games, slots], self.arrays["unit_y"][games, slots]
+
+    def run_city_tile_cooldowns(self):
+        cooldown = self.arrays["city_tile_cooldown"]
+        tiles = (self.arrays["city_tile_team"] != NO_TEAM) & (cooldown > 0)
+        cooldown[tiles] -= 1
+
+    def develop_roads(self, failed_carts):
+        """
+        Carts develop the road of the cell they end their turn on.
+        :param failed_carts: Set of the unit slots of carts that don't develop roads, for each game.
+        """
+        parameters = self.configs["parameters"]
+        arrays = self.arrays
+        carts = arrays["unit_alive"] & (arrays["unit_type"] == Constants.UNIT_TYPES.CART)
+        for index, slots in enumerate(failed_carts):
+            for slot in slots:
+                carts[index, slot] = False
+        games, slots, xs, ys = self._unit_cells(carts)
+        if len(games) == 0:
+            return
+
+        development = np.zeros(arrays["road"].shape, dtype=np.float64)
+        np.add.at(development, (games, ys, xs), parameters["CART_ROAD_DEVELOPMENT_RATE"])
+        cells = (development > 0) & (arrays["city_tile_team"] == NO_TEAM)
+        road = arrays["road"]
+        road[cells] = np.minimum(road[cells] + development[cells], parameters["MAX_ROAD"])
+
+    def handle_resource_type_release(self, resource_index):
+        """
+        Workers request resources from their cell and the adjacent cells, and the requests of each cell are
+        filled in equal shares. Mirrors Game.handle_resource_type_release() for all games at once.
+        """
+        parameters = self.configs["parameters"]
+        arrays = self.arrays
+        name = RESOURCE_CONFIG_NAMES[resource_index]
+        mining_rate = parameters["WORKER_COLLECTION_RATE"][name]
+        conversion_rate = parameters["RESOURCE_TO_FUEL_RATE"][name]
+
+        unit_games = np.arange(self.n_games)[:, None]
+        team = arrays["unit_team"].astype(np.intp).clip(0, 1)
+        researched = arrays["researched"][unit_games, team, resource_index]
+        workers = arrays["unit_alive"] & (arrays["unit_type"] == Constants.UNIT_TYPES.WORKER) & researched
+        games, slots, xs, ys = self._unit_cells(workers)
+        if len(games) == 0:
+            return
+
+        # minable cells around each worker
+        cell_xs = xs[:, None] + MINING_OFFSETS_X
+        cell_ys = ys[:, None] + MINING_OFFSETS_Y
+        in_map = (
+            (cell_xs >= 0) & (cell_ys >= 0) &
+            (cell_xs < self.widths[games][:, None]) & (cell_ys < self.heights[games][:, None])
+        )
+        cell_xs = cell_xs.clip(0, self.max_width - 1)
+        cell_ys = cell_ys.clip(0, self.max_height - 1)
+        cell_games = np.broadcast_to(games[:, None], cell_xs.shape)
+        minable = (
+            in_map &
+            (arrays["resource_type"][cell_games, cell_ys, cell_xs] == resource_index) &
+            (arrays["resource_amount"][cell_games, cell_ys, cell_xs] > 0)
+        )
+        minable_count = minable.sum(axis=1)
+        space_left = parameters["RESOURCE_CAPACITY"]["WORKER"] - arrays["unit_cargo"][games, slots].sum(axis=1)
+        mine_amount = np.minimum(-(-space_left // np.maximum(minable_count, 1)), mining_rate)
+
+        # workers on a city tile mine for the city, and identical requests for a city are made once
+        on_city = arrays["city_tile_team"][games, ys, xs] != NO_TEAM
+        recipient = np.where(on_city, arrays["city_tile_city"][games, ys, xs], slots)
+        workers_index, offsets_index = np.nonzero(minable)
+        if len(workers_index) == 0:
+            return
+        requests = np.stack([
+            games[workers_index],
+            cell_ys[workers_index, offsets_index],
+            cell_xs[workers_index, offsets_index],
+            on_city[workers_index],
+            recipient[workers_index],
+            ys[workers_index],
+            xs[workers_index],
+            mine_amount[workers_index],
+        ], axis=1).astype(np.int64)
+        requests = np.unique(requests, axis=0)
+        req_games, req_ys, req_xs, req_on_city, req_recipient = requests[:, :5].T
+        req_amounts = requests[:, 7]
+
+        # lay out the requests of each cell in a row, the rows are sorted by cell
+        new_cell = np.ones(len(requests), dtype=bool)
+        new_cell[1:] = np.any(requests[1:, :3] != requests[:-1, :3], axis=1)
+        cell_index = np.cumsum(new_cell) - 1
+        cell_starts = np.flatnonzero(new_cell)
+        column = np.arange(len(requests)) - cell_starts[cell_index]
+        n_cells = len(cell_starts)
+        width = int(column.max()) + 1
+
+        amounts = np.zeros((n_cells, width), dtype=np.int64)
+        amounts[cell_index, column] = req_amounts
+        active = np.zeros((n_cells, width), dtype=bool)
+        active[cell_index, column] = True
+        cell_games = req_games[cell_starts]
+        cell_ys = req_ys[cell_starts]
+        cell_xs = req_xs[cell_starts]
+        amount_left = arrays["resource_amount"][cell_games, cell_ys, cell_xs]
+        filled, amount_left = fill_requests_in_equal_shares(amounts, active, amount_left)
+
+        arrays["resource_amount"][cell_games, cell_ys, cell_xs] = amount_left
+
+        req_filled = filled[cell_index, column]
+        city_requests = req_on_city == 1
+        np.add.at(
+            arrays["city_fuel"],
+            (req_games[city_requests], req_recipient[city_requests]),
+            req_filled[city_requests] * conversion_rate
+        )
+
+        # a worker receives what fits in its cargo, the rest is wasted
+        worker_requests = ~city_requests
+        received = np.zeros(arrays["unit_alive"].shape, dtype=np.int64)
+        np.add.at(received, (req_games[worker_requests], req_recipient[worker_requests]), req_filled[worker_requests])
+        space = np.zeros(arrays["unit_alive"].shape, dtype=np.int64)
+        space[games, slots] = space_left
+        arrays["unit_cargo"][..., resource_index] += np.minimum(received, space).astype(np.int32)
+
+    def _cargo_fuel_value(self, cargo):
+        rates = self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]
+        return sum(cargo[..., i].astype(np.int64) * rates[name] for i, name in enumerate(RESOURCE_CONFIG_NAMES))
+
+    def handle_resource_deposits(self):
+        """
+        Units on a city tile of their team deposit all their cargo as fuel. Mirrors Game.handle_resource_deposit()
+        """
+        arrays = self.arrays
+        games, slots, xs, ys = self._unit_cells(arrays["unit_alive"])
+        teams = arrays["unit_team"][games, slots]
+        on_city = arrays["city_tile_team"][games, ys, xs] == teams
+        games, slots, xs, ys, teams = games[on_city], slots[on_city], xs[on_city], ys[on_city], teams[on_city]
+
+        fuel_gained = self._cargo_fuel_value(arrays["unit_cargo"][games, slots])
+        np.add.at(arrays["city_fuel"], (games, arrays["city_tile_city"][games, ys, xs]), fuel_gained)
+        np.add.at(arrays["fuel_generated"], (games, teams), fuel_gained)
+        arrays["unit_cargo"][games, slots] = 0
+
+    def handle_night(self):
+        """
+        Cities burn fuel or are destroyed, and units outside of cities burn cargo or are destroyed, in the games
+        where it's night. Mirrors Game.handle_night()
+        """
+        parameters = self.configs["parameters"]
+        arrays = self.arrays
+        night = self.is_night()
+        if not night.any():
+            return
+
+        # cities
+        tile_games, tile_ys, tile_xs = np.nonzero(arrays["city_tile_team"] != NO_TEAM)
+        tile_cities = arrays["city_tile_city"][tile_games, tile_ys, tile_xs]
+        upkeep = np.zeros(arrays["city_fuel"].shape, dtype=np.int64)
+        np.add.at(
+            upkeep,
+            (tile_games, tile_cities),
+            parameters["LIGHT_UPKEEP"]["CITY"] -
+            arrays["city_tile_adjacent"][tile_games, tile_ys, tile_xs].astype(np.int64) *
+            parameters["CITY_ADJACENCY_BONUS"]
+        )
+        cities = arrays["city_alive"] & night[:, None]
+        destroyed = cities & (arrays["city_fuel"] < upkeep)
+        survived = cities & ~destroyed
+        arrays["city_fuel"][survived] -= upkeep[survived]
+
+        if destroyed.any():
+            tiles = destroyed[tile_games, tile_cities]
+            cells = (tile_games[tiles], tile_ys[tiles], tile_xs[tiles])
+            arrays["city_tile_team"][cells] = NO_TEAM
+            arrays["city_tile_city"][cells] = NO_SLOT
+            arrays["city_tile_cooldown"][cells] = 0
+            arrays["city_tile_adjacent"][cells] = 0
+            arrays["road"][cells] = parameters["MIN_ROAD"]
+            for index, slot in zip(*np.nonzero(destroyed)):
+                self.states[index]._free_city_slot(slot)
+
+        # units outside of cities
+        units = arrays["unit_alive"] & night[:, None]
+        games, slots, xs, ys = self._unit_cells(units)
+        outside = arrays["city_tile_team"][games, ys, xs] == NO_TEAM
+        games, slots = games[outside], slots[outside]
+        if len(games) == 0:
+            return
+
+        is_worker = arrays["unit_type"][games, slots] == Constants.UNIT_TYPES.WORKER
+        fuel_needed = np.where(
+            is_worker, parameters["LIGHT_UPKEEP"]["WORKER"], parameters["LIGHT_UPKEEP"]["CART"]
+        ).astype(np.int64)
+        cargo = arrays["unit_cargo"][games, slots].astype(np.int64)
+        # burn wood, then coal, then uranium
+        for i, name in enumerate(RESOURCE_CONFIG_NAMES):
+            rate = parameters["RESOURCE_TO_FUEL_RATE"][name]
+            needed = -(-fuel_needed // rate)
+            used = np.where(fuel_needed > 0, np.minimum(cargo[:, i], needed), 0)
+            fuel_needed -= used * rate
+            cargo[:, i] -= used
+        arrays["unit_cargo"][games, slots] = cargo
+
+        died = fuel_needed > 0
+        for index, slot in zip(games[died], slots[died]):
+            self.states[index].remove_unit(slot)
+
+    def regenerate_trees(self):
+        """
+        Mirrors Game.regenerate_trees()
+        """
+        parameters = self.configs["parameters"]
+        amount = self.arrays["resource_amount"]
+        trees = (
+            (self.arrays["resource_type"] == WOOD) & (amount > 0) & (amount < parameters["MAX_WOOD_AMOUNT"])
+        )
+        amount[trees] = np.ceil(
+            np.minimum(amount[trees] * parameters["WOOD_GROWTH_RATE"], parameters["MAX_WOOD_AMOUNT"])
+        )
+
+    def match_over(self):
+        """
+        :return: Bool array of whether each game is over. Mirrors Game.match_over()
+        """
+        arrays = self.arrays
+        over = self.turns >= self.configs["parameters"]["MAX_DAYS"] - 1
+        for team in [Constants.TEAM.A, Constants.TEAM.B]:
+            units = (arrays["unit_alive"] & (arrays["unit_team"] == team)).sum(axis=1)
+            cities = (arrays["city_alive"] & (arrays["city_team"] == team)).sum(axis=1)
+            over |= units + cities == 0
+        return over
+
+    def run_cooldowns(self):
+        """
+        Mirrors Game.run_cooldowns()
+        """
+        arrays = self.arrays
+        games, slots, xs, ys = self._unit_cells(arrays["unit_alive"])
+        road = np.where(
+            arrays["city_tile_team"][games, ys, xs] != NO_TEAM,
+            self.configs["parameters"]["MAX_ROAD"],
+            arrays["road"][games, ys, xs]
+        )
+        cooldown = arrays["unit_cooldown"][games, slots] - road
+        arrays["unit_cooldown"][games, slots] = np.maximum(cooldown - 1, 0)
+
+    def get_winning_team(self, index):
+        """
+        Mirrors Game.get_winning_team()
+        :param index: Index of the game in the batch.
+        """
+        state = self.states[index]
+        city_tiles = np.bincount(state.city_tile_team[state.city_tile_team != NO_TEAM], minlength=2)
+        units = np.bincount(state.unit_team[state.unit_alive], minlength=2)
+        for counts in [city_tiles, units, state.fuel_generated]:
+            if counts[Constants.TEAM.A] > counts[Constants.TEAM.B]:
+                return Constants.TEAM.A
+            elif counts[Constants.TEAM.A] < counts[Constants.TEAM.B]:
+                return Constants.TEAM.B
+
+        if random.random() > 0.5:
+            return Constants.TEAM.A
+        return Constants.TEAM.B
@@ -1,11 +1,15 @@
 """
 Implements /src/GameMap/cell.ts
 """
+from types import MappingProxyType
 
 from .city import CityTile
 from .position import Position
 from .resource import Resource
 
+# Units of every cell without units, the units dict of a cell is only allocated by add_unit()
+NO_UNITS = MappingProxyType({})
+
 """
 /**
  * Cell class for map cells
@@ -18,6 +22,8 @@ from .resource import Resource
 
 
 class Cell:
+    __slots__ = ("pos", "resource", "city_tile", "configs", "_units", "road")
+
     def __init__(self, x, y, configs):
         """
 
@@ -29,9 +35,40 @@ class Cell:
         self.resource: Resource = None
         self.city_tile = None
         self.configs = configs
-        self.units = {}
+        self._units = None
         self.road = configs["parameters"]["MIN_ROAD"]
 
+    @property
+    def units(self):
+        """
+        Read-only view of the units on this cell by unit id, whether or not the cell has units. Use add_unit() and
+        remove_unit() to change them.
+        """
+        if self._units is None:
+            return NO_UNITS
+        return MappingProxyType(self._units)
+
+    def add_unit(self, unit):
+        """
+        Puts a unit on this cell
+        :param unit:
+        """
+        if self._units is None:
+            self._units = {unit.id: unit}
+        else:
+            self._units[unit.id] = unit
+
+    def remove_unit(self, unit_id):
+        """
+        Takes a unit off this cell
+        :param unit_id:
+        :return: The unit.
+        """
+        unit = self._units.pop(unit_id)
+        if len(self._units) == 0:
+            self._units = None
+        return unit
+
     def set_resource(self, resource_type, amount):
         """
         
@@ -72,7 +109,7 @@ class Cell:
 
         :return:
         """
-        return len(self.units) != 0
+        return self._units is not None
 
     def get_road(self):
         """
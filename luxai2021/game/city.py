@@ -58,6 +58,8 @@ class City:
 
 
 class CityTile(Actionable):
+    __slots__ = ("team", "pos", "city_id", "adjacent_city_tiles")
+
     def __init__(self, team, configs, cooldown=0.0) -> None:
         self.team = team
         self.pos = None
@@ -0,0 +1,100 @@
+"""
+Table-driven parsing of agent commands and observation updates. Each command and update identifier maps to a
+parser that converts all of its tokens at once, so a message is dispatched with a single dict lookup.
+"""
+from .actions import MoveAction, PillageAction, ResearchAction, SpawnCartAction, SpawnCityAction, \
+    SpawnWorkerAction, TransferAction
+from .constants import Constants
+
+ACTIONS = Constants.ACTIONS
+INPUT_CONSTANTS = Constants.INPUT_CONSTANTS
+
+
+def _pillage(game, team, parts):
+    # Raises a KeyError if the unit doesn't exist
+    game.get_unit(team, parts[0])
+    return PillageAction(team, parts[0])
+
+
+def _build_city(game, team, parts):
+    # Raises a KeyError if the unit doesn't exist
+    game.get_unit(team, parts[0])
+    return SpawnCityAction(team, parts[0])
+
+
+"""
+Command token -> (number of arguments, function of (game, team, argument tokens) to the action)
+"""
+COMMAND_PARSERS = {
+    ACTIONS.PILLAGE: (1, _pillage),
+    ACTIONS.BUILD_CITY: (1, _build_city),
+    ACTIONS.BUILD_CART: (2, lambda game, team, p: SpawnCartAction(team, None, int(p[0]), int(p[1]))),
+    ACTIONS.BUILD_WORKER: (2, lambda game, team, p: SpawnWorkerAction(team, None, int(p[0]), int(p[1]))),
+    ACTIONS.MOVE: (2, lambda game, team, p: MoveAction(team, p[0], p[1])),
+    ACTIONS.RESEARCH: (2, lambda game, team, p: ResearchAction(team, int(p[0]), int(p[1]), None)),
+    ACTIONS.TRANSFER: (4, lambda game, team, p: TransferAction(team, p[0], p[1], p[2], int(p[3]))),
+}
+
+
+def parse_command(game, comm, team):
+    """
+    Converts an agent command into an action.
+    :param game:
+    :param comm: Command string, or command already split into tokens.
+    :param team:
+    :return: Action.
+    :raises KeyError: The command is for a unit that doesn't exist.
+    :raises Exception: The command is invalid or malformed.
+    """
+    parts = comm.split(" ") if isinstance(comm, str) else comm
+    if len(parts) <= 1:
+        raise Exception(f"Agent {team} sent invalid command; turn {game.state['turn']}; cmd: {comm}")
+
+    parser = COMMAND_PARSERS.get(parts[0])
+    if parser is None:
+        raise Exception(f"unknown action {parts[0]}")
+    argument_count, build = parser
+    if len(parts) != argument_count + 1:
+        raise Exception(
+            f"Agent {team} sent malformed command: {comm}; turn {game.state['turn']}; cmd: {comm}")
+    return build(game, team, parts[1:])
+
+
+"""
+Update identifier -> function of the update tokens to the tuple of converted values, without the identifier.
+"""
+UPDATE_PARSERS = {
+    # team, research points
+    INPUT_CONSTANTS.RESEARCH_POINTS: lambda s: (int(s[1]), int(s[2])),
+    # resource type, x, y, amount
+    INPUT_CONSTANTS.RESOURCES: lambda s: (s[1], int(s[2]), int(s[3]), int(float(s[4]))),
+    # unit type, team, unit id, x, y, cooldown, wood, coal, uranium
+    INPUT_CONSTANTS.UNITS: lambda s: (int(s[1]), int(s[2]), s[3], int(s[4]), int(s[5]), float(s[6]),
+                                      int(s[7]), int(s[8]), int(s[9])),
+    # team, city id, fuel, light upkeep
+    INPUT_CONSTANTS.CITY: lambda s: (int(s[1]), s[2], float(s[3]), float(s[4])),
+    # team, city id, x, y, cooldown
+    INPUT_CONSTANTS.CITY_TILES: lambda s: (int(s[1]), s[2], int(s[3]), int(s[4]), float(s[5])),
+    # x, y, road
+    INPUT_CONSTANTS.ROADS: lambda s: (int(s[1]), int(s[2]), float(s[3])),
+}
+
+
+def parse_updates(updates):
+    """
+    Converts the updates of an observation up to the "D_DONE" update. Updates with other identifiers, like the
+    player id and map size lines of the first observation, are skipped.
+    :param updates: List of update strings, or of updates already split into tokens.
+    :return: List of (identifier, values) tuples.
+    """
+    parsed = []
+    parsers = UPDATE_PARSERS
+    for update in updates:
+        strings = update.split(" ") if isinstance(update, str) else update
+        identifier = strings[0]
+        parser = parsers.get(identifier)
+        if parser is not None:
+            parsed.append((identifier, parser(strings)))
+        elif identifier == INPUT_CONSTANTS.DONE:
+            break
+    return parsed
@@ -92,5 +92,11 @@ LuxMatchConfigs_Default = {
     "compressReplay": False,
     "debugAnnotations": False,
     "statefulReplay": False,
+    "mapCacheSize": 64,  # Minimum size of the process-wide cache of generated maps by seed. 0 disables caching.
+    "vectorizedMapGen": False,  # Generate maps with numpy. Produces the same maps as the reference generator.
+    "headless": False,  # Skip replays, logging and the stats that don't decide the winner, for training.
+    "logFile": None,  # Game log file, None keeps the log in memory. "{pid}" is replaced by the process id, eg "log_{pid}.txt".
+    "errorLogFile": None,  # Match error log file, same as logFile.
+    "logRateLimit": None,  # Maximum number of lines per second written to each log file, the rest are dropped.
     "parameters": GAME_CONSTANTS["PARAMETERS"],
 }
@@ -1,21 +1,49 @@
 import os
-from luxai2021.game.replay import Replay
+from luxai2021.game.replay import Replay, StreamingReplay
 import math
 import random
 import sys
 import traceback
+from collections import namedtuple
 
-from luxai2021.game.actions import MoveAction, PillageAction, SpawnCartAction, SpawnCityAction, SpawnWorkerAction, \
-    ResearchAction, TransferAction
+import numpy as np
+
+from luxai2021.game.actions import MoveAction, SpawnCartAction, SpawnCityAction, SpawnWorkerAction
+from .actionable import NO_ACTIONS
 from .city import City
+from .command_parser import parse_command, parse_updates
 from .position import Position
 from .constants import Constants, LuxMatchConfigs_Default
 from .game_map import GameMap
-from .unit import Worker, Cart
+from .log_sink import open_log_sink
+from .move_collisions import DIRECTION_DELTAS, resolve_move_collisions
+from .resource_distribution import fill_requests_in_equal_shares
+from .spatial_index import SpatialIndex
+from .unit import Cargo, Worker, Cart
 
 INPUT_CONSTANTS = Constants.INPUT_CONSTANTS
 DIRECTIONS = Constants.DIRECTIONS
 
+"""
+State of a game between turns, as created by Game.snapshot(). Cells are numbered y * width + x.
+Resources are (cell, type, amount) in the order of the resource index, followed by the depleted resources.
+Roads are the (cell, road) of the cells with more than the minimum road. Cities are (id, team, fuel, tiles)
+with tiles the (cell, cooldown, adjacent_city_tiles) of each city tile. Units are (team, type, id, x, y,
+cooldown, wood, coal, uranium) in the order of the units of each team. Teams are the (research_points,
+researched) of each team.
+"""
+GameSnapshot = namedtuple("GameSnapshot", [
+    "width", "height", "turn", "global_unit_id_count", "global_city_id_count", "teams", "stats",
+    "resources", "roads", "cells_with_roads", "cities", "units",
+])
+
+
+def _copy_dict(d):
+    """
+    Copies a dict of nested dicts.
+    """
+    return {key: _copy_dict(value) if isinstance(value, dict) else value for key, value in d.items()}
+
 class MatchWarn(Exception):
     pass
 
@@ -32,10 +60,11 @@ class Game:
         self.agents = []
         self.stop_replay_logging()
         self.reset()
-        self.log_file = None
+        self.log_sink = None  # LogSink, opened on the first log
         
 
-    def start_replay_logging(self, stateful=False, replay_folder="./replays/", replay_filename_prefix="replay"):
+    def start_replay_logging(self, stateful=False, replay_folder="./replays/", replay_filename_prefix="replay",
+                             streaming=False, compression=None):
         """
         If replay_folder is not None, it enables saving of replays for every game into
         the target folder. Naming of each of the game replays is by appending a random number, eg:
@@ -46,6 +75,9 @@ class Game:
         Args:
             replay_folder (str, optional): [description]. Defaults to "/replays/".
             replay_filename_prefix: Prefix to the filenames for the replay.
+            streaming: Append each turn to a JSON-lines stream instead of keeping the replay in memory, see
+                StreamingReplay. The streams are named replay_<random num>.jsonl.
+            compression: Compression of the streams, None, "gzip" or "zstd".
         """
 
         # Replays only work if a map seed is specified
@@ -59,19 +91,29 @@ class Game:
         # Decide on the target file
         filename = f"{replay_filename_prefix}_{random.randint(0,10000)}.json"
 
-        self.replay = Replay( self, os.path.join(replay_folder, filename), stateful )
+        if streaming:
+            filename += "l" + {None: "", "gzip": ".gz", "zstd": ".zst"}[compression]
+            self.replay = StreamingReplay( self, os.path.join(replay_folder, filename), stateful, compression )
+        else:
+            self.replay = Replay( self, os.path.join(replay_folder, filename), stateful )
         self.replay_stateful = stateful
         self.replay_folder = replay_folder
         self.replay_filename_prefix = replay_filename_prefix
+        self.replay_streaming = streaming
+        self.replay_compression = compression
     
     def stop_replay_logging(self):
         """
         Disables saving of replays at the end of each game.
         """
+        if getattr(self, "replay", None) is not None:
+            self.replay.close()
         self.replay = None
         self.replay_stateful = None
         self.replay_folder = None
         self.replay_filename_prefix = None
+        self.replay_streaming = False
+        self.replay_compression = None
 
     def reset(self, updates=None, increment_turn=False):
         """
@@ -84,38 +126,12 @@ class Game:
         """
         self.global_city_id_count = 0
         self.global_unit_id_count = 0
+        self.headless = self.configs["headless"]
         self.cities = {}  # string -> City
         self.cells_with_roads = set() # Set, maintained to speed up agent designs that want to build road maps
-        self.stats = {
-            "teamStats": {
-                Constants.TEAM.A: {
-                    "fuelGenerated": 0,
-                    "resourcesCollected": {
-                        "wood": 0,
-                        "coal": 0,
-                        "uranium": 0,
-                    },
-                    "cityTilesBuilt": 0,
-                    "workersBuilt": 0,
-                    "cartsBuilt": 0,
-                    "roadsBuilt": 0,
-                    "roadsPillaged": 0,
-                },
-                Constants.TEAM.B: {
-                    "fuelGenerated": 0,
-                    "resourcesCollected": {
-                        "wood": 0,
-                        "coal": 0,
-                        "uranium": 0,
-                    },
-                    "cityTilesBuilt": 0,
-                    "workersBuilt": 0,
-                    "cartsBuilt": 0,
-                    "roadsBuilt": 0,
-                    "roadsPillaged": 0,
-                },
-            },
-        }
+        self.spatial_index = None  # SpatialIndex of the current turn, built on first use
+        self.entity_states = {}  # Unit or city id -> (key, serialized state) of the last to_state_object()
+        self.stats = self._gen_initial_stats()
 
         # Option to keep game state turn number, and increment it.
         turn = 0
@@ -157,109 +173,230 @@ class Game:
         self.process_updates(updates)
 
     def process_updates(self, updates, assign=True):
-
+        """
+        Applies the updates of an observation to the game, or asserts that the game matches them.
+        :param updates: List of update strings, or of updates already split into tokens, eg. by IndexedReplay.
+        :param assign: Assign the updates, or only assert that the game matches them.
+        """
         if updates is None:
             return
-        
+        self.spatial_index = None
+
         # Loop through updating the game from the list of updates
         # Implements /kits/python/simple/lux/game.py -> _update()
-        for update in updates:
-            if update == "D_DONE":
-                break
-            strings = update.split(" ")
-
-            input_identifier = strings[0]
-            if input_identifier == INPUT_CONSTANTS.RESEARCH_POINTS:
-                team = int(strings[1])
-                research_points = int(strings[2])
-                if assign:
-                    self.state["teamStates"][team]["researchPoints"] = research_points
-                else:
-                    assert self.state["teamStates"][team]["researchPoints"] == research_points
+        handlers = {
+            INPUT_CONSTANTS.RESEARCH_POINTS: self._update_research_points,
+            INPUT_CONSTANTS.RESOURCES: self._update_resource,
+            INPUT_CONSTANTS.UNITS: self._update_unit,
+            INPUT_CONSTANTS.CITY: self._update_city,
+            INPUT_CONSTANTS.CITY_TILES: self._update_city_tile,
+            INPUT_CONSTANTS.ROADS: self._update_road,
+        }
+        for input_identifier, values in parse_updates(updates):
+            handlers[input_identifier](values, assign)
+
+    def _update_research_points(self, values, assign):
+        team, research_points = values
+        team_state = self.state["teamStates"][team]
+        if assign:
+            team_state["researchPoints"] = research_points
+        else:
+            assert team_state["researchPoints"] == research_points
 
-                if int(strings[2]) >= self.configs["parameters"]["RESEARCH_REQUIREMENTS"]["COAL"]:
-                    if assign:
-                        self.state["teamStates"][team]["researched"]["coal"] = True
-                    else:
-                        assert self.state["teamStates"][team]["researched"]["coal"] == True
+        requirements = self.configs["parameters"]["RESEARCH_REQUIREMENTS"]
+        if research_points >= requirements["COAL"]:
+            if assign:
+                team_state["researched"]["coal"] = True
+            else:
+                assert team_state["researched"]["coal"] == True
 
-                if int(strings[2]) >= self.configs["parameters"]["RESEARCH_REQUIREMENTS"]["URANIUM"]:
-                    if assign:
-                        self.state["teamStates"][team]["researched"]["uranium"] = True
-                    else:
-                        assert self.state["teamStates"][team]["researched"]["uranium"] == True
-
-            elif input_identifier == INPUT_CONSTANTS.RESOURCES:
-                r_type = strings[1]
-                x = int(strings[2])
-                y = int(strings[3])
-                amt = int(float(strings[4]))
-                if assign:
-                    self.map.add_resource(x, y, r_type, amt)
-                else:
-                    cell = self.map.get_cell(x, y)
-                    assert cell.resource.amount == amt
-                    assert cell.resource.type == r_type 
+        if research_points >= requirements["URANIUM"]:
+            if assign:
+                team_state["researched"]["uranium"] = True
+            else:
+                assert team_state["researched"]["uranium"] == True
+
+    def _update_resource(self, values, assign):
+        r_type, x, y, amt = values
+        if assign:
+            self.map.add_resource(x, y, r_type, amt)
+        else:
+            cell = self.map.get_cell(x, y)
+            assert cell.resource.amount == amt
+            assert cell.resource.type == r_type
+
+    def _update_unit(self, values, assign):
+        unit_type, team, unit_id, x, y, cooldown, wood, coal, uranium = values
+        if assign:
+            if unit_type == Constants.UNIT_TYPES.WORKER:
+                self.spawn_worker(team, x, y, unit_id, cooldown=cooldown, cargo=Cargo(wood, coal, uranium))
+            elif unit_type == Constants.UNIT_TYPES.CART:
+                self.spawn_cart(team, x, y, unit_id, cooldown=cooldown, cargo=Cargo(wood, coal, uranium))
+        else:
+            cell = self.map.get_cell(x, y)
+            assert len(cell.units) > 0
+            assert unit_id in [u.id for u in cell.units.values()], f'unit id {unit_id} missplaced'
+
+    def _update_city(self, values, assign):
+        team, city_id, fuel, light_upkeep = values  # light_upkeep is unused
+        if assign:
+            self.cities[city_id] = City(team, self.configs, None, city_id, fuel)
+        else:
+            assert city_id in self.cities
+
+    def _update_city_tile(self, values, assign):
+        team, city_id, x, y, cooldown = values
+        city = self.cities[city_id]
+        cell = self.map.get_cell(x, y)
+        if assign:
+            cell.set_city_tile(team, city_id, cooldown)
+            self.map.mark_dirty(cell)
+            city.add_city_tile(cell)
+            self.stats["teamStats"][team]["cityTilesBuilt"] += 1
+        else:
+            assert cell.city_tile.city_id == city_id
+            assert cell in city.city_cells
 
+    def _update_road(self, values, assign):
+        x, y, road = values
+        cell = self.map.get_cell(x, y)
+        if cell not in self.cells_with_roads:
+            self.cells_with_roads.add(cell)
+        if assign:
+            cell.road = road
+            self.map.mark_dirty(cell)
+        else:
+            assert cell.get_road() == road
+
+    def apply_updates(self, updates, increment_turn=True):
+        """
+        Updates the game in place to the state of an observation, instead of resetting it. Gives the same game as
+        reset(updates, increment_turn), but keeps the map, and moves and refills the units that are still alive
+        instead of creating them again. Only the cells whose resources, roads or city tiles change are touched.
+        :param updates: List of update strings, or of updates already split into tokens, eg. by IndexedReplay.
+        :param increment_turn: Increments the turn, or else restarts it from 0.
+        """
+        self.spatial_index = None
+        self.stats = self._gen_initial_stats()
+        self.state["turn"] = self.state["turn"] + 1 if increment_turn else 0
+
+        previous_units = {}
+        for team, team_state in self.state["teamStates"].items():
+            team_state["researchPoints"] = 0
+            team_state["researched"] = {"wood": True, "coal": False, "uranium": False}
+            previous_units[team] = team_state["units"]
+            team_state["units"] = {}
+
+        # City tiles are rebuilt from the updates
+        for city in self.cities.values():
+            for cell in city.city_cells:
+                cell.city_tile = None
+                self.map.mark_dirty(cell)
+        self.cities = {}
+
+        previous_resources = set(self.map.resources)
+        previous_roads = self.cells_with_roads
+        self.cells_with_roads = set()
+
+        handlers = {
+            INPUT_CONSTANTS.RESEARCH_POINTS: self._update_research_points,
+            INPUT_CONSTANTS.CITY: self._update_city,
+            INPUT_CONSTANTS.CITY_TILES: self._update_city_tile,
+            INPUT_CONSTANTS.ROADS: self._update_road,
+        }
+        for input_identifier, values in parse_updates(updates):
+            if input_identifier == INPUT_CONSTANTS.RESOURCES:
+                previous_resources.discard(self._apply_resource_update(values))
             elif input_identifier == INPUT_CONSTANTS.UNITS:
-                unit_type = int(strings[1])
-                team = int(strings[2])
-                unit_id = strings[3]
-                x = int(strings[4])
-                y = int(strings[5])
-                cooldown = float(strings[6])
-                wood = int(strings[7])
-                coal = int(strings[8])
-                uranium = int(strings[9])
-                if assign:
-                    if unit_type == Constants.UNIT_TYPES.WORKER:
-                        self.spawn_worker(team, x, y, unit_id, cooldown=cooldown,
-                                        cargo={"wood": wood, "uranium": uranium, "coal": coal})
-                    elif unit_type == Constants.UNIT_TYPES.CART:
-                        self.spawn_cart(team, x, y, unit_id, cooldown=cooldown,
-                                        cargo={"wood": wood, "uranium": uranium, "coal": coal})
-                else:
-                    cell = self.map.get_cell(x, y)
-                    assert len(cell.units) > 0
-                    assert unit_id in [u.id for u in cell.units.values()], f'unit id {unit_id} missplaced'
-
-            elif input_identifier == INPUT_CONSTANTS.CITY:
-                team = int(strings[1])
-                city_id = strings[2]
-                fuel = float(strings[3])
-                light_upkeep = float(strings[4])  # Unused
-                if assign:
-                    self.cities[city_id] = City(team, self.configs, None, city_id, fuel)
-                else:
-                    assert city_id in self.cities
-
-            elif input_identifier == INPUT_CONSTANTS.CITY_TILES:
-                team = int(strings[1])
-                city_id = strings[2]
-                x = int(strings[3])
-                y = int(strings[4])
-                cooldown = float(strings[5])
-                city = self.cities[city_id]
-                cell = self.map.get_cell(x, y)
-                if assign:
-                    cell.set_city_tile(team, city_id, cooldown)
-                    city.add_city_tile(cell)
-                    self.stats["teamStats"][team]["cityTilesBuilt"] += 1
-                else:
-                    assert cell.city_tile.city_id == city_id
-                    assert cell in city.city_cells
-
-            elif input_identifier == INPUT_CONSTANTS.ROADS:
-                x = int(strings[1])
-                y = int(strings[2])
-                road = float(strings[3])
-                cell = self.map.get_cell(x, y)
-                if cell not in self.cells_with_roads:
-                    self.cells_with_roads.add(cell)
-                if assign:
-                    cell.road = road
-                else:
-                    assert cell.get_road() == road
+                self._apply_unit_update(values, previous_units)
+            else:
+                handlers[input_identifier](values, True)
+
+        # Depleted resources are gone from the observation
+        for cell in previous_resources:
+            self.map.remove_resource(cell)
+            cell.resource = None
+
+        # Destroyed units
+        for units in previous_units.values():
+            for unit in units.values():
+                self.map.get_cell_by_pos(unit.pos).remove_unit(unit.id)
+
+        # Roads that are missing from the observation were pillaged down to the minimum
+        min_road = self.configs["parameters"]["MIN_ROAD"]
+        for cell in previous_roads - self.cells_with_roads:
+            cell.road = min_road
+            self.map.mark_dirty(cell)
+
+    def _apply_resource_update(self, values):
+        r_type, x, y, amt = values
+        cell = self.map.get_cell(x, y)
+        resource = cell.resource
+        if resource is not None and resource.type == r_type and amt > 0 and resource.amount > 0:
+            if resource.amount != amt:
+                resource.amount = amt
+                self.map.mark_dirty(cell)
+        else:
+            self.map.add_resource(x, y, r_type, amt)
+        return cell
+
+    def _apply_unit_update(self, values, previous_units):
+        unit_type, team, unit_id, x, y, cooldown, wood, coal, uranium = values
+        unit = previous_units[team].pop(unit_id, None)
+        if unit is None:
+            self._update_unit(values, True)
+            return
+
+        if unit.pos.x != x or unit.pos.y != y:
+            self.map.get_cell_by_pos(unit.pos).remove_unit(unit_id)
+            unit.pos = Position(x, y)
+            self.map.get_cell(x, y).add_unit(unit)
+        unit.cooldown = cooldown
+        unit.cargo = Cargo(wood, coal, uranium)
+        unit.current_actions = NO_ACTIONS
+        unit.can_act_override = None
+        self.state["teamStates"][team]["units"][unit_id] = unit
+        if not self.headless:
+            if unit_type == Constants.UNIT_TYPES.WORKER:
+                self.stats["teamStats"][team]["workersBuilt"] += 1
+            elif unit_type == Constants.UNIT_TYPES.CART:
+                self.stats["teamStats"][team]["cartsBuilt"] += 1
+
+    def _gen_initial_stats(self):
+        """
+        Stats of a new game
+        :return:
+        """
+        return {
+            "teamStats": {
+                Constants.TEAM.A: {
+                    "fuelGenerated": 0,
+                    "resourcesCollected": {
+                        "wood": 0,
+                        "coal": 0,
+                        "uranium": 0,
+                    },
+                    "cityTilesBuilt": 0,
+                    "workersBuilt": 0,
+                    "cartsBuilt": 0,
+                    "roadsBuilt": 0,
+                    "roadsPillaged": 0,
+                },
+                Constants.TEAM.B: {
+                    "fuelGenerated": 0,
+                    "resourcesCollected": {
+                        "wood": 0,
+                        "coal": 0,
+                        "uranium": 0,
+                    },
+                    "cityTilesBuilt": 0,
+                    "workersBuilt": 0,
+                    "cartsBuilt": 0,
+                    "roadsBuilt": 0,
+                    "roadsPillaged": 0,
+                },
+            },
+        }
 
     def _gen_initial_accumulated_action_stats(self):
         """
@@ -297,95 +434,12 @@ class Game:
             return None
 
     def action_from_command_low(self, comm, agentID):
-
-        invalid_msg = f"Agent {agentID} sent invalid command"
-        malformed_msg = f"Agent {agentID} sent malformed command: {comm}"
-
-        def check(condition, error_msg, trace=True):
-            if condition:
-                if trace:
-                    raise Exception(error_msg + f"; turn {self.state['turn']}; cmd: {comm}")
-                else:
-                    raise Exception(error_msg)
-
-        # Tokenize command
-        parts = comm.split(' ')
-        check(len(parts) <= 1, invalid_msg)
-        action = parts[0]
-        parts = parts[1:]
-
-        # Load the team details
-        team = agentID
-
-        # Construct the action
-        result = None
-        if action == Constants.ACTIONS.PILLAGE:
-            check(len(parts) != 1, malformed_msg)
-            uid = parts[0]
-
-            unit = self.get_unit(team, uid)
-            check(unit is None, invalid_msg)
-            result = PillageAction(team, uid)
-
-        elif action == Constants.ACTIONS.BUILD_CITY:
-            check(len(parts) != 1, malformed_msg)
-            uid = parts[0]
-
-            unit = self.get_unit(team, uid)
-            check(unit is None, invalid_msg)
-
-            result = SpawnCityAction(team, uid)
-
-        elif action == Constants.ACTIONS.BUILD_CART:
-            check(len(parts) != 2, malformed_msg)
-
-            x = int(parts[0])
-            y = int(parts[1])
-
-            result = SpawnCartAction(team, None, x, y)
-
-        elif action == Constants.ACTIONS.BUILD_WORKER:
-            check(len(parts) != 2, malformed_msg)
-
-            x = int(parts[0])
-            y = int(parts[1])
-            result = SpawnWorkerAction(team, None, x, y)
-
-        elif action == Constants.ACTIONS.MOVE:
-            check(len(parts) != 2, malformed_msg)
-
-            uid = parts[0]
-            direction = parts[1]
-
-            result = MoveAction(team, uid, direction)
-
-        elif action == Constants.ACTIONS.RESEARCH:
-            check(len(parts) != 2, malformed_msg)
-
-            x = int(parts[0])
-            y = int(parts[1])
-
-            result = ResearchAction(team, x, y, None)
-
-        elif action == Constants.ACTIONS.TRANSFER:
-            check(len(parts) != 4, malformed_msg)
-
-            source_id = parts[0]
-            destination_id = parts[1]
-            resource_type = parts[2]
-            amount = int(parts[3])
-
-            result = TransferAction(
-                team,
-                source_id,
-                destination_id,
-                resource_type,
-                amount
-            )
-        else:
-            raise Exception(f"unknown action {action}")
-
-        return result
+        """
+        Converts an agent command into an action, see parse_command().
+        :param comm: Command string, or command already split into tokens.
+        :param agentID: Team of the agent.
+        """
+        return parse_command(self, comm, agentID)
 
     def run_turn_with_actions(self, actions):
         """
@@ -394,14 +448,15 @@ class Game:
             True if game is still running
             False if game is over
         """
-        if "log" in self.configs and self.configs["log"]:
+        # Headless games skip the replay and logging
+        replay = self.replay if not self.headless else None
+        if not self.headless and "log" in self.configs and self.configs["log"]:
             self.log('Processing turn ' + str(self.state["turn"]))
 
-        if self.replay:
+        if replay:
             # Log actions to a replay
-            self.replay.add_actions(self, actions)
-            
-            
+            replay.add_actions(self, actions)
+
 
         # Loop over commands and validate and map into internal action representations
         actions_map = {}
@@ -420,9 +475,7 @@ class Game:
                     else:
                         actions_map[action.action] = [action]
             except Exception as e:
-                self.log("Error processing action")
-                self.log(repr(e))
-                self.log(''.join(traceback.format_exception(None, e, e.__traceback__)))
+                self.log_exception("Error processing action", e)
 
         # give units and city tiles their validated actions to use
         if Constants.ACTIONS.BUILD_CITY in actions_map:
@@ -470,9 +523,7 @@ class Game:
                 try:
                     city_cell.city_tile.handle_turn(self)
                 except Exception as e:
-                    self.log("Critical error handling city turn.")
-                    self.log(repr(e))
-                    self.log(''.join(traceback.format_exception(None, e, e.__traceback__)))
+                    self.log_exception("Critical error handling city turn.", e)
 
         teams = [Constants.TEAM.A, Constants.TEAM.B]
         for team in teams:
@@ -480,9 +531,7 @@ class Game:
                 try:
                     unit.handle_turn(self)
                 except Exception as e:
-                    self.log("Critical error handling unit turn.")
-                    self.log(repr(e))
-                    self.log(''.join(traceback.format_exception(None, e, e.__traceback__)))
+                    self.log_exception("Critical error handling unit turn.", e)
 
         # distribute all resources in order of decreasing fuel efficiency
         self.distribute_all_resources()
@@ -495,40 +544,28 @@ class Game:
         if self.is_night():
             self.handle_night()
 
-        # remove resources that are depleted from map
-        new_resources_map = []
-        self.map.resources_by_type = {}
-        for i in range(len(self.map.resources)):
-            cell = self.map.resources[i]
-            if cell.resource.amount > 0:
-                new_resources_map.append(cell)
-                if cell.resource.type not in self.map.resources_by_type:
-                    self.map.resources_by_type[cell.resource.type] = [cell]
-                else:
-                    self.map.resources_by_type[cell.resource.type].append(cell)
-
-        self.map.resources = new_resources_map
-
         # regenerate forests
         self.regenerate_trees()
 
         match_over = self.match_over()
 
         self.state["turn"] += 1
+        self.spatial_index = None
 
         # store state for replays
-        if self.replay:
-            self.replay.add_state(self)
+        if replay:
+            replay.add_state(self)
 
         self.run_cooldowns()
 
         if match_over:
-            if self.replay:
+            if replay:
                 # Write the replay to a file
-                self.replay.write(self)
+                replay.write(self)
 
                 # Start a new replay file for the next game
-                self.start_replay_logging(self.replay_stateful, self.replay_folder, self.replay_filename_prefix)
+                self.start_replay_logging(self.replay_stateful, self.replay_folder, self.replay_filename_prefix,
+                                          self.replay_streaming, self.replay_compression)
             return True
 
         # self.log('Beginning turn %s' % self.state["turn"])
@@ -635,13 +672,25 @@ class Game:
 
     def log(self, text):
         """
-        Logs the specified text
+        Logs the specified text to the buffered log sink of the "logFile" config
         :param text:
         """
-        if self.log_file is None:
-            self.log_file = open("log.txt", "w")
+        if self.log_sink is None:
+            self.log_sink = open_log_sink(self.configs["logFile"], "w", self.configs["logRateLimit"])
         if text is not None:
-            self.log_file.write(text + "\n")
+            self.log_sink.write(text)
+
+    def log_exception(self, text, e):
+        """
+        Logs the specified text and the exception with its traceback. Headless games don't log exceptions.
+        :param text:
+        :param e:
+        """
+        if self.headless:
+            return
+        self.log(text)
+        self.log(repr(e))
+        self.log(''.join(traceback.format_exception(None, e, e.__traceback__)))
 
     def validate_command(self, cmd, accumulated_action_stats=None):
         """
@@ -667,7 +716,7 @@ class Game:
             if not unit.can_act():
                 raise MatchWarn("Agent tried to build CityTile with cooldown: {}".format(unit.cooldown))
                 
-            cargoTotal = unit.cargo['wood'] + unit.cargo['coal']+ unit.cargo['uranium']
+            cargoTotal = unit.cargo.wood + unit.cargo.coal+ unit.cargo.uranium
             
             if cargoTotal < self.configs['parameters']['CITY_BUILD_COST']:
                 raise MatchWarn("Agent tried to build CityTile with insufficient materials wood + coal + uranium: {}".format(cargoTotal))
@@ -746,8 +795,6 @@ class Game:
         Spawns new worker
         Implements src/Game/index.ts -> Game.spawnWorker()
         """
-        if cargo is None:
-            cargo = {"wood": 0, "uranium": 0, "coal": 0}
         cell = self.map.get_cell(x, y)
         unit = Worker(
             x,
@@ -764,10 +811,12 @@ class Game:
         else:
             self.global_unit_id_count += 1
 
-        cell.units[unit.id] = unit
+        cell.add_unit(unit)
 
         self.state["teamStates"][team]["units"][unit.id] = unit
-        self.stats["teamStats"][team]["workersBuilt"] += 1
+        if not self.headless:
+            self.stats["teamStats"][team]["workersBuilt"] += 1
+        self.spatial_index = None
         return unit
 
     def spawn_cart(self, team, x, y, unit_id=None, cooldown=0.0, cargo=None):
@@ -775,8 +824,6 @@ class Game:
         Spawns new cart
         Implements src/Game/index.ts -> Game.spawnCart()
         """
-        if cargo is None:
-            cargo = {"wood": 0, "uranium": 0, "coal": 0}
         cell = self.map.get_cell(x, y)
         unit = Cart(x,
                     y,
@@ -790,9 +837,11 @@ class Game:
         else:
             self.global_unit_id_count += 1
 
-        cell.units[unit.id] = unit
+        cell.add_unit(unit)
         self.state["teamStates"][team]["units"][unit.id] = unit
-        self.stats["teamStats"][team]["cartsBuilt"] += 1
+        if not self.headless:
+            self.stats["teamStats"][team]["cartsBuilt"] += 1
+        self.spatial_index = None
         return unit
 
     def spawn_city_tile(self, team, x, y, city_id=None):
@@ -800,6 +849,7 @@ class Game:
         Spawns new city tile
         Implements src/Game/index.ts -> Game.spawnCityTile()
         """
+        self.spatial_index = None
         cell = self.map.get_cell(x, y)
 
         # now update the cities field accordingly
@@ -824,6 +874,7 @@ class Game:
                 self.global_city_id_count += 1
 
             cell.set_city_tile(team, city.id)
+            self.map.mark_dirty(cell)
             city.add_city_tile(cell)
             self.cities[city.id] = city
             return cell.city_tile
@@ -833,6 +884,7 @@ class Game:
             city_id = adj_same_team_city_tiles[0].city_tile.city_id
             city = self.cities[city_id]
             cell.set_city_tile(team, city_id)
+            self.map.mark_dirty(cell)
 
             # update adjacency counts for bonuses
             cell.city_tile.adjacent_city_tiles = len(adj_same_team_city_tiles)
@@ -861,9 +913,9 @@ class Game:
         unit = self.get_unit(team, unit_id)
 
         # remove unit from old cell and move to new one and update unit pos
-        self.map.get_cell_by_pos(unit.pos).units.pop(unit.id)
+        self.map.get_cell_by_pos(unit.pos).remove_unit(unit.id)
         unit.pos = unit.pos.translate(direction, 1)
-        self.map.get_cell_by_pos(unit.pos).units[unit.id] = unit
+        self.map.get_cell_by_pos(unit.pos).add_unit(unit)
 
     def distribute_all_resources(self):
         """
@@ -876,10 +928,41 @@ class Game:
             Constants.RESOURCE_TYPES.WOOD,
         ]
 
+        # the cells every worker can mine from are found once for all resource types
+        minable_cells = self.get_minable_cells()
         for curType in mining_order:
-            self.handle_resource_type_release(curType)
+            self.handle_resource_type_release(curType, minable_cells)
 
-    def handle_resource_type_release(self, resource_type):
+    def get_minable_cells(self):
+        """
+        Finds the resource cells each worker can mine from, which are its own cell and the orthogonally adjacent
+        cells with a resource its team has researched.
+        :return: Dict of resource type to a list of (worker, worker cell, cells), in the order of the units of each
+            team.
+        """
+        minable_cells = {
+            Constants.RESOURCE_TYPES.WOOD: [],
+            Constants.RESOURCE_TYPES.COAL: [],
+            Constants.RESOURCE_TYPES.URANIUM: [],
+        }
+        for team in [Constants.TEAM.A, Constants.TEAM.B]:
+            researched = self.state["teamStates"][team]["researched"]
+            for unit in self.state["teamStates"][team]["units"].values():
+                if unit.type == Constants.UNIT_TYPES.WORKER:
+                    unit_cell = self.map.map[unit.pos.y][unit.pos.x]
+                    cells_by_type = {}
+                    for cell in (unit_cell,) + self.map.get_adjacent_cells(unit_cell):
+                        resource = cell.resource
+                        if resource is not None and resource.amount > 0 and researched[resource.type]:
+                            if resource.type in cells_by_type:
+                                cells_by_type[resource.type].append(cell)
+                            else:
+                                cells_by_type[resource.type] = [cell]
+                    for resource_type, cells in cells_by_type.items():
+                        minable_cells[resource_type].append((unit, unit_cell, cells))
+        return minable_cells
+
+    def handle_resource_type_release(self, resource_type, minable_cells=None):
         """
         * For each unit, check current and orthoganally adjacent cells for that resource
         * type. If found, request as much as we can carry from these cells. In the case of un-even 
@@ -896,9 +979,13 @@ class Game:
         * 
         * @param resourceType - the type of the resource
         * Description copy pasted from src/Game/index.ts -> Game.handleResourceTypeRelease()
+
+        :param minable_cells: Result of get_minable_cells() for this turn, found if not given.
         """
         # build up the resource requests
-        requests = self.create_resource_requests(resource_type)
+        if minable_cells is None:
+            minable_cells = self.get_minable_cells()
+        requests = self.create_resource_requests(resource_type, minable_cells[resource_type])
 
         # resolve resource requests
         self.resolve_resource_requests(resource_type, requests)
@@ -930,75 +1017,87 @@ class Game:
                     and (self.city.id if self.city else None) == (other.city.id if other.city else None)
             )
 
-    def create_resource_requests(self, resource_type):
+    def create_resource_requests(self, resource_type, minable_cells):
         """
-
+        Each worker requests an equal share of what fits in its cargo from each cell it can mine from. Workers on
+        a city tile request for the city, and identical requests for a city are made once.
         :param resource_type:
-        :return:
+        :param minable_cells: List of (worker, worker cell, cells) of the workers that can mine this resource type.
+        :return: Dict of cell to the list of requests for the cell.
         """
         type_map = {
             Constants.RESOURCE_TYPES.WOOD: "WOOD",
             Constants.RESOURCE_TYPES.COAL: "COAL",
             Constants.RESOURCE_TYPES.URANIUM: "URANIUM",
         }
-        mining_rate = rate = self.configs["parameters"]["WORKER_COLLECTION_RATE"][type_map[resource_type]]
+        mining_rate = self.configs["parameters"]["WORKER_COLLECTION_RATE"][type_map[resource_type]]
         reqs = {}
-        for team in [Constants.TEAM.A, Constants.TEAM.B]:
-            if self.state["teamStates"][team]["researched"][resource_type]:
-                for unit in self.state["teamStates"][team]["units"].values():
-                    if unit.type == Constants.UNIT_TYPES.WORKER:
-                        unit_cell = self.map.get_cell_by_pos(unit.pos)
-                        cells = [unit_cell] + self.map.get_adjacent_cells(unit_cell)
-                        minable = [c for c in cells if c.has_resource() and c.resource.type == resource_type]
-                        if len(minable) > 0:
-                            mine_amount = min(math.ceil(unit.get_cargo_space_left() / len(minable)), mining_rate)
-                        for cell in minable:
-                            if cell.pos not in reqs:
-                                reqs[cell.pos] = []
-                            req = Game.ResourceRequest(
-                                unit.pos,
-                                mine_amount,
-                                None if unit_cell.is_city_tile() else unit,
-                                self.cities[unit_cell.city_tile.city_id] if unit_cell.is_city_tile() else None,
-                            )
-                            has_req = req in reqs[cell.pos]
-                            if not has_req:
-                                reqs[cell.pos].append(req)
-        return reqs
+        for unit, unit_cell, cells in minable_cells:
+            mine_amount = min(math.ceil(unit.get_cargo_space_left() / len(cells)), mining_rate)
+            if unit_cell.is_city_tile():
+                worker = None
+                city = self.cities[unit_cell.city_tile.city_id]
+                key = (unit.pos.x, unit.pos.y, mine_amount, city.id)
+            else:
+                worker = unit
+                city = None
+                key = unit.id
+            for cell in cells:
+                cell_reqs = reqs.setdefault(cell, {})
+                if key not in cell_reqs:
+                    cell_reqs[key] = Game.ResourceRequest(unit.pos, mine_amount, worker, city)
+        return {cell: list(cell_reqs.values()) for cell, cell_reqs in reqs.items()}
 
     def resolve_resource_requests(self, resource_type, requests):
         """
-
+        Fills the requests of all cells at once, see fill_requests_in_equal_shares().
         :param resource_type:
-        :param requests:
+        :param requests: Dict of cell to the list of requests for the cell.
         :return:
         """
+        if len(requests) == 0:
+            return
+
         type_map = {
             Constants.RESOURCE_TYPES.WOOD: "WOOD",
             Constants.RESOURCE_TYPES.COAL: "COAL",
             Constants.RESOURCE_TYPES.URANIUM: "URANIUM",
         }
         conversion_rate = self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"][type_map[resource_type]]
-        for position, reqs in requests.items():
-            amount_left = self.map.get_cell_by_pos(position).resource.amount
-            amounts_reqs = reqs  # dont make tuples like typescript reference implementation
-            while len(amounts_reqs) > 0 and sum([req.amount for req in amounts_reqs]) > 0 and amount_left > 0:
-                to_fill = min(min([req.amount for req in amounts_reqs]), math.floor(amount_left / len(amounts_reqs)))
-                for r in amounts_reqs:
-                    if r.city is not None:
-                        self.stats["teamStats"][r.city.team]["resourcesCollected"][resource_type] += to_fill
-                        r.city.fuel += to_fill * conversion_rate
-                    else:
-                        to_give = min(r.worker.get_cargo_space_left(), to_fill)
-                        self.stats["teamStats"][r.worker.team]["resourcesCollected"][resource_type] += to_give
-                        r.worker.cargo[resource_type] += to_give
-                    r.amount -= to_fill
-                amount_left -= to_fill * len(amounts_reqs)
-                if amount_left < len(amounts_reqs):
-                    amount_left = 0
-                amounts_reqs = list(filter(lambda r: r.amount > 0, amounts_reqs))
-            cell = self.map.get_cell_by_pos(position)
-            cell.resource.amount = amount_left
+
+        # lay out the requests of each cell in a row
+        cells = list(requests)
+        flat_requests = [req for reqs in requests.values() for req in reqs]
+        counts = np.array([len(reqs) for reqs in requests.values()])
+        rows = np.repeat(np.arange(len(cells)), counts)
+        columns = np.arange(len(flat_requests)) - np.repeat(np.cumsum(counts) - counts, counts)
+        amounts = np.zeros((len(cells), counts.max()), dtype=np.int64)
+        amounts[rows, columns] = [req.amount for req in flat_requests]
+        active = np.zeros(amounts.shape, dtype=bool)
+        active[rows, columns] = True
+        amount_left = np.array([cell.resource.amount for cell in cells], dtype=np.int64)
+
+        filled, amount_left = fill_requests_in_equal_shares(amounts, active, amount_left)
+
+        for cell, left in zip(cells, amount_left.tolist()):
+            cell.resource.amount = left
+            self.map.mark_dirty(cell)
+            if left <= 0:
+                # remove resources that are depleted from map
+                self.map.remove_resource(cell)
+
+        for r, to_fill in zip(flat_requests, filled[rows, columns].tolist()):
+            if r.city is not None:
+                if not self.headless:
+                    self.stats["teamStats"][r.city.team]["resourcesCollected"][resource_type] += to_fill
+                r.city.fuel += to_fill * conversion_rate
+            else:
+                # the worker receives what fits in its cargo, the rest is wasted
+                to_give = min(r.worker.get_cargo_space_left(), to_fill)
+                if not self.headless:
+                    self.stats["teamStats"][r.worker.team]["resourcesCollected"][resource_type] += to_give
+                r.worker.cargo[resource_type] += to_give
+            r.amount -= to_fill
 
     def handle_resource_deposit(self, unit):
         """
@@ -1009,18 +1108,15 @@ class Game:
         if cell.is_city_tile() and cell.city_tile.team == unit.team:
             city = self.cities.get(cell.city_tile.city_id)
             fuel_gained = 0
-            fuel_gained += unit.cargo["wood"] * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["WOOD"]
-            fuel_gained += unit.cargo["coal"] * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["COAL"]
-            fuel_gained += unit.cargo["uranium"] * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["URANIUM"]
+            fuel_gained += unit.cargo.wood * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["WOOD"]
+            fuel_gained += unit.cargo.coal * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["COAL"]
+            fuel_gained += unit.cargo.uranium * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["URANIUM"]
             city.fuel += fuel_gained
 
+            # Kept by headless games, it breaks ties between the teams
             self.stats["teamStats"][unit.team]["fuelGenerated"] += fuel_gained
 
-            unit.cargo = {
-                "wood": 0,
-                "uranium": 0,
-                "coal": 0,
-            }
+            unit.cargo = Cargo()
 
     def get_teams_units(self, team):
         """
@@ -1029,6 +1125,16 @@ class Game:
         """
         return self.state["teamStates"][team]["units"]
 
+    def get_spatial_index(self):
+        """
+        Spatial index of the resources, units and city tiles for nearest object queries. It is built once per turn
+        and shared by all callers, so it must not be modified.
+        :return: SpatialIndex
+        """
+        if self.spatial_index is None:
+            self.spatial_index = SpatialIndex.from_game(self)
+        return self.spatial_index
+
     def get_unit(self, team, unit_id):
         """
         Get the specific unit.
@@ -1066,6 +1172,7 @@ class Game:
         for cell in city.city_cells:
             cell.city_tile = None
             cell.road = self.configs["parameters"]["MIN_ROAD"]
+            self.map.mark_dirty(cell)
             if cell in self.cells_with_roads:
                 self.cells_with_roads.remove(cell)
 
@@ -1075,7 +1182,7 @@ class Game:
         Implements src/Game/index.ts -> Game.destroyUnit()
         """
         unit = self.get_unit(team, unit_id)
-        self.map.get_cell_by_pos(unit.pos).units.pop(unit_id)
+        self.map.get_cell_by_pos(unit.pos).remove_unit(unit_id)
         self.state["teamStates"][team]["units"].pop(unit_id)
 
     def regenerate_trees(self):
@@ -1090,16 +1197,16 @@ class Game:
         * the wood at a wood tile grows to ceil(min(curr * 1.03, base))
         */
         """
-        if Constants.RESOURCE_TYPES.WOOD in self.map.resources_by_type:
-            for cell in self.map.resources_by_type[Constants.RESOURCE_TYPES.WOOD]:
-                # add this condition so we let forests near a city start large (but not regrow until below a max)
-                if cell.resource.amount < self.configs["parameters"]["MAX_WOOD_AMOUNT"]:
-                    cell.resource.amount = math.ceil(
-                        min(
-                            cell.resource.amount * self.configs["parameters"]["WOOD_GROWTH_RATE"],
-                            self.configs["parameters"]["MAX_WOOD_AMOUNT"]
-                        )
+        for cell in self.map.resources_by_type[Constants.RESOURCE_TYPES.WOOD]:
+            # add this condition so we let forests near a city start large (but not regrow until below a max)
+            if cell.resource.amount < self.configs["parameters"]["MAX_WOOD_AMOUNT"]:
+                cell.resource.amount = math.ceil(
+                    min(
+                        cell.resource.amount * self.configs["parameters"]["WOOD_GROWTH_RATE"],
+                        self.configs["parameters"]["MAX_WOOD_AMOUNT"]
                     )
+                )
+                self.map.mark_dirty(cell)
 
     def handle_movement_actions(self, actions):
         """
@@ -1119,80 +1226,38 @@ class Game:
         *
         */
         """
-        cells_to_actions_to_there = {}
-        moving_units = set()
-
+        width = self.map.width
+        height = self.map.height
+        cells = self.map.cells
+        unit_ids = []
+        sources = []
+        targets = []
         for action in actions:
-            new_cell = self.map.get_cell_by_pos(
-                self.get_unit(action.team, action.unit_id).pos.translate(action.direction, 1)
-            )
-            if new_cell is not None:
-                # new_cell = action.new_cell
-                if new_cell in cells_to_actions_to_there:
-                    cells_to_actions_to_there[new_cell] += [action]
-                else:
-                    cells_to_actions_to_there[new_cell] = [action]
-
-                moving_units.add(action.unit_id)
-
-        def revert_action(action):
-            # reverts a given action such that cellsToActionsToThere has no collisions due to action and all related actions
-            self.log(
-                f"turn {{self.state['turn']}} Unit {{action.unit_id}} collided when trying to move {{action.direction}} to ({{action.newcell.pos.x}}, {{action.newcell.pos.y}})")
-
-            original_cell = self.map.get_cell_by_pos(
-                self.get_unit(action.team, action.unit_id).pos
-            )
-
-            # get the colliding actions caused by a revert of the given action and then delete them from the mapped origcell provided it is not a city tile
-            colliding_actions = cells_to_actions_to_there[
-                original_cell] if original_cell in cells_to_actions_to_there else None
-            if not original_cell.is_city_tile():
-                if colliding_actions is not None:
-                    cells_to_actions_to_there.pop(original_cell)
-
-                    # for each colliding action, revert it.
-                    for collidingAction in colliding_actions:
-                        revert_action(collidingAction)
-
-        actioned_cells = list(cells_to_actions_to_there.keys())
-        for cell in actioned_cells:
-            if cell in cells_to_actions_to_there:
-                current_actions = cells_to_actions_to_there[cell]
-                actions_to_revert = []
-                if current_actions is not None:
-                    if len(current_actions) > 1:
-                        # only revert actions that are going to the same tile that is not a city
-                        # if going to the same city tile, we know those actions are from same team units, and is allowed
-                        if not cell.is_city_tile():
-                            actions_to_revert += current_actions
-                    elif len(current_actions) == 1:
-                        # if there is just one move action, check there isn't a unit on there that is not moving and not a city tile
-                        action = current_actions[0]
-                        if not cell.is_city_tile():
-                            if len(cell.units) == 1:
-                                unit_there_is_still = True
-                                for unit in cell.units.values():
-                                    if unit.id in moving_units:
-                                        unit_there_is_still = False
-                                if unit_there_is_still:
-                                    actions_to_revert.append(action)
-
-            # if there are collisions, revert those actions and remove the mapping
-            for action in actions_to_revert:
-                revert_action(action)
-            for action in actions_to_revert:
-                new_cell = self.map.get_cell_by_pos(
-                    self.get_unit(action.team, action.unit_id).pos.translate(action.direction, 1)
-                )
-                if new_cell in cells_to_actions_to_there:
-                    cells_to_actions_to_there.pop(new_cell)
+            pos = self.get_unit(action.team, action.unit_id).pos
+            dx, dy = DIRECTION_DELTAS[action.direction]
+            x = pos.x + dx
+            y = pos.y + dy
+            unit_ids.append(action.unit_id)
+            sources.append(pos.y * width + pos.x)
+            targets.append(y * width + x if 0 <= x < width and 0 <= y < height else None)
+
+        pruned = resolve_move_collisions(
+            unit_ids,
+            sources,
+            targets,
+            lambda cell: cells[cell].city_tile is not None,
+            lambda cell: cells[cell].units,
+        )
 
-        pruned_actions = []
-        for current_actions in cells_to_actions_to_there.values():
-            pruned_actions += current_actions
+        if not self.headless and "log" in self.configs and self.configs["log"]:
+            kept = set(pruned)
+            for i, action in enumerate(actions):
+                if targets[i] is not None and i not in kept:
+                    self.log("turn %i Unit %s collided when trying to move %s to (%i, %i)" % (
+                        self.state["turn"], action.unit_id, action.direction, targets[i] % width, targets[i] // width
+                    ))
 
-        return pruned_actions
+        return [actions[i] for i in pruned]
 
     def is_night(self):
         """
@@ -1207,24 +1272,38 @@ class Game:
         """
         Serialize state
         Implements src/Game/index.ts -> Game.toStateObject()
+        Only the map cells, cities and units that changed since the last call are serialized again, the rest is
+        shared with the state objects of earlier turns, so state objects must not be modified.
         """
+        previous_states = self.entity_states
+        entity_states = {}
+
         cities = {}
         for city in self.cities.values():
-            city_cells = []
-            for cell in city.city_cells:
-                city_cells.append({
-                    "x": cell.pos.x,
-                    "y": cell.pos.y,
-                    "cooldown": cell.city_tile.cooldown,
-                })
-
-            cities[city.id] = {
-                "id": city.id,
-                "fuel": city.fuel,
-                "lightupkeep": city.get_light_upkeep(),
-                "team": city.team,
-                "cityCells": city_cells
-            }
+            light_upkeep = city.get_light_upkeep()
+            key = (city.team, city.fuel, light_upkeep,
+                   tuple((cell.pos, cell.city_tile.cooldown) for cell in city.city_cells))
+            cached = previous_states.get(city.id)
+            if cached is not None and cached[0] == key:
+                city_state = cached[1]
+            else:
+                city_cells = []
+                for cell in city.city_cells:
+                    city_cells.append({
+                        "x": cell.pos.x,
+                        "y": cell.pos.y,
+                        "cooldown": cell.city_tile.cooldown,
+                    })
+
+                city_state = {
+                    "id": city.id,
+                    "fuel": city.fuel,
+                    "lightupkeep": light_upkeep,
+                    "team": city.team,
+                    "cityCells": city_cells
+                }
+            entity_states[city.id] = (key, city_state)
+            cities[city.id] = city_state
 
         state = {
             "turn": self.state["turn"],
@@ -1256,16 +1335,125 @@ class Game:
 
         teams = [Constants.TEAM.A, Constants.TEAM.B]
         for team in teams:
+            units = state["teamStates"][team]["units"]
             for unit in self.state["teamStates"][team]["units"].values():
-                state["teamStates"][team]["units"][unit.id] = {
-                    "cargo": dict(unit.cargo),
-                    "cooldown": unit.cooldown,
-                    "x": unit.pos.x,
-                    "y": unit.pos.y,
-                    "type": unit.type,
-                }
+                cargo = unit.cargo
+                key = (unit.type, unit.pos, unit.cooldown, cargo.wood, cargo.coal, cargo.uranium)
+                cached = previous_states.get(unit.id)
+                if cached is not None and cached[0] == key:
+                    unit_state = cached[1]
+                else:
+                    unit_state = {
+                        "cargo": dict(cargo),
+                        "cooldown": unit.cooldown,
+                        "x": unit.pos.x,
+                        "y": unit.pos.y,
+                        "type": unit.type,
+                    }
+                entity_states[unit.id] = (key, unit_state)
+                units[unit.id] = unit_state
 
             state["teamStates"][team]["researchPoints"] = self.state["teamStates"][team]["researchPoints"]
             state["teamStates"][team]["researched"] = dict(self.state["teamStates"][team]["researched"])
 
+        self.entity_states = entity_states
         return state
+
+    def snapshot(self):
+        """
+        Captures the state of the game between turns. The snapshot only holds plain values, so it can be pickled,
+        and it doesn't reference the configs, replay or log file of the game.
+        :return: GameSnapshot
+        """
+        width = self.map.width
+        cells = self.map.cells
+
+        resources = [(cell.pos.y * width + cell.pos.x, cell.resource.type, cell.resource.amount)
+                     for cell in self.map.resources]
+        resources += [(i, cell.resource.type, cell.resource.amount) for i, cell in enumerate(cells)
+                      if cell.resource is not None and not cell.has_resource()]
+
+        min_road = self.configs["parameters"]["MIN_ROAD"]
+        roads = tuple((i, cell.road) for i, cell in enumerate(cells) if cell.road != min_road)
+
+        cities = tuple(
+            (city.id, city.team, city.fuel, tuple(
+                (cell.pos.y * width + cell.pos.x, cell.city_tile.cooldown, cell.city_tile.adjacent_city_tiles)
+                for cell in city.city_cells
+            ))
+            for city in self.cities.values()
+        )
+
+        teams = [Constants.TEAM.A, Constants.TEAM.B]
+        units = tuple(
+            (team, unit.type, unit.id, unit.pos.x, unit.pos.y, unit.cooldown,
+             unit.cargo.wood, unit.cargo.coal, unit.cargo.uranium)
+            for team in teams for unit in self.state["teamStates"][team]["units"].values()
+        )
+
+        return GameSnapshot(
+            width=width,
+            height=self.map.height,
+            turn=self.state["turn"],
+            global_unit_id_count=self.global_unit_id_count,
+            global_city_id_count=self.global_city_id_count,
+            teams=tuple(
+                (self.state["teamStates"][team]["researchPoints"],
+                 tuple(self.state["teamStates"][team]["researched"].items()))
+                for team in teams
+            ),
+            stats=_copy_dict(self.stats),
+            resources=tuple(resources),
+            roads=roads,
+            cells_with_roads=tuple(cell.pos.y * width + cell.pos.x for cell in self.cells_with_roads),
+            cities=cities,
+            units=units,
+        )
+
+    def restore(self, snapshot):
+        """
+        Rebuilds the game from a snapshot, which can be restored any number of times. The configs, replay and log
+        file of the game are kept. The units on a cell are ordered by team and unit order.
+        :param snapshot: GameSnapshot created by snapshot() of a game with the same configs.
+        """
+        self.global_unit_id_count = snapshot.global_unit_id_count
+        self.global_city_id_count = snapshot.global_city_id_count
+        self.spatial_index = None
+        self.stats = _copy_dict(snapshot.stats)
+        self.state = {
+            "turn": snapshot.turn,
+            "teamStates": {
+                team: {
+                    "researchPoints": research_points,
+                    "units": {},
+                    "researched": dict(researched),
+                }
+                for team, (research_points, researched) in enumerate(snapshot.teams)
+            },
+        }
+
+        self.map = GameMap(self.configs)
+        self.map.create_cells(snapshot.width, snapshot.height)
+        cells = self.map.cells
+        for i, resource_type, amount in snapshot.resources:
+            self.map.add_resource(cells[i].pos.x, cells[i].pos.y, resource_type, amount)
+        for i, road in snapshot.roads:
+            cells[i].road = road
+        self.cells_with_roads = set(cells[i] for i in snapshot.cells_with_roads)
+
+        self.cities = {}
+        for city_id, team, fuel, tiles in snapshot.cities:
+            city = City(team, self.configs, None, city_id, fuel)
+            for i, cooldown, adjacent_city_tiles in tiles:
+                cell = cells[i]
+                cell.set_city_tile(team, city_id, cooldown)
+                cell.city_tile.adjacent_city_tiles = adjacent_city_tiles
+                city.add_city_tile(cell)
+            self.cities[city_id] = city
+
+        for team, unit_type, unit_id, x, y, cooldown, wood, coal, uranium in snapshot.units:
+            unit_class = Worker if unit_type == Constants.UNIT_TYPES.WORKER else Cart
+            unit = unit_class(x, y, team, self.configs, 0, cooldown, Cargo(wood, coal, uranium))
+            unit.id = unit_id
+            cells[y * snapshot.width + x].add_unit(unit)
+            self.state["teamStates"][team]["units"][unit_id] = unit
@@ -1,11 +1,16 @@
+import bisect
+import functools
 import math
 import random
+from collections import OrderedDict, namedtuple
 from typing import List
 
-from argparse import Namespace
-from ..env.rng.rng import get_n_values
+import numpy as np
+
+from ..env.rng.rng import lux_rng
 from .cell import Cell
 from .constants import Constants
+from .game_map_vectorized import generate_gravitated_resources
 from .position import Position
 
 DIRECTIONS = Constants.DIRECTIONS
@@ -40,6 +45,102 @@ def sign(value):
     return 0
 
 
+"""
+Immutable description of a generated map. Resources are (x, y, type, amount) tuples in the order they were
+added to the map, and spawns are the (team, x, y) of the starting worker and city tile of each team.
+"""
+MapTemplate = namedtuple("MapTemplate", ["width", "height", "resources", "spawns"])
+
+
+class MapTemplateCache:
+    """
+    LRU cache of generated map templates keyed on (seed, width, height, mapType). Used so that
+    resetting a game to a previously seen seed doesn't need to regenerate the map.
+    """
+    def __init__(self, max_size=64):
+        """
+
+        :param max_size: Maximum number of templates to keep. 0 disables the cache.
+        """
+        self.max_size = max_size
+        self.templates = OrderedDict()
+
+    def get(self, key):
+        """
+
+        :param key:
+        :return: The cached MapTemplate, or None if not cached.
+        """
+        template = self.templates.get(key)
+        if template is not None:
+            self.templates.move_to_end(key)
+        return template
+
+    def put(self, key, template):
+        """
+
+        :param key:
+        :param template:
+        """
+        if self.max_size <= 0:
+            return
+        self.templates[key] = template
+        self.templates.move_to_end(key)
+        while len(self.templates) > self.max_size:
+            self.templates.popitem(last=False)
+
+    def resize(self, max_size):
+        """
+        Changes the maximum number of templates, evicting the least recently used ones if needed.
+        :param max_size:
+        """
+        self.max_size = max_size
+        while len(self.templates) > max(self.max_size, 0):
+            self.templates.popitem(last=False)
+
+    def grow(self, max_size):
+        """
+        Raises the maximum number of templates to at least max_size. Never shrinks the cache, since the
+        templates of other games in the process would be evicted.
+        :param max_size:
+        """
+        self.max_size = max(self.max_size, max_size)
+
+    def clear(self):
+        self.templates.clear()
+
+
+# Shared by all games in this process. Games grow it to their "mapCacheSize", use resize() to shrink it.
+map_template_cache = MapTemplateCache()
+
+
+@functools.lru_cache(maxsize=None)
+def get_adjacency_tables(width, height):
+    """
+    Neighbour tables of a map size, shared by all maps of that size. Cells are numbered y * width + x.
+    :param width:
+    :param height:
+    :return: (adjacency, adjacency_with_corners). Each has a tuple per cell with the numbers of the neighbouring
+        cells on the map, in the order of GameMap.get_adjacent_cells() and get_adjacent_cells_with_corners().
+    """
+    # The tables share one int object per cell number
+    numbers = list(range(width * height))
+
+    def neighbours(x, y, offsets):
+        return tuple(
+            numbers[(y + dy) * width + x + dx] for dx, dy in offsets if 0 <= x + dx < width and 0 <= y + dy < height
+        )
+
+    # NORTH, EAST, SOUTH, WEST, then the corners
+    offsets = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+    corner_offsets = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+    adjacency = tuple(neighbours(x, y, offsets) for y in range(height) for x in range(width))
+    adjacency_with_corners = tuple(
+        neighbours(x, y, offsets + corner_offsets) for y in range(height) for x in range(width)
+    )
+    return adjacency, adjacency_with_corners
+
+
 """Implements /src/GameMap/index.ts"""
 
 
@@ -50,12 +151,79 @@ class GameMap:
         :param configs:
         """
         self.configs = configs
-        self.resources = []
-        self.resources_by_type = {
-            Constants.RESOURCE_TYPES.WOOD: [],
-            Constants.RESOURCE_TYPES.COAL: [],
-            Constants.RESOURCE_TYPES.URANIUM: [],
+
+        # Index of the cells with resources left, by resource type. Cells are kept in the order they were added,
+        # and removed by remove_resource() on the update that depletes them.
+        self._resource_index = {
+            Constants.RESOURCE_TYPES.WOOD: {},
+            Constants.RESOURCE_TYPES.COAL: {},
+            Constants.RESOURCE_TYPES.URANIUM: {},
         }
+        self._resource_order = {}
+
+        # Cached views of the index, invalidated when a resource is added or removed
+        self._resources = None
+        self._resources_by_type = None
+        self._resource_positions = {}
+
+    @property
+    def resources(self) -> List[Cell]:
+        """
+        Cells with resources left, in the order they were added.
+        :return:
+        """
+        if self._resources is None:
+            self._resources = list(self._resource_order)
+        return self._resources
+
+    @resources.setter
+    def resources(self, cells):
+        """
+        Replaces the resource index with the given cells.
+        :param cells:
+        """
+        for index in self._resource_index.values():
+            index.clear()
+        self._resource_order.clear()
+        for cell in cells:
+            self._index_resource(cell)
+        self._invalidate_resource_cache()
+
+    @property
+    def resources_by_type(self):
+        """
+        Cells with resources left by resource type, in the order they were added.
+        :return: Dict of resource type to list of cells.
+        """
+        if self._resources_by_type is None:
+            self._resources_by_type = {
+                resource_type: list(index) for resource_type, index in self._resource_index.items()
+            }
+        return self._resources_by_type
+
+    def get_resource_positions(self, resource_type):
+        """
+        Positions of the cells with resources left of a resource type. The array is cached until a resource is
+        added or removed, so it must not be modified.
+        :param resource_type:
+        :return: Integer numpy array of shape (n, 2) with the [x, y] of each cell, in the order they were added.
+        """
+        positions = self._resource_positions.get(resource_type)
+        if positions is None:
+            cells = self._resource_index[resource_type]
+            positions = np.array([[cell.pos.x, cell.pos.y] for cell in cells], dtype=np.int32).reshape(-1, 2)
+            positions.flags.writeable = False
+            self._resource_positions[resource_type] = positions
+        return positions
+
+    def _index_resource(self, cell):
+        self._resource_index[cell.resource.type][cell] = None
+        self._resource_order[cell] = None
+
+    def _invalidate_resource_cache(self):
+        self._resources = None
+        self._resources_by_type = None
+        self._resource_positions.clear()
 
     def generate_map(self, game):
         """
@@ -63,44 +231,85 @@ class GameMap:
         Implements /src/Game/gen.ts
         :param game:
         """
-        
-        def js_rng(seed):
-            idx = 0
-            rng_values = get_n_values(seed, N=1000000)
-            def _rng():
-                nonlocal idx
-                ret = rng_values[idx]
-                idx += 1
-                return ret
-            return Namespace(**dict(random=_rng))
-        
+        cache_key = self._get_template_cache_key()
+        if cache_key is not None:
+            map_template_cache.grow(self.configs["mapCacheSize"])
+            template = map_template_cache.get(cache_key)
+            if template is not None:
+                self.instantiate_template(game, template)
+                return
+
+        self._generate_map(game)
+
+        if cache_key is not None:
+            map_template_cache.put(cache_key, self.to_template(game))
+
+    def _get_template_cache_key(self):
+        """
+        Maps are only cached when they are fully determined by the configs, which is when a seed is specified.
+        :return: The map template cache key, or None if this map shouldn't be cached.
+        """
+        if self.configs.get("seed") is None or self.configs.get("mapCacheSize", 0) <= 0:
+            return None
+        if self.configs["mapType"] == Constants.MAP_TYPES.EMPTY:
+            return None
+        return (
+            str(self.configs["seed"]),
+            self.configs.get("width"),
+            self.configs.get("height"),
+            self.configs["mapType"],
+        )
+
+    def to_template(self, game):
+        """
+        Creates an immutable template of this freshly generated map and the starting units and city tiles.
+        :param game:
+        :return: MapTemplate
+        """
+        resources = tuple(
+            (cell.pos.x, cell.pos.y, cell.resource.type, cell.resource.amount) for cell in self.resources
+        )
+        spawns = []
+        for team in [Constants.TEAM.A, Constants.TEAM.B]:
+            for unit in game.state["teamStates"][team]["units"].values():
+                spawns.append((team, unit.pos.x, unit.pos.y))
+        return MapTemplate(self.width, self.height, resources, tuple(spawns))
+
+    def instantiate_template(self, game, template):
+        """
+        Builds the map tiles, resources and starting units and city tiles from a map template.
+        :param game:
+        :param template: MapTemplate
+        """
+        self.create_cells(template.width, template.height)
+
+        for x, y, resource_type, amount in template.resources:
+            self.add_resource(x, y, resource_type, amount)
+
+        for team, x, y in template.spawns:
+            game.spawn_worker(team, x, y)
+            game.spawn_city_tile(team, x, y)
 
+    def _generate_map(self, game):
+        """
+        Runs the random map generation
+        :param game:
+        """
         if self.configs["seed"] is not None:
             # Use a random number generator that exactly matches LuxAI. That way
             # the same seeds generate the exact same map.
             seed = self.configs["seed"]
-            rng = js_rng(seed)
+            rng = lux_rng(seed)
         else:
             rng = random.Random()
 
         size = mapSizes[math.floor(rng.random() * len(mapSizes))]
 
-        if "width" in self.configs:
-            self.width = self.configs["width"]
-        else:
-            self.width = size
-        
-        if "height" in self.configs:
-            self.height = self.configs["height"]
-        else:
-            self.height = size
+        width = self.configs["width"] if "width" in self.configs else size
+        height = self.configs["height"] if "height" in self.configs else size
 
         # Create map tiles
-        self.map: List[List[Cell]] = [None] * self.height
-        for y in range(0, self.height):
-            self.map[y] = [None] * self.width
-            for x in range(0, self.width):
-                self.map[y][x] = Cell(x, y, self.configs)
+        self.create_cells(width, height)
 
         if self.configs["mapType"] == Constants.MAP_TYPES.EMPTY:
             return
@@ -224,6 +433,53 @@ class GameMap:
         :param half_height:
         :return:
         """
+        if self.configs.get("vectorizedMapGen", False):
+            # Numpy implementation, generates the same resources from the same rng stream
+            resources_map = generate_gravitated_resources(rng, width, height, half_width, half_height)
+        else:
+            resources_map = self._generate_gravitated_resources(rng, width, height, half_width, half_height)
+
+        # perturb resources
+        for y in range(half_height):
+            for x in range(half_width):
+                resource = resources_map[y][x]
+                if resource is None:
+                    continue
+                for d in MOVE_DELTAS:
+                    nx = x + d[0]
+                    ny = y + d[1]
+                    if nx < 0 or ny < 0 or nx >= half_height or ny >= half_width:
+                        continue
+                    if rng.random() < 0.05:
+                        amt = 300 + math.floor(rng.random() * 50)
+                        if resource["type"] == 'coal':
+                            amt = 350 + math.floor(rng.random() * 75)
+
+                        if resource["type"] == 'wood':
+                            amt = min(300 + math.floor(rng.random() * 100), 500)
+
+                        resources_map[ny][nx] = {"type": resource["type"], "amt": amt}
+
+        for y in range(half_height):
+            for x in range(half_width):
+                resource = resources_map[y][x]
+                if symmetry == SYMMETRY.VERTICAL:
+                    resources_map[y][width - x - 1] = resource
+                else:
+                    resources_map[height - y - 1][x] = resource
+
+        return resources_map
+
+    def _generate_gravitated_resources(self, rng, width, height, half_width, half_height):
+        """
+        Generates the wood, coal and uranium resources in the top-left half of the map, and gravitates them.
+        :param rng:
+        :param width:
+        :param height:
+        :param half_width:
+        :param half_height:
+        :return:
+        """
         resources_map = []
 
         for i in range(height):
@@ -279,35 +535,6 @@ class GameMap:
         for i in range(10):
             resources_map = self._gravitate_resources(resources_map)
 
-        # perturb resources
-        for y in range(half_height):
-            for x in range(half_width):
-                resource = resources_map[y][x]
-                if resource is None:
-                    continue
-                for d in MOVE_DELTAS:
-                    nx = x + d[0]
-                    ny = y + d[1]
-                    if nx < 0 or ny < 0 or nx >= half_height or ny >= half_width:
-                        continue
-                    if rng.random() < 0.05:
-                        amt = 300 + math.floor(rng.random() * 50)
-                        if resource["type"] == 'coal':
-                            amt = 350 + math.floor(rng.random() * 75)
-
-                        if resource["type"] == 'wood':
-                            amt = min(300 + math.floor(rng.random() * 100), 500)
-
-                        resources_map[ny][nx] = {"type": resource["type"], "amt": amt}
-
-        for y in range(half_height):
-            for x in range(half_width):
-                resource = resources_map[y][x]
-                if symmetry == SYMMETRY.VERTICAL:
-                    resources_map[y][width - x - 1] = resource
-                else:
-                    resources_map[height - y - 1][x] = resource
-
         return resources_map
 
     def _generate_resource_map(self, rng, density, density_range, width, height,
@@ -447,11 +674,26 @@ class GameMap:
         :return:
         """
         cell = self.get_cell(x, y)
+        if cell.resource is not None:
+            self.remove_resource(cell)
         cell.set_resource(resource_type, amount)
-        self.resources.append(cell)
-        self.resources_by_type[resource_type].append(cell)
+        self._dirty_cells.add(cell)
+        if amount > 0:
+            self._index_resource(cell)
+            self._invalidate_resource_cache()
         return cell
 
+    def remove_resource(self, cell):
+        """
+        Removes a depleted cell from the resource index. The cell keeps its resource object.
+        :param cell:
+        """
+        self._dirty_cells.add(cell)
+        if cell in self._resource_order:
+            del self._resource_index[cell.resource.type][cell]
+            del self._resource_order[cell]
+            self._invalidate_resource_cache()
+
     def get_cell_by_pos(self, pos) -> Cell:
         """
 
@@ -483,28 +725,15 @@ class GameMap:
 
     def get_adjacent_cells(self, cell):
         """
-
+        The cells to the north, east, south and west of a cell that are on the map.
         :param cell:
-        :return:
+        :return: Tuple of cells, shared by all callers.
         """
-        cells = []
-
-        # NORTH
-        if cell.pos.y > 0:
-            cells.append(self.get_cell(cell.pos.x, cell.pos.y - 1))
-
-        # EAST
-        if cell.pos.x < self.width - 1:
-            cells.append(self.get_cell(cell.pos.x + 1, cell.pos.y))
-
-        # SOUTH
-        if cell.pos.y < self.height - 1:
-            cells.append(self.get_cell(cell.pos.x, cell.pos.y + 1))
-
-        # WEST
-        if cell.pos.x > 0:
-            cells.append(self.get_cell(cell.pos.x - 1, cell.pos.y))
-
+        i = cell.pos.y * self.width + cell.pos.x
+        cells = self.adjacent_cells[i]
+        if cells is None:
+            cells = tuple(self.cells[j] for j in self.adjacency[i])
+            self.adjacent_cells[i] = cells
         return cells
 
     def get_adjacent_cells_with_corners(self, cell):
@@ -512,27 +741,48 @@ class GameMap:
         Includes the corners as 'adjacent'. Used in finding
         resource clusters.
         :param cell:
-        :return:
+        :return: Tuple of cells, shared by all callers.
         """
-        cells = self.get_adjacent_cells(cell)
-
-        c = self.get_cell(cell.pos.x - 1, cell.pos.y - 1)
-        if c:
-            cells.append(c)
+        i = cell.pos.y * self.width + cell.pos.x
+        cells = self.adjacent_cells_with_corners[i]
+        if cells is None:
+            cells = tuple(self.cells[j] for j in self.adjacency_with_corners[i])
+            self.adjacent_cells_with_corners[i] = cells
+        return cells
 
-        c = self.get_cell(cell.pos.x + 1, cell.pos.y - 1)
-        if c:
-            cells.append(c)
+    def create_cells(self, width, height):
+        """
+        Creates the empty map tiles.
+        :param width:
+        :param height:
+        """
+        self.width = width
+        self.height = height
+        self.map: List[List[Cell]] = [
+            [Cell(x, y, self.configs) for x in range(width)] for y in range(height)
+        ]
+        self._init_cells()
 
-        c = self.get_cell(cell.pos.x - 1, cell.pos.y + 1)
-        if c:
-            cells.append(c)
+    def _init_cells(self):
+        """
+        Indexes the cells of the map, once the map tiles are created. Cells are numbered y * width + x.
+        """
+        self.cells = [cell for row in self.map for cell in row]
+        self.adjacency, self.adjacency_with_corners = get_adjacency_tables(self.width, self.height)
 
-        c = self.get_cell(cell.pos.x + 1, cell.pos.y + 1)
-        if c:
-            cells.append(c)
+        # Tuples of adjacent cells, built on first use
+        self.adjacent_cells = [None] * len(self.cells)
+        self.adjacent_cells_with_corners = [None] * len(self.cells)
 
-        return cells
+        # Serialized cells for to_state_object(), built on first use and then only updated for the cells marked
+        # dirty. state_version counts the updates that changed a cell, and the changed cells are logged with the
+        # version that changed them for to_state_delta().
+        self._cell_states = None
+        self._dirty_cells = set()
+        self._changed_cells = []
+        self._changed_versions = []
+        self.state_version = getattr(self, "state_version", 0) + 1
+        self._full_state_version = self.state_version
 
     def in_map(self, pos):
         """
@@ -610,24 +860,75 @@ class GameMap:
             map_str += "\n"
         return map_str
 
+    def mark_dirty(self, cell):
+        """
+        Marks a cell whose road, resource or city tile changed, to serialize it again on the next
+        to_state_object() or to_state_delta().
+        :param cell:
+        """
+        self._dirty_cells.add(cell)
+
+    def _cell_state(self, cell):
+        cell_data = {}
+
+        road = cell.get_road()
+        if road != 0:
+            cell_data["road"] = road
+
+        if cell.resource:
+            cell_data["type"] = cell.resource.type
+            cell_data["amount"] = cell.resource.amount
+
+        return cell_data
+
+    def _update_cell_states(self):
+        """
+        Serializes the dirty cells. Serialized cells are replaced, never modified, so they can be shared by the
+        state objects of different turns.
+        """
+        if self._cell_states is None:
+            self._cell_states = [[self._cell_state(cell) for cell in row] for row in self.map]
+            self._dirty_cells.clear()
+            return
+
+        if len(self._dirty_cells) == 0:
+            return
+        version = self.state_version + 1
+        for cell in self._dirty_cells:
+            cell_data = self._cell_state(cell)
+            row = self._cell_states[cell.pos.y]
+            if cell_data != row[cell.pos.x]:
+                row[cell.pos.x] = cell_data
+                self._changed_cells.append(cell)
+                self._changed_versions.append(version)
+                self.state_version = version
+        self._dirty_cells.clear()
+
     def to_state_object(self):
         """
         Implements /src/GameMap/index.ts -> toStateObject()
-        """
-        obj = []
-        for y in range(self.height):
-            obj.append([])
-            for x in range(self.width):
-                cell = self.get_cell(x, y);
-                cell_data = {}
-                
-                if cell.get_road() != 0:
-                    cell_data["road"] = cell.get_road()
-                
-                if cell.resource:
-                    cell_data["type"] = cell.resource.type
-                    cell_data["amount"] = cell.resource.amount
-                
-                obj[y].append(cell_data)
-        
-        return obj
+        Only the cells marked dirty since the last call are serialized again, the cell dicts are shared between
+        calls and must not be modified.
+        """
+        self._update_cell_states()
+        return [list(row) for row in self._cell_states]
+
+    def to_state_delta(self, since):
+        """
+        Serializes the cells that changed after a state version, to store the map of each turn incrementally.
+        :param since: state_version after an earlier to_state_object() or to_state_delta().
+        :return: Tuple of the current state_version and the list of [x, y, cell data] of the changed cells, by row
+            and then column. The list is None if the map tiles were recreated since, then the whole map must be
+            serialized with to_state_object().
+        """
+        self._update_cell_states()
+        if since < self._full_state_version:
+            return self.state_version, None
+
+        start = bisect.bisect_right(self._changed_versions, since)
+        cells = set(self._changed_cells[start:])
+        delta = [
+            [cell.pos.x, cell.pos.y, self._cell_states[cell.pos.y][cell.pos.x]]
+            for cell in sorted(cells, key=lambda c: (c.pos.y, c.pos.x))
+        ]
+        return self.state_version, delta
@@ -0,0 +1,211 @@
+"""
+Numpy implementation of the resource generation in /src/Game/gen.ts. Consumes the rng stream in exactly
+the same order as GameMap._generate_gravitated_resources() and produces the same resources, so seeded
+maps and replays stay valid.
+
+Resources are held as a map of resource type indices into RESOURCE_TYPE_ORDER (-1 for no resource)
+and a map of resource amounts.
+"""
+import math
+
+import numpy as np
+
+from .constants import Constants
+
+RESOURCE_TYPE_ORDER = [
+    Constants.RESOURCE_TYPES.WOOD,
+    Constants.RESOURCE_TYPES.COAL,
+    Constants.RESOURCE_TYPES.URANIUM,
+]
+NO_RESOURCE = -1
+
+# Window scanned by the gravitation kernel. Offsets are in the same y-major order as GameMap._kernel_force(),
+# so the forces are accumulated in the same floating point order.
+KERNEL_SIZE = 5
+KERNEL_OFFSETS = [
+    (oy, ox) for oy in range(-KERNEL_SIZE, KERNEL_SIZE) for ox in range(-KERNEL_SIZE, KERNEL_SIZE)
+]
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+def _kernel_weight(d, mdist):
+    """
+    Force contribution along one axis of a resource at distance d on that axis, and mdist in total.
+    """
+    if d == 0:
+        return 0.0
+    return math.pow(d / mdist, 2) * _sign(d)
+
+
+KERNEL_OFFSETS_Y = np.array([oy + KERNEL_SIZE for oy, ox in KERNEL_OFFSETS])[:, None]
+KERNEL_OFFSETS_X = np.array([ox + KERNEL_SIZE for oy, ox in KERNEL_OFFSETS])[:, None]
+KERNEL_WEIGHTS_X = np.array(
+    [_kernel_weight(-ox, abs(ox) + abs(oy)) for oy, ox in KERNEL_OFFSETS], dtype=np.float64
+)[:, None]
+KERNEL_WEIGHTS_Y = np.array(
+    [_kernel_weight(-oy, abs(ox) + abs(oy)) for oy, ox in KERNEL_OFFSETS], dtype=np.float64
+)[:, None]
+
+
+def simulate_gol(arr, options):
+    """
+    Runs one round of the game of life on the interior cells. Like GameMap._simulate_gol(), cells are updated
+    in place in row-major order, so every cell sees the already-updated cells above and to the left of it.
+    :param arr: 2D int8 array of 0 or 1, modified in place.
+    :param options:
+    :return: arr
+    """
+    height, width = arr.shape
+    if height < 3 or width < 3:
+        return arr
+
+    death_limit = options["deathLimit"]
+    birth_limit = options["birthLimit"]
+    cells = arr.astype(np.int32)
+
+    # Alive neighbours of each interior cell that haven't been updated yet when the cell is reached: the right
+    # neighbour and the three neighbours below
+    pending_alive = cells[1:-1, 2:] + cells[2:, :-2] + cells[2:, 1:-1] + cells[2:, 2:]
+    for i in range(1, height - 1):
+        prev_row = cells[i - 1]
+        old_row = cells[i]
+
+        # Alive neighbours of cells 1..width-2, except the left neighbour which is updated within this row
+        alive = pending_alive[i - 1] + prev_row[:-2] + prev_row[1:-1] + prev_row[2:]
+        old = old_row[1:-1]
+
+        # New value of each cell if the left neighbour is dead, and if it's alive
+        if_left_dead = np.where(old == 1, alive >= death_limit, alive > birth_limit)
+        if_left_alive = np.where(old == 1, alive + 1 >= death_limit, alive + 1 > birth_limit)
+
+        # The rule is monotonic in the neighbour count, so each cell either ignores its left neighbour or copies
+        # it. Each cell therefore takes the value of the nearest cell at or to the left of it that ignores its
+        # left neighbour, or the value of the unchanged border cell if there is none.
+        is_fixed = if_left_dead == if_left_alive
+        positions = np.where(is_fixed, np.arange(len(old)), -1)
+        nearest_fixed = np.maximum.accumulate(positions)
+        cells[i, 1:-1] = np.where(nearest_fixed >= 0, if_left_dead[nearest_fixed], old_row[0])
+
+    arr[:, :] = cells
+    return arr
+
+
+def generate_resource_map(rng, density, density_range, width, height, gol_options):
+    """
+    Mirrors GameMap._generate_resource_map().
+    :return: 2D int8 array of 0 or 1. Width, height represent half of the map.
+    """
+    local_density = density - density_range / 2 + density_range * rng.random()
+    values = [rng.random() for _ in range(width * height)]
+    arr = (np.array(values, dtype=np.float64).reshape((height, width)) < local_density).astype(np.int8)
+
+    # simulate GOL for 2 rounds
+    for i in range(2):
+        arr = simulate_gol(arr, gol_options)
+
+    return arr
+
+
+def kernel_force(types, ys, xs):
+    """
+    Computes the gravitation force of many resources at once. Mirrors GameMap._kernel_force().
+    :param types: 2D array of resource type indices.
+    :param ys: Array of the y coordinates of the resources.
+    :param xs: Array of the x coordinates of the resources.
+    :return: (force_x, force_y) float arrays, one force per resource
+    """
+    height, width = types.shape
+    padded = np.full((height + 2 * KERNEL_SIZE, width + 2 * KERNEL_SIZE), NO_RESOURCE, dtype=types.dtype)
+    padded[KERNEL_SIZE:KERNEL_SIZE + height, KERNEL_SIZE:KERNEL_SIZE + width] = types
+
+    # others[k, i] is the resource at offset KERNEL_OFFSETS[k] from resource i
+    others = padded[ys[None, :] + KERNEL_OFFSETS_Y, xs[None, :] + KERNEL_OFFSETS_X]
+    resource_types = types[ys, xs][None, :]
+
+    valid = others != NO_RESOURCE
+    # Different resource types push away, the same types attract
+    direction = np.where(others != resource_types, 1.0, -1.0)
+    contributions_x = np.where(valid, direction * KERNEL_WEIGHTS_X, 0.0)
+    contributions_y = np.where(valid, direction * KERNEL_WEIGHTS_Y, 0.0)
+
+    # cumsum adds the contributions one offset at a time, in the same order as the reference implementation
+    force_x = np.cumsum(contributions_x, axis=0)[-1]
+    force_y = np.cumsum(contributions_y, axis=0)[-1]
+    return force_x, force_y
+
+
+def gravitate_resources(types, amounts):
+    """
+    Moves every resource one step in the direction of its force. Mirrors GameMap._gravitate_resources().
+    :param types: 2D array of resource type indices.
+    :param amounts: 2D array of resource amounts.
+    :return: (types, amounts) of the new map
+    """
+    height, width = types.shape
+    ys, xs = np.nonzero(types != NO_RESOURCE)
+    new_types = np.full_like(types, NO_RESOURCE)
+    new_amounts = np.zeros_like(amounts)
+    if len(ys) == 0:
+        return new_types, new_amounts
+
+    force_x, force_y = kernel_force(types, ys, xs)
+    target_x = np.clip(xs + np.sign(force_x).astype(np.int64), 0, width - 1)
+    target_y = np.clip(ys + np.sign(force_y).astype(np.int64), 0, height - 1)
+
+    # Resources claim their target in row-major order, a resource whose target is taken stays in place. This
+    # is order dependent, so it runs per resource rather than per cell.
+    claimed = {}
+    for y, x, ny, nx in zip(ys.tolist(), xs.tolist(), target_y.tolist(), target_x.tolist()):
+        if (ny, nx) in claimed:
+            ny = y
+            nx = x
+        claimed[(ny, nx)] = (y, x)
+
+    targets = np.array(list(claimed.keys()))
+    sources = np.array(list(claimed.values()))
+    new_types[targets[:, 0], targets[:, 1]] = types[sources[:, 0], sources[:, 1]]
+    new_amounts[targets[:, 0], targets[:, 1]] = amounts[sources[:, 0], sources[:, 1]]
+
+    return new_types, new_amounts
+
+
+def generate_gravitated_resources(rng, width, height, half_width, half_height):
+    """
+    Generates the wood, coal and uranium resources in the top-left half of the map, and gravitates them.
+    Mirrors GameMap._generate_gravitated_resources().
+    :return: resources map in the same format as GameMap._generate_gravitated_resources()
+    """
+    types = np.full((height, width), NO_RESOURCE, dtype=np.int8)
+    amounts = np.zeros((height, width), dtype=np.int64)
+
+    resource_options = [
+        # (density, density_range, gol_options, base amount, random amount range, max amount)
+        (0.21, 0.01, {"deathLimit": 2, "birthLimit": 4}, 300, 100, 500),
+        (0.11, 0.02, {"deathLimit": 2, "birthLimit": 4}, 350, 75, None),
+        (0.055, 0.04, {"deathLimit": 1, "birthLimit": 6}, 300, 50, None),
+    ]
+    for type_index, (density, density_range, gol_options, base, amount_range, max_amount) in enumerate(
+            resource_options):
+        resource_map = generate_resource_map(rng, density, density_range, half_width, half_height, gol_options)
+
+        mask = np.zeros((height, width), dtype=bool)
+        mask[:half_height, :half_width] = resource_map == 1
+        values = [rng.random() for _ in range(int(mask.sum()))]
+        amt = base + np.floor(np.array(values, dtype=np.float64) * amount_range).astype(np.int64)
+        if max_amount is not None:
+            amt = np.minimum(amt, max_amount)
+
+        types[mask] = type_index
+        amounts[mask] = amt
+
+    for i in range(10):
+        types, amounts = gravitate_resources(types, amounts)
+
+    resources_map = [[None] * width for _ in range(height)]
+    ys, xs = np.nonzero(types != NO_RESOURCE)
+    for y, x, type_index, amt in zip(ys.tolist(), xs.tolist(), types[ys, xs].tolist(), amounts[ys, xs].tolist()):
+        resources_map[y][x] = {"type": RESOURCE_TYPE_ORDER[type_index], "amt": amt}
+    return resources_map
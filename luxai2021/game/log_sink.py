@@ -0,0 +1,239 @@
+"""
+Buffered log sinks for the game and match logs. File sinks keep the lines in memory and a background thread
+writes them out, so logging never blocks a game on slow or shared file systems.
+"""
+import abc
+import atexit
+import multiprocessing.util
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+# Seconds between the background flushes of the file sinks
+FLUSH_INTERVAL = 0.5
+
+# Number of buffered lines of a file sink that triggers an early background flush
+FLUSH_LINES = 1000
+
+
+class LogSink(abc.ABC):
+    """
+    Destination of log lines.
+    """
+    @abc.abstractmethod
+    def write(self, text):
+        """
+        Logs a line of text.
+        :param text:
+        """
+
+    def flush(self):
+        """
+        Writes out the buffered lines.
+        """
+        pass
+
+    def close(self):
+        """
+        Writes out the buffered lines and releases the sink.
+        """
+        self.flush()
+
+
+class RingBufferLogSink(LogSink):
+    """
+    Keeps the last lines in memory.
+    """
+    def __init__(self, capacity=1000):
+        """
+
+        :param capacity: Number of lines to keep.
+        """
+        self.lines = deque(maxlen=capacity)
+
+    def write(self, text):
+        self.lines.append(text)
+
+    def get_lines(self):
+        """
+        :return: List of the kept lines, oldest first.
+        """
+        return list(self.lines)
+
+
+class FileLogSink(LogSink):
+    """
+    Buffers lines in memory, and appends them to a file from the background flush thread. The file is opened on
+    the first flush, so a sink that is never written to creates no file.
+
+    With a rate limit, lines past the limit within a second are dropped, and the number of dropped lines is logged
+    with the next line that is kept.
+    """
+    def __init__(self, path, mode="a", rate_limit=None):
+        """
+
+        :param path: Path of the log file.
+        :param mode: Mode to open the file with, "w" to truncate it or "a" to append to it.
+        :param rate_limit: Optional maximum number of lines per second.
+        """
+        self.path = path
+        self.mode = mode
+        self.rate_limit = rate_limit
+        self.dropped = 0
+        self._init_state()
+        _flusher.register(self)
+
+    def _init_state(self):
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._buffer = []
+        self._file = None
+        self._window_start = 0.0
+        self._window_count = 0
+        self._window_dropped = 0
+
+    def write(self, text):
+        if self.rate_limit is not None:
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_count = 0
+            if self._window_count >= self.rate_limit:
+                self._window_dropped += 1
+                self.dropped += 1
+                return
+            self._window_count += 1
+
+        with self._lock:
+            if self._window_dropped > 0:
+                self._buffer.append("... %i lines dropped by the log rate limit" % self._window_dropped)
+                self._window_dropped = 0
+            self._buffer.append(text)
+            buffered = len(self._buffer)
+        if buffered >= FLUSH_LINES:
+            _flusher.wake()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                lines = self._buffer
+                self._buffer = []
+            if len(lines) == 0:
+                return
+            if self._file is None:
+                self._file = open(self.path, self.mode)
+            self._file.write("".join(line + "\n" for line in lines))
+            self._file.flush()
+
+    def close(self):
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        _flusher.unregister(self)
+        if _file_sinks.get(self.path) is self:
+            del _file_sinks[self.path]
+
+
+class _Flusher:
+    """
+    Flushes the file sinks of this process from a daemon thread, every FLUSH_INTERVAL seconds or when woken up.
+    """
+    def __init__(self):
+        self.sinks = weakref.WeakSet()
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.thread = None
+
+    def register(self, sink):
+        with self.lock:
+            self.sinks.add(sink)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="log-flusher", daemon=True)
+                self.thread.start()
+
+    def unregister(self, sink):
+        with self.lock:
+            self.sinks.discard(sink)
+
+    def wake(self):
+        self.event.set()
+
+    def flush_all(self):
+        with self.lock:
+            sinks = list(self.sinks)
+        for sink in sinks:
+            try:
+                sink.flush()
+            except Exception:
+                # Ignore errors caused by logging
+                pass
+
+    def _run(self):
+        while True:
+            self.event.wait(FLUSH_INTERVAL)
+            self.event.clear()
+            self.flush_all()
+
+    def after_fork_in_child(self):
+        """
+        The child of a fork has no flush thread, and its sinks hold copies of the buffered lines of the parent,
+        which the parent writes out. Drops those lines and starts over.
+        """
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.thread = None
+        sinks = list(self.sinks)
+        self.sinks = weakref.WeakSet()
+        for sink in sinks:
+            file = sink._file
+            sink._init_state()
+            if file is not None:
+                sink._file = open(sink.path, "a")
+            self.register(sink)
+
+
+def _register_exit_flush(flusher):
+    # Processes started by multiprocessing exit without running atexit handlers, but run its finalizers
+    multiprocessing.util.Finalize(flusher, flusher.flush_all, exitpriority=10)
+
+
+_flusher = _Flusher()
+atexit.register(_flusher.flush_all)
+_register_exit_flush(_flusher)
+multiprocessing.util.register_after_fork(_flusher, _register_exit_flush)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_flusher.after_fork_in_child)
+
+# Resolved path -> FileLogSink, shared by all games in this process
+_file_sinks = {}
+
+
+def open_log_sink(path, mode="a", rate_limit=None):
+    """
+    Returns the log sink for a log file path. Games in the same process that log to the same file share its sink.
+    :param path: Path of the log file, "{pid}" is replaced by the process id so that every process of a
+        SubprocVecEnv logs to its own file. None keeps the last lines in memory instead.
+    :param mode: Mode to open the file with when the sink is created, "w" to truncate it or "a" to append to it.
+    :param rate_limit: Optional maximum number of lines per second, applied when the sink is created.
+    :return: LogSink
+    """
+    if path is None:
+        return RingBufferLogSink()
+
+    path = path.replace("{pid}", str(os.getpid()))
+    sink = _file_sinks.get(path)
+    if sink is None:
+        sink = FileLogSink(path, mode, rate_limit)
+        _file_sinks[path] = sink
+    return sink
+
+
+def flush_log_sinks():
+    """
+    Writes out the buffered lines of all file sinks of this process.
+    """
+    _flusher.flush_all()
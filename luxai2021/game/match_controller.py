@@ -1,10 +1,12 @@
 from luxai2021.game.city import CityTile
 import random
 import sys
-import time
 import traceback
 
+from .actions import ValidatedActions
 from .constants import Constants
+from .log_sink import open_log_sink
+from .replay_index import IndexedReplay
 from ..env.agent import Agent
 
 
@@ -78,8 +80,9 @@ class MatchController:
         :param game:
         :param agents:
         """
-        self.action_buffer = []
         self.game = game
+        self.action_buffer = ValidatedActions(game)
+        self.error_log_sink = None  # LogSink, opened on the first error
         self.agents = agents
         self.replay_validate = replay_validate
 
@@ -127,7 +130,7 @@ class MatchController:
         # Reset the game as well if needed
         if reset_game:
             self.game.reset()
-        self.action_buffer = []
+        self.action_buffer = ValidatedActions(self.game)
         self.accumulated_stats = dict( {Constants.TEAM.A: {}, Constants.TEAM.B: {}} )
 
         # Call the agent game_start() callbacks
@@ -195,11 +198,16 @@ class MatchController:
                 self.take_action(action)
 
     def log_error(self, text):
+        """
+        Logs the specified text to the buffered log sink of the "errorLogFile" config of the game
+        """
         # Ignore errors caused by logger
         try:
             if text is not None:
-                with open("match_errors.txt", "a") as o:
-                    o.write(text + "\n")
+                if self.error_log_sink is None:
+                    configs = self.game.configs
+                    self.error_log_sink = open_log_sink(configs["errorLogFile"], "a", configs["logRateLimit"])
+                self.error_log_sink.write(text)
         except Exception:
             print("Critical error in logging")
 
@@ -211,6 +219,114 @@ class MatchController:
             if a != agent:
                 a.set_team(team)
 
+    def begin_turn(self, is_first_turn=False):
+        """
+        Runs the start of a turn: the agent pre-turn events, pending action sequences and agent turn heuristics.
+        :param is_first_turn: True if it's the first turn of a game.
+        """
+        self.turn_start = self.game.state["turn"]
+
+        # Run pre-turn agent events to allow for them to handle running the turn instead (used in a kaggle submission agent)
+        for agent in self.agents:
+            agent.pre_turn(self.game, is_first_turn)
+
+        # Process any pending action sequences to automatically apply actions to units for this turn
+        for id in list(self.action_sequences.keys()):
+            sequence = self.action_sequences[id]
+            actionable = None
+            if id in self.game.state["teamStates"][0]["units"]:
+                actionable = self.game.state["teamStates"][0]["units"][id]
+            elif id in self.game.state["teamStates"][1]["units"]:
+                actionable = self.game.state["teamStates"][1]["units"][id]
+            elif isinstance(id, CityTile):
+                # Validate the city still exists
+                if id.city_id in self.game.cities:
+                    actionable = id
+            else:
+                # The unit must no longer exist
+                pass
+
+            if actionable != None and actionable.can_act():
+                # Continue the action sequence for this unit automatically
+                self.take_action(sequence.get_next_action(self.game))
+
+                if sequence.is_done():
+                    self.action_sequences.pop(id)
+            elif actionable == None:
+                # Delete the action sequence, the object isn't valid anymore
+                self.action_sequences.pop(id)
+
+        # Run agent.turn_heurstics() to apply any agent heristics to give units orders
+        for agent in self.agents:
+            agent.turn_heurstics(self.game, is_first_turn)
+
+    def process_agent_turn(self, agent):
+        """
+        Calls an inference agent for its set of actions for this turn.
+        :param agent:
+        """
+        actions = agent.process_turn(self.game, agent.team)
+        self.take_actions(actions)
+
+    def iter_pending_decisions(self, team):
+        """
+        Generator of the units and city tiles of the team that can still act this turn, units first.
+        Returns: tuples of (unit, city_tile, team)
+        """
+        units = self.game.state["teamStates"][team]["units"].values()
+        for unit in units:
+            if unit.can_act():
+                yield unit, None, unit.team
+
+        cities = self.game.cities.values()
+        for city in cities:
+            if city.team == team:
+                for cell in city.city_cells:
+                    city_tile = cell.city_tile
+                    if city_tile.can_act():
+                        yield None, city_tile, city_tile.team
+
+    def end_turn(self):
+        """
+        Runs the turn with the buffered actions.
+        Returns: True if the game is over.
+        """
+        # Reset the can_act overrides for all units and city_tiles
+        units = list(self.game.state["teamStates"][0]["units"].values()) + list(self.game.state["teamStates"][1]["units"].values())
+        for unit in units:
+            unit.set_can_act_override(None)
+        for city in self.game.cities.values():
+            for cell in city.city_cells:
+                city_tile = cell.city_tile.set_can_act_override(None)
+
+        # Now let the game actually process the requested actions and play the turn
+        game_over = False
+        try:
+            # Run post-turn agent events to allow for them to handle running the turn instead (used in a kaggle submission agent)
+            self.accumulated_stats = dict( {Constants.TEAM.A: {}, Constants.TEAM.B: {}} )
+            handled = False
+            for agent in self.agents:
+                if agent.post_turn(self.game, self.action_buffer):
+                    handled = True
+
+            if not handled:
+                game_over = self.game.run_turn_with_actions(self.action_buffer)
+        except Exception as e:
+            # Log exception
+            self.log_error("ERROR: Critical error occurred in turn simulation.")
+            self.log_error(repr(e))
+            self.log_error(''.join(traceback.format_exception(None, e, e.__traceback__)))
+            raise GameStepFailedException("Critical error occurred in turn simulation.")
+
+        self.action_buffer = ValidatedActions(self.game)
+
+        if isinstance(self.replay_validate, IndexedReplay):
+            self.game.process_updates(self.replay_validate.get_updates(self.turn_start), assign=False)
+        elif self.replay_validate is not None:
+            self.game.process_updates(self.replay_validate['steps'][self.turn_start+1][0]['observation']['updates'], assign=False)
+
+        return game_over
+
     def run_to_next_observation(self):
         """ 
             Generator function that gets the observation at the next Unit/City
@@ -220,105 +336,22 @@ class MatchController:
         game_over = False
         is_first_turn = True
         while not game_over:
-            turn = self.game.state["turn"]
-
-            # Run pre-turn agent events to allow for them to handle running the turn instead (used in a kaggle submission agent)
-            for agent in self.agents:
-                agent.pre_turn(self.game, is_first_turn)
-
-            # Process any pending action sequences to automatically apply actions to units for this turn
-            for id in list(self.action_sequences.keys()):
-                sequence = self.action_sequences[id]
-                actionable = None
-                if id in self.game.state["teamStates"][0]["units"]:
-                    actionable = self.game.state["teamStates"][0]["units"][id]
-                elif id in self.game.state["teamStates"][1]["units"]:
-                    actionable = self.game.state["teamStates"][1]["units"][id]
-                elif isinstance(id, CityTile):
-                    # Validate the city still exists
-                    if id.city_id in self.game.cities:
-                        actionable = id
-                else:
-                    # The unit must no longer exist
-                    pass
-
-                if actionable != None and actionable.can_act():
-                    # Continue the action sequence for this unit automatically
-                    self.take_action(sequence.get_next_action(self.game))
-
-                    if sequence.is_done():
-                        self.action_sequences.pop(id)
-                elif actionable == None:
-                    # Delete the action sequence, the object isn't valid anymore
-                    self.action_sequences.pop(id)
-            
-            # Run agent.turn_heurstics() to apply any agent heristics to give units orders
-            for agent in self.agents:
-                agent.turn_heurstics(self.game, is_first_turn)
+            self.begin_turn(is_first_turn)
 
             # Process this turn
             for agent in self.agents:
                 if agent.get_agent_type() == Constants.AGENT_TYPE.AGENT:
                     # Call the agent for the set of actions
-                    actions = agent.process_turn(self.game, agent.team)
-                    self.take_actions(actions)
+                    self.process_agent_turn(agent)
 
                 elif agent.get_agent_type() == Constants.AGENT_TYPE.LEARNING:
-                    # Yield the game to make a decision, since the learning environment is the function caller
+                    # Yield the game to make a decision, since the learning environment is the function caller.
+                    # The enviornment then handles this unit or city, and calls take_action() to buffer a requested action
                     new_turn = True
-                    start_time = time.time()
-
-                    units = self.game.state["teamStates"][agent.team]["units"].values()
-                    for unit in units:
-                        if unit.can_act():
-                            # RL training agent that is controlling the simulation
-                            # The enviornment then handles this unit, and calls take_action() to buffer a requested action
-                            yield unit, None, unit.team, new_turn
-                            new_turn = False
-                            
-
-                    cities = self.game.cities.values()
-                    for city in cities:
-                        if city.team == agent.team:
-                            for cell in city.city_cells:
-                                city_tile = cell.city_tile
-                                if city_tile.can_act():
-                                    # RL training agent that is controlling the simulation
-                                    # The enviornment then handles this city, and calls take_action() to buffer a requested action
-                                    yield None, city_tile, city_tile.team, new_turn
-                                    new_turn = False
-
-                    time_taken = time.time() - start_time
-            
-            # Reset the can_act overrides for all units and city_tiles
-            units = list(self.game.state["teamStates"][0]["units"].values()) + list(self.game.state["teamStates"][1]["units"].values())
-            for unit in units:
-                unit.set_can_act_override(None)
-            for city in self.game.cities.values():
-                for cell in city.city_cells:
-                    city_tile = cell.city_tile.set_can_act_override(None)
+                    for unit, city_tile, team in self.iter_pending_decisions(agent.team):
+                        yield unit, city_tile, team, new_turn
+                        new_turn = False
 
             is_first_turn = False
 
-            # Now let the game actually process the requested actions and play the turn
-            try:
-                # Run post-turn agent events to allow for them to handle running the turn instead (used in a kaggle submission agent)
-                self.accumulated_stats = dict( {Constants.TEAM.A: {}, Constants.TEAM.B: {}} )
-                handled = False
-                for agent in self.agents:
-                    if agent.post_turn(self.game, self.action_buffer):
-                        handled = True
-
-                if not handled:
-                    game_over = self.game.run_turn_with_actions(self.action_buffer)
-            except Exception as e:
-                # Log exception
-                self.log_error("ERROR: Critical error occurred in turn simulation.")
-                self.log_error(repr(e))
-                self.log_error(''.join(traceback.format_exception(None, e, e.__traceback__)))
-                raise GameStepFailedException("Critical error occurred in turn simulation.")
-
-            self.action_buffer = []
-
-            if self.replay_validate is not None:
-                self.game.process_updates(self.replay_validate['steps'][turn+1][0]['observation']['updates'], assign=False)
+            game_over = self.end_turn()
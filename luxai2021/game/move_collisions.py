@@ -0,0 +1,63 @@
+"""
+Resolves the collisions of the move actions of a turn on integer cell indexes. Shared by Game and BatchedGame, it
+has the semantics of src/Game/index.ts -> Game.handleMovementActions().
+"""
+from .constants import Constants
+
+DIRECTIONS = Constants.DIRECTIONS
+
+# (dx, dy) of a move in each direction
+DIRECTION_DELTAS = {
+    DIRECTIONS.NORTH: (0, -1),
+    DIRECTIONS.EAST: (1, 0),
+    DIRECTIONS.SOUTH: (0, 1),
+    DIRECTIONS.WEST: (-1, 0),
+    DIRECTIONS.CENTER: (0, 0),
+}
+
+
+def resolve_move_collisions(unit_ids, sources, targets, is_city_tile, units_at):
+    """
+    Finds the moves that can all be executed with no collisions.
+
+    Moves are grouped by the cell they go to. All moves to a cell that more than one unit moves to are bumped,
+    unless it is a city tile, and so is a single move to a cell with a unit that doesn't move. A bumped unit stays
+    on its cell, so the moves to that cell are bumped as well, unless it is a city tile. The bumped moves form a
+    graph from the cell each move goes to, to the cell its unit is on, which is walked with a worklist.
+
+    :param unit_ids: Id of the unit of each move.
+    :param sources: Index of the cell the unit of each move is on.
+    :param targets: Index of the cell each move goes to, or None for moves off the map which are dropped.
+    :param is_city_tile: Function of a cell index to whether the cell is a city tile.
+    :param units_at: Function of a cell index to the ids of the units on the cell.
+    :return: Indices of the moves that can be executed, grouped by the cell they go to in order of the first move
+        to each cell.
+    """
+    moves_to = {}
+    moving_units = set()
+    for i, target in enumerate(targets):
+        if target is not None:
+            if target in moves_to:
+                moves_to[target].append(i)
+            else:
+                moves_to[target] = [i]
+            moving_units.add(unit_ids[i])
+
+    for cell in list(moves_to):
+        moves = moves_to.get(cell)
+        if moves is None or is_city_tile(cell):
+            continue
+        if len(moves) == 1:
+            # a single move is only bumped by a unit that stays on the cell
+            units = units_at(cell)
+            if len(units) != 1 or next(iter(units)) in moving_units:
+                continue
+
+        worklist = list(moves)
+        while len(worklist) > 0:
+            source = sources[worklist.pop()]
+            if source in moves_to and not is_city_tile(source):
+                worklist += moves_to.pop(source)
+        moves_to.pop(cell, None)
+
+    return [i for moves in moves_to.values() for i in moves]
@@ -4,11 +4,56 @@ from .constants import Constants
 
 DIRECTIONS = Constants.DIRECTIONS
 
+# Positions with coordinates in this range are interned, which covers every cell of the largest maps and the
+# positions one step off them
+INTERN_MIN = -1
+INTERN_MAX = 64
+
+# (x, y) -> Position, shared by all games in this process
+_interned = {}
+
+# Index of each direction in the cached translations of a position
+_TRANSLATION_INDEX = {
+    DIRECTIONS.NORTH: 0,
+    DIRECTIONS.EAST: 1,
+    DIRECTIONS.SOUTH: 2,
+    DIRECTIONS.WEST: 3,
+    DIRECTIONS.CENTER: 4,
+}
+
 
 class Position:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
+    """
+    Immutable map position. Positions on and next to the map are interned, so Position(x, y) returns the same
+    object for the same coordinates, and each interned position caches its translations by one step.
+    """
+    __slots__ = ("x", "y", "_hash", "_translations")
+
+    def __new__(cls, x, y):
+        pos = _interned.get((x, y))
+        if pos is not None:
+            return pos
+
+        pos = object.__new__(cls)
+        object.__setattr__(pos, "x", x)
+        object.__setattr__(pos, "y", y)
+        object.__setattr__(pos, "_hash", 10000 * x + y)  # works as long as maps are at most 10000 by 10000
+        object.__setattr__(pos, "_translations", None)
+        if INTERN_MIN <= x < INTERN_MAX and INTERN_MIN <= y < INTERN_MAX:
+            _interned[(x, y)] = pos
+        return pos
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Position is immutable")
+
+    def __reduce__(self):
+        return Position, (self.x, self.y)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __sub__(self, pos) -> int:
         return abs(pos.x - self.x) + abs(pos.y - self.y)
@@ -31,9 +76,25 @@ class Position:
         return self == pos
 
     def __hash__(self):
-        return 10000 * self.x + self.y  # works as long as maps are at most 10000 by 10000
+        return self._hash
 
     def translate(self, direction, units) -> 'Position':
+        if units == 1:
+            index = _TRANSLATION_INDEX.get(direction)
+            if index is None:
+                return None
+            translations = self._translations
+            if translations is None:
+                translations = (
+                    Position(self.x, self.y - 1),
+                    Position(self.x + 1, self.y),
+                    Position(self.x, self.y + 1),
+                    Position(self.x - 1, self.y),
+                    self,
+                )
+                object.__setattr__(self, "_translations", translations)
+            return translations[index]
+
         if direction == DIRECTIONS.NORTH:
             return Position(self.x, self.y - units)
         elif direction == DIRECTIONS.EAST:
@@ -1,4 +1,5 @@
 
+import gzip
 import json
 from luxai2021.game.actions import Action
 from typing import List
@@ -79,4 +80,247 @@ class Replay:
             # Write the replay file
             json.dump(self.data, o)
 
-    
\ No newline at end of file
+    def close(self) -> None:
+        """
+        Releases the replay without writing it.
+        """
+        pass
+
+
+class StreamingReplay(Replay):
+    """
+    Replay-writer that appends a record per turn to a JSON-lines stream on disk instead of keeping the game in
+    memory. Stateful replays store the full map grid on the first turn and only the changed cells after that.
+    The stream can be turned into the Lux-viewer JSON with write_viewer_json() or load_replay_stream().
+
+    Records, one JSON object per line:
+        {"type": "header", ...}                      Replay fields, width and height.
+        {"type": "commands", "commands": [...]}      Commands of a turn.
+        {"type": "state", ..., "map": [[...]]}       First stateful state, with the whole map grid.
+        {"type": "state", ..., "mapDelta": [...]}    Later stateful states, with [x, y, cell data] of changed cells.
+        {"type": "end"}                              Written when the game ended.
+    """
+    def __init__(self, game, file:str, stateful:bool=False, compression:str=None):
+        """
+        Creates a streaming replay-writer to the target file.
+
+        Args:
+            file (str): Path of the stream.
+            stateful (bool, optional): Include the state of the game in each turn. Defaults to False.
+            compression (str, optional): None, "gzip" or "zstd". zstd needs the zstandard package.
+        """
+        self.stream = None
+        self.compression = compression
+        self.map = None
+        self.map_version = None
+        super().__init__(game, file, stateful)
+
+    def clear(self, game):
+        super().clear(game)
+        self.close()
+        self.map = None
+        self.map_version = None
+        self.stream = open_replay_stream(self.file, "w", self.compression)
+
+        header = {"type": "header"}
+        for key, value in self.data.items():
+            if key not in ("allCommands", "stateful"):
+                header[key] = value
+        header["stateful"] = self.stateful
+        header["width"] = game.map.width
+        header["height"] = game.map.height
+        self._append(header)
+
+    def add_actions(self, game, actions: List[Action]) -> None:
+        commands = []
+        for action in actions:
+            commands.append(
+                {
+                    "command" : action.to_message(self),
+                    "agentID" : action.team,
+                }
+            )
+        self._append({"type": "commands", "commands": commands})
+
+    def add_state(self, game) -> None:
+        if not self.stateful:
+            return
+
+        state = game.to_state_object()
+        grid = state.pop("map")
+        record = {"type": "state"}
+        record.update(state)
+        delta = None
+        if self.map is game.map:
+            _, delta = game.map.to_state_delta(self.map_version)
+        if delta is None:
+            record["map"] = grid
+        else:
+            record["mapDelta"] = delta
+        self.map = game.map
+        self.map_version = game.map.state_version
+        self._append(record)
+
+    def write(self, game) -> None:
+        """
+        Ends the stream. The Lux-viewer JSON is written on request with write_viewer_json().
+        """
+        self._append({"type": "end"})
+        self.close()
+
+    def close(self) -> None:
+        """
+        Flushes and closes the stream, without ending it.
+        """
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def write_viewer_json(self, path:str) -> None:
+        """
+        Writes the replay so far as Lux-viewer JSON.
+        """
+        if self.stream is not None:
+            self.stream.flush()
+        write_viewer_json(self.file, path)
+
+    def _append(self, record):
+        self.stream.write(json.dumps(record, separators=(",", ":")))
+        self.stream.write("\n")
+
+
+def _detect_compression(path):
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic[:2] == b"\x1f\x8b":
+        return "gzip"
+    if magic == b"\x28\xb5\x2f\xfd":
+        return "zstd"
+    return None
+
+
+def open_replay_stream(path:str, mode:str="r", compression:str=None):
+    """
+    Opens a replay stream as text.
+
+    Args:
+        path (str): Path of the stream.
+        mode (str, optional): "r" or "w". Defaults to "r".
+        compression (str, optional): None, "gzip" or "zstd". When reading, None detects it from the file.
+    """
+    if compression is None and "r" in mode:
+        compression = _detect_compression(path)
+
+    if compression is None:
+        return open(path, mode)
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compressed replays need the zstandard package, 'pip install zstandard'.")
+        return zstandard.open(path, mode + "t")
+    raise ValueError("Unknown replay compression '%s'" % compression)
+
+
+def iter_replay_stream(path:str):
+    """
+    Yields the records of a replay stream, with the map of every state rebuilt from the deltas. Streams of games
+    that are still running can be read up to the last flushed record.
+    """
+    grid = None
+    with open_replay_stream(path) as stream:
+        while True:
+            try:
+                line = stream.readline()
+            except EOFError:
+                # Compressed stream of a game that is still running
+                break
+            if not line:
+                break
+            if not line.endswith("\n"):
+                # Partially written record
+                break
+            record = json.loads(line)
+            if record["type"] == "state":
+                if "map" in record:
+                    grid = record["map"]
+                else:
+                    # Copy the rows, cells are replaced but never modified
+                    grid = [list(row) for row in grid]
+                    for x, y, cell in record.pop("mapDelta"):
+                        grid[y][x] = cell
+                    record["map"] = grid
+            yield record
+
+
+def _viewer_state(record):
+    state = {}
+    for key, value in record.items():
+        if key != "type" and key != "map":
+            state[key] = value
+    # Same key order as Game.to_state_object()
+    ordered = {}
+    for key in ["turn", "globalCityIDCount", "globalunit_idCount", "teamStates"]:
+        ordered[key] = state.pop(key)
+    ordered["map"] = record["map"]
+    ordered.update(state)
+    return ordered
+
+
+def _viewer_fields(path):
+    header = None
+    commands = []
+    for record in iter_replay_stream(path):
+        if record["type"] == "header":
+            header = record
+        elif record["type"] == "commands":
+            commands.append(record["commands"])
+    return header, commands
+
+
+def load_replay_stream(path:str) -> dict:
+    """
+    Loads a replay stream as Lux-viewer JSON data, as Replay writes it.
+    """
+    header, commands = _viewer_fields(path)
+    data = {}
+    for key in ["seed", "mapType", "teamDetails"]:
+        data[key] = header[key]
+    data["allCommands"] = commands
+    data["version"] = header["version"]
+    data["results"] = header["results"]
+    if header["stateful"]:
+        data["stateful"] = [
+            _viewer_state(record) for record in iter_replay_stream(path) if record["type"] == "state"
+        ]
+    data["width"] = header["width"]
+    data["height"] = header["height"]
+    return data
+
+
+def write_viewer_json(stream_path:str, path:str) -> None:
+    """
+    Converts a replay stream to a Lux-viewer JSON file. The states are written one at a time, so only the
+    commands are held in memory.
+    """
+    header, commands = _viewer_fields(stream_path)
+    with open(path, "w") as o:
+        o.write("{")
+        for key in ["seed", "mapType", "teamDetails"]:
+            o.write("%s: %s, " % (json.dumps(key), json.dumps(header[key])))
+        o.write('"allCommands": %s, ' % json.dumps(commands))
+        o.write('"version": %s, ' % json.dumps(header["version"]))
+        o.write('"results": %s, ' % json.dumps(header["results"]))
+        if header["stateful"]:
+            o.write('"stateful": [')
+            first = True
+            for record in iter_replay_stream(stream_path):
+                if record["type"] == "state":
+                    if not first:
+                        o.write(", ")
+                    json.dump(_viewer_state(record), o)
+                    first = False
+            o.write("], ")
+        o.write('"width": %s, "height": %s}' % (json.dumps(header["width"]), json.dumps(header["height"])))
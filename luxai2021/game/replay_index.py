@@ -0,0 +1,205 @@
+"""
+Indexed binary replays. Kaggle and Lux replays are converted once into a file with the commands and updates of
+every step split into tokens, and a table of step offsets. The files are memory-mapped, so any step is read in
+O(1) without loading the replay, and thousands of replays can be scanned by their header alone.
+
+File layout, little-endian:
+    magic (8 bytes), format version (u32), number of steps (u32), metadata length (u32)
+    metadata, JSON
+    offset table, number of steps + 1 u64 offsets of the step blocks from the start of the file
+    step blocks
+
+A step block holds three groups, the commands of team 0, the commands of team 1 and the updates of the
+observation, separated by GROUP_SEPARATOR. Each group holds records separated by RECORD_SEPARATOR, and each record
+holds tokens separated by TOKEN_SEPARATOR.
+"""
+import json
+import mmap
+import struct
+from collections import namedtuple
+
+from .constants import Constants
+
+MAGIC = b"LUXRPLIX"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<8sIII")
+OFFSET = struct.Struct("<Q")
+
+GROUP_SEPARATOR = "\x1d"
+RECORD_SEPARATOR = "\x1e"
+TOKEN_SEPARATOR = "\x1f"
+
+"""
+Commands and updates of a replay step. Step 0 is the initial observation, and step turn + 1 holds the commands
+played on the turn and the observation after it. Commands are tuples of tokens, by team, and updates are tuples of
+tokens in the order of the observation, which Game.process_updates() accepts in place of the update strings.
+"""
+ReplayStep = namedtuple("ReplayStep", ["commands", "updates"])
+
+
+def _encode_group(records):
+    return RECORD_SEPARATOR.join(TOKEN_SEPARATOR.join(record.split(" ")) for record in records)
+
+
+def _decode_group(text):
+    if len(text) == 0:
+        return []
+    return [tuple(record.split(TOKEN_SEPARATOR)) for record in text.split(RECORD_SEPARATOR)]
+
+
+def _kaggle_steps(replay):
+    steps = []
+    for step in replay["steps"]:
+        commands = [step[team]["action"] or [] for team in [Constants.TEAM.A, Constants.TEAM.B]]
+        updates = step[0]["observation"].get("updates") or []
+        steps.append((commands, updates))
+    metadata = {
+        "format": "kaggle",
+        "seed": replay["configuration"]["seed"],
+        "mapType": replay["configuration"].get("mapType"),
+        "width": replay["steps"][0][0]["observation"].get("width"),
+        "height": replay["steps"][0][0]["observation"].get("height"),
+        "episodeId": replay.get("info", {}).get("EpisodeId"),
+        "teamNames": replay.get("info", {}).get("TeamNames"),
+        "rewards": replay.get("rewards"),
+    }
+    return metadata, steps
+
+
+def _lux_steps(replay):
+    steps = [([[], []], [])]
+    for turn_commands in replay["allCommands"]:
+        commands = [[], []]
+        for command in turn_commands:
+            commands[command["agentID"]].append(command["command"])
+        steps.append((commands, []))
+    metadata = {
+        "format": "lux",
+        "seed": replay["seed"],
+        "mapType": replay.get("mapType"),
+        "width": replay.get("width"),
+        "height": replay.get("height"),
+        "teamNames": [team["name"] for team in replay.get("teamDetails", [])],
+    }
+    return metadata, steps
+
+
+def convert_replay(replay, path):
+    """
+    Converts a Kaggle replay or a Lux replay written by Replay into an indexed binary replay.
+    :param replay: Replay data, or the path of the replay JSON file.
+    :param path: Path of the indexed replay to write.
+    """
+    if isinstance(replay, str):
+        with open(replay, "r") as f:
+            replay = json.load(f)
+
+    if "steps" in replay:
+        metadata, steps = _kaggle_steps(replay)
+    else:
+        metadata, steps = _lux_steps(replay)
+
+    metadata_bytes = json.dumps(metadata).encode("utf-8")
+    blocks = [
+        GROUP_SEPARATOR.join([
+            _encode_group(commands[Constants.TEAM.A]),
+            _encode_group(commands[Constants.TEAM.B]),
+            _encode_group(updates),
+        ]).encode("utf-8")
+        for commands, updates in steps
+    ]
+
+    offset = HEADER.size + len(metadata_bytes) + OFFSET.size * (len(blocks) + 1)
+    offsets = [offset]
+    for block in blocks:
+        offset += len(block)
+        offsets.append(offset)
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(blocks), len(metadata_bytes)))
+        f.write(metadata_bytes)
+        f.write(struct.pack("<%iQ" % len(offsets), *offsets))
+        for block in blocks:
+            f.write(block)
+
+
+class IndexedReplay:
+    """
+    Memory-mapped indexed binary replay, written by convert_replay(). Only the header is read when it is opened,
+    and each step is decoded when it is requested.
+
+    Can be passed as the replay of AgentFromReplay and the replay_validate of MatchController in place of the
+    replay JSON data.
+    """
+    def __init__(self, path):
+        """
+
+        :param path: Path of the indexed replay.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.step_count, metadata_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("'%s' is not an indexed replay." % path)
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError("Indexed replay '%s' has unsupported format version %i." % (path, version))
+
+        self.metadata = json.loads(bytes(self._mmap[HEADER.size:HEADER.size + metadata_length]).decode("utf-8"))
+        self._offsets_start = HEADER.size + metadata_length
+
+    @property
+    def seed(self):
+        return self.metadata["seed"]
+
+    def close(self):
+        """
+        Unmaps the file.
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.step_count
+
+    def _groups(self, step):
+        if not 0 <= step < self.step_count:
+            raise IndexError("Step %i is out of range of the %i steps of the replay." % (step, self.step_count))
+        start, end = struct.unpack_from("<2Q", self._mmap, self._offsets_start + step * OFFSET.size)
+        return self._mmap[start:end].decode("utf-8").split(GROUP_SEPARATOR)
+
+    def get_step(self, step):
+        """
+        :param step: Step number, from 0 to len(replay) - 1.
+        :return: ReplayStep
+        """
+        team_a, team_b, updates = self._groups(step)
+        return ReplayStep((_decode_group(team_a), _decode_group(team_b)), _decode_group(updates))
+
+    def get_commands(self, turn, team):
+        """
+        Commands a team played on a turn.
+        :param turn:
+        :param team:
+        :return: List of commands, as tuples of tokens.
+        """
+        return _decode_group(self._groups(turn + 1)[team])
+
+    def get_updates(self, turn):
+        """
+        Updates of the observation after a turn. Lux replays have no observations, so their updates are empty.
+        :param turn:
+        :return: List of updates, as tuples of tokens.
+        """
+        return _decode_group(self._groups(turn + 1)[2])
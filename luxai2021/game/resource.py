@@ -13,6 +13,8 @@ class Resource:
         COAL = 'coal'
         URANIUM = 'uranium'
 
+    __slots__ = ("type", "amount")
+
     def __init__(self, resource_type, amount) -> None:
         """
 
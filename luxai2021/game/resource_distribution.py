@@ -0,0 +1,36 @@
+"""
+Fills the resource requests of many resource cells at once with numpy. Shared by Game and BatchedGame, the rounds
+mirror the request resolution loop of src/Game/index.ts -> Game.handleResourceTypeRelease().
+"""
+import numpy as np
+
+
+def fill_requests_in_equal_shares(amounts, active, amount_left):
+    """
+    Fills the requests of each resource cell in equal shares. Every round gives each open request of a cell the
+    smallest open request amount, or an equal share of what is left in the cell if that is less. Requests that
+    are filled are closed. When less is left in the cell than there are open requests, the rest is wasted.
+    :param amounts: Integer array of shape (n_cells, max_requests) of the requested amounts, a row per cell.
+    :param active: Bool array of the same shape, of which entries are requests.
+    :param amount_left: Integer array of shape (n_cells,) of the resource amount in each cell.
+    :return: (filled, amount_left), the amount given to each request and the amount left in each cell.
+    """
+    amounts = amounts.astype(np.int64)
+    active = active.copy()
+    amount_left = amount_left.astype(np.int64)
+    filled = np.zeros(amounts.shape, dtype=np.int64)
+
+    running = (amount_left > 0) & (np.where(active, amounts, 0).sum(axis=1) > 0)
+    while running.any():
+        n_active = active.sum(axis=1)
+        smallest = np.where(active, amounts, np.iinfo(np.int64).max).min(axis=1)
+        to_fill = np.where(running, np.minimum(smallest, amount_left // np.maximum(n_active, 1)), 0)
+        given = np.where(active & running[:, None], to_fill[:, None], 0)
+        filled += given
+        amounts -= given
+        amount_left = np.where(running, amount_left - to_fill * n_active, amount_left)
+        amount_left = np.where(running & (amount_left < n_active), 0, amount_left)
+        active = np.where(running[:, None], active & (amounts > 0), active)
+        running &= active.any(axis=1) & (np.where(active, amounts, 0).sum(axis=1) > 0) & (amount_left > 0)
+
+    return filled, amount_left
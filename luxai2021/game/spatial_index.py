@@ -0,0 +1,192 @@
+"""
+Spatial index of the resources, units and city tiles of a game, for nearest and furthest object queries under
+Manhattan distance
+"""
+from .constants import Constants
+
+# Object types with this many objects or fewer are searched by a linear scan instead of the grid buckets
+LINEAR_SCAN_SIZE = 16
+
+
+class SpatialIndex:
+    """
+    Buckets the objects of a game by type, team and cell. Objects are resource cells keyed by resource type, units
+    keyed by unit type and city tiles keyed by CITY_TILE. Units and city tiles are indexed both by their team, and
+    for any team with team=None.
+
+    Nearest queries search the cells in rings of increasing Manhattan distance around the query position, so they
+    only look at the cells up to the distance of the k-th nearest object. Furthest queries are answered from the
+    extremes of x + y and x - y of each object type. Nearest objects at the same distance are ordered by the order
+    they were added.
+    """
+    CITY_TILE = "city_tile"
+
+    def __init__(self, width, height):
+        """
+
+        :param width: Map width.
+        :param height: Map height.
+        """
+        self.width = width
+        self.height = height
+
+        # (object_type, team) -> list of (x, y, order, obj)
+        self._objects = {}
+
+        # (object_type, team) -> {(x, y): list of (order, obj)}
+        self._buckets = {}
+
+        # (object_type, team) -> [min x + y, max x + y, min x - y, max x - y] entries, as (value, order, obj)
+        self._extremes = {}
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        Builds the spatial index of the current state of a game.
+        :param game:
+        :return: SpatialIndex
+        """
+        index = cls(game.map.width, game.map.height)
+        for cell in game.map.resources:
+            index.add(cell.resource.type, None, cell.pos.x, cell.pos.y, cell)
+        for team in [Constants.TEAM.A, Constants.TEAM.B]:
+            for unit in game.get_teams_units(team).values():
+                index.add(unit.type, team, unit.pos.x, unit.pos.y, unit)
+        for city in game.cities.values():
+            for cell in city.city_cells:
+                index.add(cls.CITY_TILE, city.team, cell.pos.x, cell.pos.y, cell.city_tile)
+        return index
+
+    def add(self, object_type, team, x, y, obj):
+        """
+        Adds an object to the index.
+        :param object_type: Resource type, unit type or CITY_TILE.
+        :param team: Team of the object, None for resources.
+        :param x:
+        :param y:
+        :param obj: The object returned by the queries, eg. the Cell, Unit or CityTile.
+        """
+        keys = [(object_type, team)]
+        if team is not None:
+            keys.append((object_type, None))
+
+        for key in keys:
+            objects = self._objects.setdefault(key, [])
+            order = len(objects)
+            objects.append((x, y, order, obj))
+            self._buckets.setdefault(key, {}).setdefault((x, y), []).append((order, obj))
+
+            extremes = self._extremes.get(key)
+            s = x + y
+            t = x - y
+            if extremes is None:
+                self._extremes[key] = [(s, order, obj), (s, order, obj), (t, order, obj), (t, order, obj)]
+            else:
+                if s < extremes[0][0]:
+                    extremes[0] = (s, order, obj)
+                if s > extremes[1][0]:
+                    extremes[1] = (s, order, obj)
+                if t < extremes[2][0]:
+                    extremes[2] = (t, order, obj)
+                if t > extremes[3][0]:
+                    extremes[3] = (t, order, obj)
+
+    def count(self, object_type, team=None):
+        """
+        :param object_type: Resource type, unit type or CITY_TILE.
+        :param team: Team of the objects, or None for all teams.
+        :return: Number of objects of this type.
+        """
+        return len(self._objects.get((object_type, team), []))
+
+    def nearest(self, pos, object_type, team=None, k=1, exclude=None):
+        """
+        Finds the k objects of a type nearest to a position.
+        :param pos: Query position.
+        :param object_type: Resource type, unit type or CITY_TILE.
+        :param team: Team of the objects, or None for all teams.
+        :param k: Number of objects to return.
+        :param exclude: Object to leave out of the results, eg. the unit making the query.
+        :return: List of up to k (distance, obj), nearest first.
+        """
+        key = (object_type, team)
+        objects = self._objects.get(key)
+        if objects is None or k <= 0:
+            return []
+
+        if len(objects) <= LINEAR_SCAN_SIZE:
+            found = [
+                (abs(x - pos.x) + abs(y - pos.y), order, obj)
+                for x, y, order, obj in objects if obj is not exclude
+            ]
+            found.sort(key=lambda f: (f[0], f[1]))
+            return [(distance, obj) for distance, _, obj in found[:k]]
+
+        buckets = self._buckets[key]
+        found = []
+        max_distance = max(pos.x, self.width - 1 - pos.x) + max(pos.y, self.height - 1 - pos.y)
+        for distance in range(max_distance + 1):
+            for x, y in self._ring(pos.x, pos.y, distance):
+                bucket = buckets.get((x, y))
+                if bucket is not None:
+                    for order, obj in bucket:
+                        if obj is not exclude:
+                            found.append((distance, order, obj))
+
+            # All objects up to this distance are found, so the k nearest are known
+            if len(found) >= k:
+                break
+
+        found.sort(key=lambda f: (f[0], f[1]))
+        return [(distance, obj) for distance, _, obj in found[:k]]
+
+    def furthest(self, pos, object_type, team=None, exclude=None):
+        """
+        Finds the object of a type furthest from a position.
+        :param pos: Query position.
+        :param object_type: Resource type, unit type or CITY_TILE.
+        :param team: Team of the objects, or None for all teams.
+        :param exclude: Object to leave out of the results, eg. the unit making the query.
+        :return: (distance, obj), or None if there is no such object.
+        """
+        key = (object_type, team)
+        extremes = self._extremes.get(key)
+        if extremes is None:
+            return None
+
+        s = pos.x + pos.y
+        t = pos.x - pos.y
+        candidates = [
+            (s - extremes[0][0], extremes[0]),
+            (extremes[1][0] - s, extremes[1]),
+            (t - extremes[2][0], extremes[2]),
+            (extremes[3][0] - t, extremes[3]),
+        ]
+        distance, (_, order, obj) = min(candidates, key=lambda c: (-c[0], c[1][1]))
+        if obj is not exclude:
+            return distance, obj
+
+        # The excluded object is the furthest, scan the others
+        found = [
+            (abs(x - pos.x) + abs(y - pos.y), order, obj)
+            for x, y, order, obj in self._objects[key] if obj is not exclude
+        ]
+        if len(found) == 0:
+            return None
+        distance, _, obj = min(found, key=lambda f: (-f[0], f[1]))
+        return distance, obj
+
+    def _ring(self, x, y, distance):
+        """
+        Yields the cells on the map at exactly a Manhattan distance from (x, y).
+        """
+        if distance == 0:
+            yield x, y
+            return
+
+        for dx in range(max(-distance, -x), min(distance, self.width - 1 - x) + 1):
+            dy = distance - abs(dx)
+            if y + dy < self.height:
+                yield x + dx, y + dy
+            if dy != 0 and y - dy >= 0:
+                yield x + dx, y - dy
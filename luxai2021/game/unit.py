@@ -2,6 +2,7 @@
 Implements /src/Unit/index.ts -> Unit()
 """
 import math
+from collections.abc import MutableMapping
 
 from .actionable import Actionable
 from .actions import *
@@ -11,7 +12,64 @@ from .position import Position
 UNIT_TYPES = Constants.UNIT_TYPES
 
 
+class Cargo(MutableMapping):
+    """
+    Resources carried by a unit, stored as three ints. Reads and writes like the {"wood", "uranium", "coal"} cargo
+    dict of the JS engine, dict(cargo) converts it to that dict, eg for json.
+    """
+    __slots__ = ("wood", "coal", "uranium")
+
+    # Order of the keys of the cargo dict
+    KEYS = ("wood", "uranium", "coal")
+
+    def __init__(self, wood=0, coal=0, uranium=0):
+        """
+
+        :param wood:
+        :param coal:
+        :param uranium:
+        """
+        self.wood = wood
+        self.coal = coal
+        self.uranium = uranium
+
+    @classmethod
+    def from_dict(cls, cargo):
+        """
+        :param cargo: Dict of resource type to amount, or a Cargo.
+        :return: Cargo
+        """
+        return cls(cargo["wood"], cargo["coal"], cargo["uranium"])
+
+    def __getitem__(self, resource_type):
+        if resource_type not in Cargo.KEYS:
+            raise KeyError(resource_type)
+        return getattr(self, resource_type)
+
+    def __setitem__(self, resource_type, value):
+        if resource_type not in Cargo.KEYS:
+            raise KeyError(resource_type)
+        setattr(self, resource_type, value)
+
+    def __delitem__(self, resource_type):
+        raise TypeError("Cargo always holds wood, coal and uranium, set %s to 0 instead" % resource_type)
+
+    def __iter__(self):
+        return iter(Cargo.KEYS)
+
+    def __len__(self):
+        return len(Cargo.KEYS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+    def __str__(self) -> str:
+        return f"Cargo | Wood: {self.wood}, Coal: {self.coal}, Uranium: {self.uranium}"
+
+
 class Unit(Actionable):
+    __slots__ = ("pos", "team", "type", "id", "_cargo")
+
     def __init__(self, x, y, unit_type, team, configs, idcount, cooldown=0.0, cargo=None):
         """
 
@@ -26,7 +84,7 @@ class Unit(Actionable):
         """
         super().__init__(configs, cooldown)
         if cargo is None:
-            cargo = {"wood": 0, "uranium": 0, "coal": 0}
+            cargo = Cargo()
         self.pos = Position(x, y)
         self.team = team
         self.type = unit_type
@@ -34,6 +92,17 @@ class Unit(Actionable):
         self.cargo = cargo
         self.can_act_override = None
 
+    @property
+    def cargo(self):
+        """
+        Cargo of this unit, assigning a cargo dict stores it as a Cargo.
+        """
+        return self._cargo
+
+    @cargo.setter
+    def cargo(self, cargo):
+        self._cargo = cargo if isinstance(cargo, Cargo) else Cargo.from_dict(cargo)
+
     def is_worker(self) -> bool:
         return self.type == UNIT_TYPES.WORKER
 
@@ -44,7 +113,7 @@ class Unit(Actionable):
         """
         get cargo space left in this unit
         """
-        space_used = self.cargo["wood"] + self.cargo["coal"] + self.cargo["uranium"]
+        space_used = self.cargo.wood + self.cargo.coal + self.cargo.uranium
         if self.type == UNIT_TYPES.WORKER:
             return GAME_CONSTANTS["PARAMETERS"]["RESOURCE_CAPACITY"]["WORKER"] - space_used
         else:
@@ -55,9 +124,9 @@ class Unit(Actionable):
         Returns the fuel-value of all the cargo this unit has.
         """
         return (
-            self.cargo["wood"] * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["WOOD"] +
-            self.cargo["coal"] * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["COAL"] +
-            self.cargo["uranium"] * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["URANIUM"]
+            self.cargo.wood * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["WOOD"] +
+            self.cargo.coal * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["COAL"] +
+            self.cargo.uranium * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["URANIUM"]
         )
 
 
@@ -69,18 +138,18 @@ class Unit(Actionable):
         wood_needed = math.ceil(
             fuel_needed / self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["WOOD"]
         )
-        wood_used = min(self.cargo["wood"], wood_needed)
+        wood_used = min(self.cargo.wood, wood_needed)
         fuel_needed -= wood_used * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["WOOD"]
-        self.cargo["wood"] -= wood_used
+        self.cargo.wood -= wood_used
         if fuel_needed <= 0:
             return True
 
         coal_needed = math.ceil(
             fuel_needed / self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["COAL"]
         )
-        coal_used = min(self.cargo["coal"], coal_needed)
+        coal_used = min(self.cargo.coal, coal_needed)
         fuel_needed -= coal_used * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["COAL"]
-        self.cargo["coal"] -= coal_used
+        self.cargo.coal -= coal_used
 
         if fuel_needed <= 0:
             return True
@@ -88,9 +157,9 @@ class Unit(Actionable):
         uranium_needed = math.ceil(
             fuel_needed / self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["URANIUM"]
         )
-        uranium_used = min(self.cargo["uranium"], uranium_needed)
+        uranium_used = min(self.cargo.uranium, uranium_needed)
         fuel_needed -= uranium_used * self.configs["parameters"]["RESOURCE_TO_FUEL_RATE"]["URANIUM"]
-        self.cargo["uranium"] -= uranium_used
+        self.cargo.uranium -= uranium_used
 
         if fuel_needed <= 0:
             return True
@@ -103,30 +172,19 @@ class Unit(Actionable):
         """
         cell = game_map.get_cell_by_pos(self.pos)
         if not cell.has_resource() and self.can_act() and (
-                self.cargo["wood"] + self.cargo["coal"] + self.cargo["uranium"]) >= GAME_CONSTANTS["PARAMETERS"][
+                self.cargo.wood + self.cargo.coal + self.cargo.uranium) >= GAME_CONSTANTS["PARAMETERS"][
             "CITY_BUILD_COST"]:
             return True
         return False
 
 
-class Cargo:
-    def __init__(self):
-        self.wood = 0
-        self.coal = 0
-        self.uranium = 0
-
-    def __str__(self) -> str:
-        return f"Cargo | Wood: {self.wood}, Coal: {self.coal}, Uranium: {self.uranium}"
-
-
 class Worker(Unit):
     """
     Worker class. Mirrors /src/Unit/index.ts -> Worker()
     """
+    __slots__ = ()
 
     def __init__(self, x, y, team, configs, idcount, cooldown=0.0, cargo=None):
-        if cargo is None:
-            cargo = {"wood": 0, "uranium": 0, "coal": 0}
         super().__init__(x, y, Constants.UNIT_TYPES.WORKER, team, configs, idcount, cooldown, cargo)
 
     def get_light_upkeep(self):
@@ -190,6 +248,7 @@ class Worker(Unit):
                     cell.road - self.configs["parameters"]["PILLAGE_RATE"],
                     self.configs["parameters"]["MIN_ROAD"]
                 )
+                game.map.mark_dirty(cell)
             else:
                 acted = False
 
@@ -201,6 +260,7 @@ class Cart(Unit):
     """
     Cart class. Mirrors /src/Unit/index.ts -> Cart()
     """
+    __slots__ = ()
 
     def __init__(self, x, y, team, configs, id_count, cooldown=0.0, cargo=None):
         """
@@ -213,8 +273,6 @@ class Cart(Unit):
         :param cooldown: 
         :param cargo: 
         """
-        if cargo is None:
-            cargo = {"wood": 0, "uranium": 0, "coal": 0}
         super().__init__(x, y, Constants.UNIT_TYPES.CART, team, configs, id_count, cooldown, cargo)
 
     def get_light_upkeep(self):
@@ -264,6 +322,8 @@ class Cart(Unit):
                 end_cell.road + self.configs["parameters"]["CART_ROAD_DEVELOPMENT_RATE"],
                 self.configs["parameters"]["MAX_ROAD"]
             )
-            game.stats["teamStats"][self.team]["roadsBuilt"] += self.configs["parameters"]["CART_ROAD_DEVELOPMENT_RATE"]
+            game.map.mark_dirty(end_cell)
+            if not game.headless:
+                game.stats["teamStats"][self.team]["roadsBuilt"] += self.configs["parameters"]["CART_ROAD_DEVELOPMENT_RATE"]
             if end_cell not in game.cells_with_roads:
                 game.cells_with_roads.add(end_cell)
@@ -0,0 +1,21 @@
+"""
+Tests marked with @pytest.mark.benchmark time the engine, and are skipped unless the LUXAI_BENCHMARKS environment
+variable is set, eg.
+    LUXAI_BENCHMARKS=1 python -m pytest -s -m benchmark
+"""
+import os
+
+import pytest
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: timing of the engine, only run when LUXAI_BENCHMARKS is set")
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get("LUXAI_BENCHMARKS"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="benchmark, set LUXAI_BENCHMARKS=1 to run")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
@@ -0,0 +1,63 @@
+import time
+
+from luxai2021.game.actions import MoveAction
+from luxai2021.game.constants import Constants
+from luxai2021.game.game import Game
+
+from .test_vec_env import PositionAgent, PositionModel
+
+
+class SlowPositionAgent(PositionAgent):
+    """
+    Agent with observations that take at least 5ms, that keeps units in place when out of time.
+    """
+    observation_count = 0
+
+    def get_observation(self, game, unit, city_tile, team, is_new_turn):
+        self.observation_count += 1
+        time.sleep(0.005)
+        return super().get_observation(game, unit, city_tile, team, is_new_turn)
+
+    def get_default_action(self, game, unit, city_tile, team):
+        if unit is not None:
+            return MoveAction(team, unit.id, Constants.DIRECTIONS.CENTER)
+        return None
+
+
+def crowded_game():
+    """
+    Game with many workers for both teams.
+    """
+    game = Game({"seed": 1})
+    for i in range(60):
+        game.spawn_worker(i % 2, i % game.map.width, (i * 7) % game.map.height)
+    return game
+
+
+def test_batched_inference_matches_per_unit():
+    game = crowded_game()
+    for team in [Constants.TEAM.A, Constants.TEAM.B]:
+        per_unit = PositionAgent(mode="inference", model=PositionModel())
+        batched = PositionAgent(mode="inference", model=PositionModel(), batched_inference=True)
+        actions = per_unit.process_turn(game, team)
+        assert len(actions) > 10
+        assert [a.to_message(game) for a in batched.process_turn(game, team)] == [a.to_message(game) for a in actions]
+
+
+def test_turn_time_budget():
+    game = crowded_game()
+    team = Constants.TEAM.A
+    decisions = [unit for unit in game.get_teams_units(team).values() if unit.can_act()]
+    assert len(decisions) > 20
+
+    for batched_inference in [False, True]:
+        agent = SlowPositionAgent(mode="inference", model=PositionModel(), batched_inference=batched_inference,
+                                  turn_time_budget=0.05)
+        actions = agent.process_turn(game, team)
+        # Observations stop before the budget runs out, however slow the machine is
+        assert 0 < agent.observation_count <= 10
+
+        # Units that didn't fit in the budget stay in place
+        defaults = [a for a in actions if isinstance(a, MoveAction) and a.direction == Constants.DIRECTIONS.CENTER]
+        assert len(defaults) > 0
+        assert len([a for a in actions if a.unit_id is not None]) == len(decisions)
@@ -0,0 +1,130 @@
+import random
+
+import numpy as np
+from luxai2021.game.actions import MoveAction, PillageAction, ResearchAction, SpawnCityAction, SpawnWorkerAction, \
+    SpawnCartAction, TransferAction
+from luxai2021.game.array_state import ArrayGameState
+from luxai2021.game.constants import Constants
+from luxai2021.game.game import Game
+
+DIRECTIONS = [
+    Constants.DIRECTIONS.NORTH,
+    Constants.DIRECTIONS.EAST,
+    Constants.DIRECTIONS.SOUTH,
+    Constants.DIRECTIONS.WEST,
+    Constants.DIRECTIONS.CENTER,
+]
+
+
+def random_actions(game, rng):
+    """
+    Picks a random action for every unit and city tile that can act. Actions may be invalid, the game
+    validates them.
+    """
+    actions = []
+    for team in [Constants.TEAM.A, Constants.TEAM.B]:
+        for unit in game.get_teams_units(team).values():
+            if not unit.can_act():
+                continue
+            r = rng.random()
+            if r < 0.5 and unit.is_worker() and unit.can_build(game.map):
+                actions.append(SpawnCityAction(team, unit.id))
+            elif r < 0.2:
+                others = [u for u in game.get_teams_units(team).values() if u.id != unit.id and u.pos.is_adjacent(unit.pos)]
+                if len(others) > 0:
+                    actions.append(TransferAction(team, unit.id, rng.choice(others).id, Constants.RESOURCE_TYPES.WOOD, 20))
+            elif r < 0.22:
+                actions.append(PillageAction(team, unit.id))
+            else:
+                actions.append(MoveAction(team, unit.id, rng.choice(DIRECTIONS)))
+
+        for city in game.cities.values():
+            if city.team != team:
+                continue
+            for cell in city.city_cells:
+                if not cell.city_tile.can_act():
+                    continue
+                r = rng.random()
+                if r < 0.7:
+                    actions.append(SpawnWorkerAction(team, None, cell.pos.x, cell.pos.y))
+                elif r < 0.8:
+                    actions.append(SpawnCartAction(team, None, cell.pos.x, cell.pos.y))
+                else:
+                    actions.append(ResearchAction(team, cell.pos.x, cell.pos.y, None))
+    return actions
+
+
+def play_random_game(seed, turns):
+    """
+    Plays a game with random actions for the specified number of turns.
+    """
+    rng = random.Random(seed)
+    game = Game({"seed": seed})
+    for _ in range(turns):
+        if game.run_turn_with_actions(random_actions(game, rng)):
+            break
+    return game
+
+
+def test_array_state_views_match_game():
+    for seed in [1, 4, 7]:
+        game = play_random_game(seed, 120)
+        state = ArrayGameState.from_game(game)
+        assert state.turn == game.state["turn"]
+
+        for y in range(game.map.height):
+            for x in range(game.map.width):
+                cell = game.map.get_cell(x, y)
+                view = state.get_cell(x, y)
+                assert view.has_resource() == cell.has_resource()
+                if cell.resource is not None:
+                    assert view.resource.type == cell.resource.type
+                    assert view.resource.amount == cell.resource.amount
+                assert view.get_road() == cell.get_road()
+                assert view.is_city_tile() == cell.is_city_tile()
+                if cell.is_city_tile():
+                    assert view.city_tile.team == cell.city_tile.team
+                    assert view.city_tile.city_id == cell.city_tile.city_id
+                    assert view.city_tile.cooldown == cell.city_tile.cooldown
+                    assert view.city_tile.adjacent_city_tiles == cell.city_tile.adjacent_city_tiles
+                assert view.has_units() == cell.has_units()
+                assert sorted(view.units.keys()) == sorted(cell.units.keys())
+
+        for team in [Constants.TEAM.A, Constants.TEAM.B]:
+            units = game.get_teams_units(team)
+            views = state.get_teams_units(team)
+            assert list(views.keys()) == list(units.keys())
+            for unit_id, unit in units.items():
+                view = views[unit_id]
+                assert view.pos == unit.pos
+                assert view.type == unit.type
+                assert view.cooldown == unit.cooldown
+                assert dict(view.cargo.items()) == unit.cargo
+                assert view.get_cargo_space_left() == unit.get_cargo_space_left()
+                assert view.get_cargo_fuel_value() == unit.get_cargo_fuel_value()
+                assert view.can_build(state) == unit.can_build(game.map)
+
+        cities = state.get_cities()
+        assert list(cities.keys()) == list(game.cities.keys())
+        for city_id, city in game.cities.items():
+            assert cities[city_id].team == city.team
+            assert cities[city_id].fuel == city.fuel
+            assert cities[city_id].get_light_upkeep() == city.get_light_upkeep()
+            assert len(cities[city_id].city_cells) == len(city.city_cells)
+
+
+def test_array_state_views_write_through():
+    game = play_random_game(4, 30)
+    state = ArrayGameState.from_game(game)
+    unit = list(state.get_teams_units(Constants.TEAM.A).values())[0]
+    unit.cargo[Constants.RESOURCE_TYPES.COAL] = 7
+    unit.cooldown = 3
+    assert state.unit_cargo[unit.slot, 1] == 7
+    assert state.unit_cooldown[unit.slot] == 3
+    assert not unit.can_act()
+
+    # Map arrays are shared with the views, and can be used as observation planes directly
+    cell = state.get_cell(0, 0)
+    cell.road = 2.5
+    assert state.road[0, 0] == 2.5
+    assert np.shares_memory(state.get_arrays()["road"], state.road)
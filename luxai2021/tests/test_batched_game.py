@@ -0,0 +1,145 @@
+import random
+import time
+
+import numpy as np
+import pytest
+from luxai2021.game.actions import MoveAction
+from luxai2021.game.array_state import ArrayGameState, NO_TEAM
+from luxai2021.game.batched_game import BatchedGame
+from luxai2021.game.constants import Constants
+from luxai2021.game.game import Game
+from luxai2021.game.game_map_vectorized import NO_RESOURCE
+
+from .test_array_state import DIRECTIONS, random_actions
+
+
+def noisy_actions(game, rng):
+    """
+    Random actions, plus some duplicate and conflicting actions to cover the units and city tiles that get
+    more than one action.
+    """
+    actions = random_actions(game, rng)
+    for action in list(actions):
+        r = rng.random()
+        if r < 0.03:
+            actions.append(action)
+        elif r < 0.06 and hasattr(action, "unit_id") and action.unit_id is not None:
+            actions.append(MoveAction(action.team, action.unit_id, rng.choice(DIRECTIONS)))
+    return actions
+
+
+def assert_same_state(batch, index, game):
+    """
+    Checks that a game of the batch has exactly the same state as the Game.
+    """
+    state = batch.states[index]
+    expected = ArrayGameState.from_game(game)
+    assert state.width == expected.width and state.height == expected.height
+    assert state.turn == expected.turn
+    assert state.global_unit_id_count == expected.global_unit_id_count
+    assert state.global_city_id_count == expected.global_city_id_count
+
+    for name in ["resource_type", "resource_amount", "road", "city_tile_team", "city_tile_cooldown",
+                 "city_tile_adjacent", "research_points", "researched", "fuel_generated"]:
+        assert np.array_equal(getattr(state, name), getattr(expected, name)), name
+
+    # Cities, with their tiles in order
+    assert [state.city_ids[slot] for slot in np.flatnonzero(state.city_alive)] == list(game.cities.keys())
+    for city_id, city in game.cities.items():
+        slot = state.city_slot_by_id[city_id]
+        assert state.city_team[slot] == city.team
+        assert state.city_fuel[slot] == city.fuel
+        assert state.get_city_tiles(slot) == [(cell.pos.x, cell.pos.y) for cell in city.city_cells]
+
+    # Units, in order
+    for team in [Constants.TEAM.A, Constants.TEAM.B]:
+        units = game.get_teams_units(team)
+        views = state.get_teams_units(team)
+        assert list(views.keys()) == list(units.keys())
+        for unit_id, unit in units.items():
+            slot = views[unit_id].slot
+            assert state.unit_type[slot] == unit.type
+            assert (state.unit_x[slot], state.unit_y[slot]) == (unit.pos.x, unit.pos.y)
+            assert state.unit_cooldown[slot] == unit.cooldown
+            assert list(state.unit_cargo[slot]) == [unit.cargo["wood"], unit.cargo["coal"], unit.cargo["uranium"]]
+
+    # Units on each cell
+    assert {cell: sorted(state.units_at(*cell)) for cell in state.unit_slots_by_cell} == \
+        {(cell.pos.x, cell.pos.y): sorted(cell.units) for row in game.map.map for cell in row if cell.has_units()}
+
+    # Padding of smaller maps stays empty
+    padding = np.ones((batch.max_height, batch.max_width), dtype=bool)
+    padding[:state.height, :state.width] = False
+    assert (batch.arrays["resource_type"][index][padding] == NO_RESOURCE).all()
+    assert (batch.arrays["city_tile_team"][index][padding] == NO_TEAM).all()
+
+
+def new_game(seed):
+    """
+    Creates a game, every other game with everything researched so coal and uranium get mined.
+    """
+    game = Game({"seed": seed})
+    if seed % 2 == 1:
+        for team in [Constants.TEAM.A, Constants.TEAM.B]:
+            game.state["teamStates"][team]["researchPoints"] = 200
+            for resource_type in game.state["teamStates"][team]["researched"]:
+                game.state["teamStates"][team]["researched"][resource_type] = True
+    return game
+
+
+def test_batched_game_matches_game():
+    rng = random.Random(5)
+    seeds = [1, 4, 7, 120, 3551, 900]
+    games = [new_game(seed) for seed in seeds]
+    batch = BatchedGame(games=[new_game(seed) for seed in seeds])
+    next_seed = 10001
+    finished = 0
+
+    for turn in range(360):
+        actions = [noisy_actions(game, rng) for game in games]
+        expected_over = [game.run_turn_with_actions(game_actions) for game, game_actions in zip(games, actions)]
+        over = batch.run_turn_with_actions(actions)
+        assert list(over) == expected_over
+
+        for index, game in enumerate(games):
+            assert_same_state(batch, index, game)
+            if over[index]:
+                # Replace finished games with new ones
+                assert batch.get_winning_team(index) == game.get_winning_team()
+                finished += 1
+                games[index] = new_game(next_seed)
+                batch.load_game(index, new_game(next_seed))
+                next_seed += 1
+
+    assert finished > 0
+
+
+def test_batched_game_reset():
+    batch = BatchedGame({"seed": 22}, n_games=2)
+    batch.reset(1, seed=4)
+    assert_same_state(batch, 0, Game({"seed": 22}))
+    assert_same_state(batch, 1, Game({"seed": 4}))
+
+
+@pytest.mark.benchmark
+def test_batched_game_speed():
+    n_games = 64
+    turns = 80
+    games = [Game({"seed": seed}) for seed in range(n_games)]
+    batch = BatchedGame(games=[Game({"seed": seed}) for seed in range(n_games)])
+    actions = [[[] for _ in range(n_games)] for _ in range(turns)]
+
+    start = time.perf_counter()
+    for turn in range(turns):
+        for game, game_actions in zip(games, actions[turn]):
+            game.run_turn_with_actions(game_actions)
+    game_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for turn in range(turns):
+        batch.run_turn_with_actions(actions[turn])
+    batch_time = time.perf_counter() - start
+
+    print(f"{n_games} games, {turns} turns: Game {game_time:.3f}s, BatchedGame {batch_time:.3f}s")
+    for index, game in enumerate(games):
+        assert_same_state(batch, index, game)
@@ -0,0 +1,174 @@
+import json
+import os
+import time
+
+import pytest
+
+from luxai2021.game.command_parser import parse_updates
+from luxai2021.game.constants import Constants, LuxMatchConfigs_Default
+from luxai2021.game.game import Game
+
+REPLAY_DIR = os.path.join(os.path.dirname(__file__), "replays_for_test")
+REPLAY_IDS = ["27095556", "26835897", "26773935", "26691974", "26688997", "26690562", "27075871"]
+
+
+def load_replay(replay_id):
+    with open(os.path.join(REPLAY_DIR, "%s.json" % replay_id), "r") as f:
+        return json.load(f)
+
+
+def replay_messages(replay):
+    """
+    Returns the commands of every turn by team, and the updates of every observation.
+    """
+    commands = [[step[team]["action"] or [] for team in [0, 1]] for step in replay["steps"]]
+    updates = [step[0]["observation"]["updates"] for step in replay["steps"]]
+    return commands, updates
+
+
+def replay_configs(replay):
+    configs = dict(LuxMatchConfigs_Default)
+    configs["seed"] = replay["configuration"]["seed"]
+    configs["logFile"] = None
+    return configs
+
+
+def observation_configs(replay):
+    """
+    Configs of a game that is built from the observations of a replay, like the game of AgentFromStdInOut, an
+    empty map of the size of the replay.
+    """
+    observation = replay["steps"][0][0]["observation"]
+    configs = replay_configs(replay)
+    configs["width"] = observation["width"]
+    configs["height"] = observation["height"]
+    configs["mapType"] = Constants.MAP_TYPES.EMPTY
+    return configs
+
+
+def observed_updates(game, light_upkeep=True):
+    """
+    Updates of the observation the kaggle controller sends for a game, as parsed by parse_updates(), sorted.
+    :param light_upkeep: Include the light upkeep of the cities, or else None.
+    """
+    updates = []
+    for team, team_state in game.state["teamStates"].items():
+        updates.append(("rp", (team, team_state["researchPoints"])))
+    for cell in game.map.resources:
+        updates.append(("r", (cell.resource.type, cell.pos.x, cell.pos.y, cell.resource.amount)))
+    for team, team_state in game.state["teamStates"].items():
+        for unit in team_state["units"].values():
+            cargo = unit.cargo
+            updates.append(("u", (unit.type, team, unit.id, unit.pos.x, unit.pos.y, unit.cooldown,
+                                  cargo.wood, cargo.coal, cargo.uranium)))
+    for city in game.cities.values():
+        upkeep = city.get_light_upkeep() if light_upkeep else None
+        updates.append(("c", (city.team, city.id, city.fuel, upkeep)))
+        for cell in city.city_cells:
+            updates.append(("ct", (city.team, city.id, cell.pos.x, cell.pos.y, cell.city_tile.cooldown)))
+    for row in game.map.map:
+        for cell in row:
+            if cell.get_road() > 0:
+                updates.append(("ccd", (cell.pos.x, cell.pos.y, cell.get_road())))
+    return sorted(updates, key=repr)
+
+
+def replay_turns(replay):
+    """
+    Plays the commands of a replay.
+    :return: Generator of (game, commands by team, updates) before each turn, with the commands played on the turn
+        and the parsed and sorted updates of the observation that the kaggle controller sent for the turn.
+    """
+    commands, updates = replay_messages(replay)
+    game = Game(replay_configs(replay))
+    for step in range(len(updates) - 1):
+        yield game, commands[step + 1], sorted(parse_updates(updates[step]), key=repr)
+        actions = [game.action_from_string(command, team) for team in [0, 1] for command in commands[step + 1][team]]
+        if game.run_turn_with_actions([action for action in actions if action is not None]):
+            break
+
+
+def test_parse_updates():
+    updates = ["0", "12 12", "rp 0 51", "r wood 3 4 300.0", "u 0 1 u_1 2 3 1.5 10 0 2", "c 1 c_1 100.5 23",
+               "ct 1 c_1 4 5 2.0", "ccd 4 5 6.0", "D_DONE", "rp 1 0"]
+    assert parse_updates(updates) == [
+        ("rp", (0, 51)),
+        ("r", ("wood", 3, 4, 300)),
+        ("u", (0, 1, "u_1", 2, 3, 1.5, 10, 0, 2)),
+        ("c", (1, "c_1", 100.5, 23.0)),
+        ("ct", (1, "c_1", 4, 5, 2.0)),
+        ("ccd", (4, 5, 6.0)),
+    ]
+    assert parse_updates([tuple(u.split(" ")) for u in updates]) == parse_updates(updates)
+
+
+def test_parse_command_errors():
+    game = Game({"seed": 1})
+    unit_id = list(game.get_teams_units(0))[0]
+    assert game.action_from_command_low("m %s n" % unit_id, 0).to_message(game) == "m %s n" % unit_id
+    assert game.action_from_command_low(("t", unit_id, "u_9", "wood", "5"), 0).amount == 5
+    for command in ["m", "m %s" % unit_id, "bw 1 2 3", "x 1 2"]:
+        with pytest.raises(Exception):
+            game.action_from_command_low(command, 0)
+    with pytest.raises(KeyError):
+        game.action_from_command_low("bcity u_999", 0)
+    assert game.action_from_string("p u_999", 0) is None
+
+
+@pytest.mark.parametrize("replay_id", REPLAY_IDS[:3])
+def test_updates_match_replay(replay_id):
+    replay = load_replay(replay_id)
+    _, updates = replay_messages(replay)
+    configs = observation_configs(replay)
+
+    # The updates of every observation build the observed game. The updates have no city tile adjacency, so the
+    # light upkeep is not restored.
+    for step in range(0, len(updates), 10):
+        game = Game(configs)
+        game.reset(updates[step])
+        expected = [(identifier, values[:3] + (None,) if identifier == "c" else values)
+                    for identifier, values in parse_updates(updates[step])]
+        assert observed_updates(game, light_upkeep=False) == sorted(expected, key=repr)
+
+
+@pytest.mark.parametrize("replay_id", REPLAY_IDS[:3])
+def test_commands_match_replay(replay_id):
+    # Every command of the replay parses into the action with that command
+    commands_parsed = 0
+    for game, commands, _ in replay_turns(load_replay(replay_id)):
+        for team in [0, 1]:
+            for command in commands[team]:
+                assert game.action_from_command_low(command, team).to_message(game) == command
+                commands_parsed += 1
+    assert commands_parsed > 1000
+
+
+@pytest.mark.benchmark
+def test_parsing_speed():
+    command_time = 0.0
+    update_time = 0.0
+    command_count = 0
+    for replay_id in REPLAY_IDS:
+        replay = load_replay(replay_id)
+        commands, updates = replay_messages(replay)
+        configs = replay_configs(replay)
+
+        game = Game(configs)
+        start_time = time.time()
+        for step_commands in commands:
+            for team in [0, 1]:
+                for command in step_commands[team]:
+                    if not command.startswith("p ") and not command.startswith("bcity "):
+                        game.action_from_command_low(command, team)
+                        command_count += 1
+        command_time += time.time() - start_time
+
+        # Observations of every tenth turn, applied to a new game
+        for step in range(1, len(updates), 10):
+            game = Game(configs)
+            start_time = time.time()
+            game.process_updates(updates[step])
+            update_time += time.time() - start_time
+
+    print("%i commands parsed in %.1fms. Updates applied in %.1fms." %
+          (command_count, command_time * 1000, update_time * 1000))
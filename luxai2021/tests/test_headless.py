@@ -0,0 +1,55 @@
+import random
+import time
+
+import pytest
+
+from luxai2021.game.constants import Constants
+from luxai2021.game.game import Game
+
+from .test_array_state import random_actions
+
+
+def play(configs, seed, turns):
+    """
+    Plays random turns and returns the game and the state object after each turn.
+    """
+    game = Game(configs)
+    for i in range(40):
+        game.spawn_worker(i % 2, (i * 3) % game.map.width, (i * 7) % game.map.height)
+    rng = random.Random(seed)
+    states = []
+    for _ in range(turns):
+        done = game.run_turn_with_actions(random_actions(game, rng))
+        states.append(game.to_state_object())
+        if done:
+            break
+    return game, states
+
+
+def test_headless_rules_match():
+    for seed in [1, 2, 3]:
+        game, states = play({"seed": seed}, seed, 80)
+        headless_game, headless_states = play({"seed": seed, "headless": True}, seed, 80)
+        assert headless_states == states
+        assert game.log_sink is not None
+        assert headless_game.log_sink is None
+
+        # Only the stats that break ties are kept
+        for team in [Constants.TEAM.A, Constants.TEAM.B]:
+            assert headless_game.stats["teamStats"][team]["fuelGenerated"] == \
+                game.stats["teamStats"][team]["fuelGenerated"]
+            assert headless_game.stats["teamStats"][team]["workersBuilt"] == 0
+
+
+@pytest.mark.benchmark
+def test_headless_speed():
+    turns_per_second = {}
+    for headless in [False, True]:
+        start_time = time.time()
+        turns = 0
+        for seed in [1, 2, 3]:
+            _, states = play({"seed": seed, "headless": headless}, seed, 80)
+            turns += len(states)
+        turns_per_second[headless] = turns / (time.time() - start_time)
+
+    print("%.0f turns per second, %.0f turns per second headless." % (turns_per_second[False], turns_per_second[True]))
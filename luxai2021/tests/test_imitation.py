@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+from luxai2021.env.imitation import ImitationDataset, build_dataset, replay_samples
+from luxai2021.game.replay_index import convert_replay
+
+from .test_vec_env import PositionAgent
+
+REPLAY_DIR = os.path.join(os.path.dirname(__file__), "replays_for_test")
+
+
+def test_replay_samples():
+    samples, unmatched, failed = replay_samples(os.path.join(REPLAY_DIR, "26688997.json"), PositionAgent())
+    assert not failed
+    assert len(samples) > 1000
+    assert unmatched > 0  # Eg. transfers and carts, which PositionAgent has no action code for
+
+    observation, action_code, turn, team = samples[0]
+    assert turn == 0
+    assert team == 0
+    assert 0 <= action_code < 5
+    assert observation.shape == (4,)
+
+
+def test_build_dataset(tmp_path):
+    indexed_path = str(tmp_path / "26688997.lri")
+    convert_replay(os.path.join(REPLAY_DIR, "26688997.json"), indexed_path)
+    replay_paths = [indexed_path, os.path.join(REPLAY_DIR, "27095556.json")]
+
+    manifest = build_dataset(replay_paths, PositionAgent, str(tmp_path / "serial"), shard_size=1000)
+    parallel_manifest = build_dataset(replay_paths, PositionAgent, str(tmp_path / "parallel"), processes=2,
+                                      shard_size=1000)
+    assert parallel_manifest == manifest
+    assert manifest["failedReplays"] == []
+    assert len(manifest["shards"]) > 1
+    assert all(shard["samples"] == 1000 for shard in manifest["shards"][:-1])
+
+    dataset = ImitationDataset(str(tmp_path / "serial"))
+    parallel_dataset = ImitationDataset(str(tmp_path / "parallel"))
+    assert isinstance(dataset.shards[0]["observations"], np.memmap)
+    assert len(dataset) == sum(shard["samples"] for shard in manifest["shards"])
+    for name in ["observations", "actions", "turns", "teams", "replays"]:
+        assert np.array_equal(dataset.get_array(name), parallel_dataset.get_array(name))
+
+    # Samples of the first replay come first, and match playing it alone
+    samples, _, _ = replay_samples(indexed_path, PositionAgent())
+    replays = dataset.get_array("replays")
+    assert np.all(replays[:len(samples)] == 0) and np.all(replays[len(samples):] == 1)
+    for i in [0, 999, 1000, len(samples) - 1]:
+        observation, action_code = dataset[i]
+        assert np.array_equal(observation, samples[i][0].astype(np.float32))
+        assert action_code == samples[i][1]
@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+from luxai2021.game import log_sink
+from luxai2021.game.actions import MoveAction
+from luxai2021.game.constants import Constants, LuxMatchConfigs_Default
+from luxai2021.game.game import Game
+from luxai2021.game.log_sink import LogSink, RingBufferLogSink, flush_log_sinks, open_log_sink
+
+
+def test_file_sink_is_lazy_and_buffered(tmp_path):
+    path = str(tmp_path / "log_{pid}.txt")
+    sink = open_log_sink(path, "w")
+    assert open_log_sink(path) is sink
+    resolved = str(tmp_path / ("log_%i.txt" % os.getpid()))
+    assert sink.path == resolved
+
+    flush_log_sinks()
+    assert not os.path.exists(resolved)
+
+    for i in range(10):
+        sink.write("line %i" % i)
+    flush_log_sinks()
+    with open(resolved) as f:
+        assert f.read().splitlines() == ["line %i" % i for i in range(10)]
+
+    # The background thread flushes without being asked
+    sink.write("line 10")
+    deadline = time.time() + 5 * log_sink.FLUSH_INTERVAL
+    while time.time() < deadline:
+        with open(resolved) as f:
+            if len(f.read().splitlines()) == 11:
+                break
+        time.sleep(0.05)
+    with open(resolved) as f:
+        assert f.read().splitlines()[-1] == "line 10"
+    sink.close()
+    assert open_log_sink(path) is not sink
+    open_log_sink(path).close()
+
+
+def test_file_sink_rate_limit(tmp_path):
+    path = str(tmp_path / "limited.txt")
+    sink = open_log_sink(path, "w", rate_limit=5)
+    for i in range(20):
+        sink.write("line %i" % i)
+    assert sink.dropped == 15
+    sink._window_start -= 1.0
+    sink.write("after")
+    sink.close()
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert lines == ["line %i" % i for i in range(5)] + ["... 15 lines dropped by the log rate limit", "after"]
+
+
+def test_game_logs_in_memory():
+    game = Game({"seed": 1, "logFile": None})
+    unit = list(game.get_teams_units(Constants.TEAM.A).values())[0]
+    # Moving an opponent unit is rejected and logged
+    game.run_turn_with_actions([MoveAction(Constants.TEAM.B, unit.id, Constants.DIRECTIONS.NORTH)])
+    assert isinstance(game.log_sink, RingBufferLogSink)
+    assert game.log_sink.get_lines()[0] == "Error processing action"
+
+
+def test_default_logs_in_memory():
+    # Games only write log files when asked to, eg "log_{pid}.txt" for one file per SubprocVecEnv worker
+    for key in ["logFile", "errorLogFile"]:
+        assert LuxMatchConfigs_Default[key] is None
+    assert isinstance(open_log_sink(LuxMatchConfigs_Default["errorLogFile"], "a"), RingBufferLogSink)
+
+    with pytest.raises(TypeError):
+        LogSink()
@@ -1,11 +1,25 @@
+import random
 import time
 from unittest import TestCase
 import json
 import os
+import copy
+import gc
+import pickle
+import sys
+import types
+
+import pytest
+
 from luxai2021.game.actions import MoveAction
 from ..game.constants import Constants
 from ..game.game import Game
 from ..game.game_constants import GAME_CONSTANTS
+from ..game.game_map import get_adjacency_tables, map_template_cache
+from ..game.position import Position
+from ..game.actionable import NO_ACTIONS
+from ..game.cell import NO_UNITS
+from .test_array_state import random_actions
 
 class TestMap(TestCase):
     def test_gen_game(self):
@@ -164,3 +178,231 @@ class TestMap(TestCase):
         assert (total_time / 10.0) <= 2.0  # Normally takes ~0.312 seconds per game on my device
 
         return True
+
+    def test_map_template_cache(self):
+        print("Testing cached map generation matches a fresh generation")
+        map_template_cache.clear()
+        for seed in [0, 1, 123456789]:
+            uncached = Game({"seed": seed, "mapCacheSize": 0})
+            generated = Game({"seed": seed})
+            start_time = time.time()
+            cached = Game({"seed": seed})
+            cached.reset()
+            print("Seed %i: %.4f seconds for two cached resets." % (seed, time.time() - start_time))
+
+            for game in [generated, cached]:
+                assert game.map.get_map_string() == uncached.map.get_map_string()
+                assert game.to_state_object() == uncached.to_state_object()
+                assert [c.pos for c in game.map.resources] == [c.pos for c in uncached.map.resources]
+
+            # The cached map must be a fresh copy, not shared with the other games
+            cached.map.resources[0].resource.amount = 0
+            assert uncached.map.resources[0].resource.amount != 0
+            assert Game({"seed": seed}).map.resources[0].resource.amount != 0
+
+        assert len(map_template_cache.templates) == 3
+
+        # The cache is shared by the process, a game with a smaller cache size doesn't evict the other maps
+        Game({"seed": 99, "mapCacheSize": 1})
+        assert len(map_template_cache.templates) == 4
+        assert map_template_cache.max_size == 64
+        Game({"seed": 99, "mapCacheSize": 100})
+        assert map_template_cache.max_size == 100
+        map_template_cache.resize(64)
+        return True
+
+    def test_map_gen_vectorized(self):
+        print("Testing vectorized map generation matches the reference generator")
+        for seed in range(60):
+            configs = {"seed": seed, "mapCacheSize": 0}
+            if seed % 3 == 1:
+                configs.update({"width": 12, "height": 12})
+            elif seed % 3 == 2:
+                configs.update({"width": 32, "height": 32})
+
+            game = Game(configs)
+            game_vectorized = Game(dict(configs, vectorizedMapGen=True))
+            assert game_vectorized.to_state_object() == game.to_state_object(), f"Map mismatch for seed {seed}"
+            assert [c.pos for c in game_vectorized.map.resources] == [c.pos for c in game.map.resources]
+        return True
+
+    @pytest.mark.benchmark
+    def test_map_gen_vectorized_speed(self):
+        print("Testing map generation speed")
+        for size in [12, 16, 24, 32]:
+            times = {}
+            for vectorized in [False, True]:
+                start_time = time.time()
+                for seed in range(10):
+                    Game({"seed": seed, "mapCacheSize": 0, "vectorizedMapGen": vectorized, "width": size, "height": size})
+                times[vectorized] = (time.time() - start_time) / 10.0
+
+            print("Map size %i: %.4f seconds per map, %.4f seconds per map vectorized." % (size, times[False], times[True]))
+        return True
+
+    def test_resource_index(self):
+        print("Testing the resource index matches a full rescan of the map")
+        depleted = 0
+        for seed in range(4):
+            game = Game({"seed": seed})
+            for team in [Constants.TEAM.A, Constants.TEAM.B]:
+                game.state["teamStates"][team]["researchPoints"] = 200
+                for resource_type in game.state["teamStates"][team]["researched"]:
+                    game.state["teamStates"][team]["researched"][resource_type] = True
+                for i in range(8):
+                    cell = game.map.resources[(i * 7 + team) % len(game.map.resources)]
+                    game.spawn_worker(team, cell.pos.x, cell.pos.y)
+
+            initial = list(game.map.resources)
+            rng = random.Random(seed)
+            game_over = False
+            while not game_over:
+                game_over = game.run_turn_with_actions(random_actions(game, rng))
+
+                expected = [cell for cell in initial if cell.resource.amount > 0]
+                assert game.map.resources == expected
+                assert sum(cell.has_resource() for row in game.map.map for cell in row) == len(expected)
+                for resource_type, cells in game.map.resources_by_type.items():
+                    assert cells == [cell for cell in expected if cell.resource.type == resource_type]
+                    positions = game.map.get_resource_positions(resource_type)
+                    assert positions.tolist() == [[cell.pos.x, cell.pos.y] for cell in cells]
+                    assert positions is game.map.get_resource_positions(resource_type)
+            depleted += len(initial) - len(game.map.resources)
+
+        assert depleted > 0
+        return True
+
+    def test_adjacent_cells(self):
+        print("Testing the precomputed adjacent cells")
+        for configs in [{"seed": 1}, {"seed": 2, "width": 12, "height": 12}]:
+            game = Game(configs)
+            game_map = game.map
+            for row in game_map.map:
+                for cell in row:
+                    x, y = cell.pos.x, cell.pos.y
+                    adjacent = [(x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y)]
+                    corners = [(x - 1, y - 1), (x + 1, y - 1), (x - 1, y + 1), (x + 1, y + 1)]
+                    expected = [game_map.get_cell(*xy) for xy in adjacent if game_map.get_cell(*xy) is not None]
+                    assert list(game_map.get_adjacent_cells(cell)) == expected
+                    expected += [game_map.get_cell(*xy) for xy in corners if game_map.get_cell(*xy) is not None]
+                    assert list(game_map.get_adjacent_cells_with_corners(cell)) == expected
+
+            # The neighbour tables are shared by all maps of the same size
+            assert Game(configs).map.adjacency is game_map.adjacency
+            assert game_map.adjacency is get_adjacency_tables(game_map.width, game_map.height)[0]
+        return True
+
+    def test_interned_positions(self):
+        print("Testing interned immutable positions")
+        pos = Position(3, 4)
+        assert Position(3, 4) is pos
+        assert copy.deepcopy(pos) is pos
+        assert pickle.loads(pickle.dumps(pos)) is pos
+        with self.assertRaises(AttributeError):
+            pos.x = 5
+
+        # Positions off the intern range still compare and hash by value
+        far = Position(500, 500)
+        assert Position(500, 500) == far and hash(Position(500, 500)) == hash(far)
+
+        for direction, xy in [(Constants.DIRECTIONS.NORTH, (3, 3)), (Constants.DIRECTIONS.EAST, (4, 4)),
+                              (Constants.DIRECTIONS.SOUTH, (3, 5)), (Constants.DIRECTIONS.WEST, (2, 4)),
+                              (Constants.DIRECTIONS.CENTER, (3, 4))]:
+            assert pos.translate(direction, 1) is Position(*xy)
+            assert pos.translate(direction, 1) is pos.translate(direction, 1)
+        assert pos.translate(Constants.DIRECTIONS.EAST, 2) == Position(5, 4)
+
+        game = Game({"seed": 1})
+        assert game.map.get_cell(0, 0).pos is Position(0, 0)
+        return True
+
+    def test_cell_units_read_only(self):
+        game = Game({"seed": 5, "width": 12, "height": 12})
+        cell = game.map.get_cell(0, 0)
+        assert not cell.has_units()
+        with self.assertRaises(TypeError):
+            cell.units["u_99"] = None
+
+        unit = game.spawn_worker(0, 0, 0)
+        assert dict(cell.units) == {unit.id: unit}
+        with self.assertRaises(TypeError):
+            cell.units["u_99"] = unit
+        with self.assertRaises(TypeError):
+            del cell.units[unit.id]
+        assert list(cell.units) == [unit.id]
+
+        # Adding and removing units is still reflected by the view
+        units = cell.units
+        second = game.spawn_worker(0, 0, 0)
+        assert list(units) == [unit.id, second.id]
+        cell.remove_unit(unit.id)
+        cell.remove_unit(second.id)
+        assert cell.units is NO_UNITS
+        copy.deepcopy(cell)
+        return True
+
+    def test_compact_objects(self):
+        print("Testing the memory used by the objects of a late game")
+        game = Game({"seed": 5, "width": 32, "height": 32})
+        rng = random.Random(0)
+        for row in game.map.map:
+            for cell in row:
+                if cell.has_resource():
+                    continue
+                r = rng.random()
+                if r < 0.25:
+                    game.spawn_city_tile(rng.randint(0, 1), cell.pos.x, cell.pos.y)
+                elif r < 0.45:
+                    game.spawn_worker(rng.randint(0, 1), cell.pos.x, cell.pos.y,
+                                      cargo={"wood": 40, "uranium": 0, "coal": 0})
+        for _ in range(20):
+            game.run_turn_with_actions(random_actions(game, rng))
+
+        cells = [cell for row in game.map.map for cell in row]
+        units = [unit for team in [0, 1] for unit in game.get_teams_units(team).values()]
+        city_tiles = [cell.city_tile for cell in cells if cell.is_city_tile()]
+        assert len(units) > 200 and len(city_tiles) > 200
+        for obj in cells + units + city_tiles + [unit.cargo for unit in units] + \
+                [cell.resource for cell in game.map.resources]:
+            assert not hasattr(obj, "__dict__")
+        assert all(cell.units is NO_UNITS for cell in cells if not cell.has_units())
+        assert all(obj.current_actions is NO_ACTIONS for obj in units + city_tiles)
+        assert units[0].cargo == dict(units[0].cargo.items())
+
+        # Size of everything reachable from the map, units and cities, except the configs
+        seen = {id(game.configs)}
+        stack = [game.map, game.state["teamStates"], game.cities]
+        size = 0
+        while len(stack) > 0:
+            obj = stack.pop()
+            if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType)):
+                continue
+            seen.add(id(obj))
+            size += sys.getsizeof(obj)
+            stack.extend(gc.get_referents(obj))
+        print("%i units and %i city tiles on 32x32 use %i bytes." % (len(units), len(city_tiles), size))
+        assert size < 1000000
+        return True
+
+    def test_cargo_mapping(self):
+        print("Testing that a unit cargo behaves like the cargo dict")
+        game = Game({"seed": 5})
+        unit = list(game.get_teams_units(Constants.TEAM.A).values())[0]
+        unit.cargo = {"wood": 40, "uranium": 2, "coal": 0}
+        cargo = unit.cargo
+        assert cargo == {"wood": 40, "uranium": 2, "coal": 0}
+        assert cargo != {"wood": 40}
+        assert cargo != None and not cargo == 40
+        assert cargo.get("wood") == 40 and cargo.get("sand") is None and "sand" not in cargo
+        assert list(cargo.keys()) == ["wood", "uranium", "coal"]
+        assert list(cargo.values()) == [40, 2, 0]
+
+        cargo.update({"coal": 5}, uranium=0)
+        assert dict(cargo.items()) == {"wood": 40, "uranium": 0, "coal": 5}
+        assert json.loads(json.dumps(dict(cargo))) == {"wood": 40, "uranium": 0, "coal": 5}
+        with pytest.raises(KeyError):
+            cargo["sand"] = 1
+        with pytest.raises(TypeError):
+            del cargo["wood"]
+        assert copy.deepcopy(cargo) == cargo and pickle.loads(pickle.dumps(cargo)) == cargo
+        return True
@@ -0,0 +1,121 @@
+import time
+
+import pytest
+
+from luxai2021.game.actions import MoveAction, ValidatedActions
+from luxai2021.game.constants import Constants
+from luxai2021.game.game import Game
+
+DIRECTIONS = [
+    Constants.DIRECTIONS.NORTH,
+    Constants.DIRECTIONS.EAST,
+    Constants.DIRECTIONS.SOUTH,
+    Constants.DIRECTIONS.WEST,
+    Constants.DIRECTIONS.CENTER,
+]
+
+
+def moves_game(units, city_tiles=()):
+    """
+    Empty 5x5 map with workers at the given (team, x, y), and city tiles at the given (team, x, y).
+    :return: Tuple of the game and the list of workers.
+    """
+    game = Game({"mapType": Constants.MAP_TYPES.EMPTY, "width": 5, "height": 5, "seed": 0})
+    for team, x, y in city_tiles:
+        game.spawn_city_tile(team, x, y)
+    return game, [game.spawn_worker(team, x, y) for team, x, y in units]
+
+
+def test_move_collisions_cases():
+    N, E, S, W = DIRECTIONS[:4]
+    cases = [
+        # Two units moving to the same cell both stay
+        ([(0, 1, 2), (1, 3, 2)], (), [E, W], []),
+        # Units can stack on a city tile
+        ([(0, 1, 2), (0, 3, 2)], [(0, 2, 2)], [E, W], [0, 1]),
+        # Moving to the cell of a unit that stays is bumped
+        ([(0, 1, 2), (1, 2, 2)], (), [E, None], []),
+        # Moving to the cell of a unit that moves away is not
+        ([(0, 1, 2), (1, 2, 2)], (), [E, E], [0, 1]),
+        # Units can swap cells
+        ([(0, 1, 2), (1, 2, 2)], (), [E, W], [0, 1]),
+        # A bumped unit stays, which bumps the unit following it
+        ([(0, 0, 2), (0, 1, 2), (1, 2, 1)], (), [E, E, S], []),
+        # A unit leaving a city tile doesn't bump the units staying on it
+        ([(0, 2, 2), (0, 2, 2), (0, 1, 2)], [(0, 2, 2)], [E, None, E], [0, 2]),
+    ]
+    for units, city_tiles, directions, expected in cases:
+        game, workers = moves_game(units, city_tiles)
+        actions = [MoveAction(worker.team, worker.id, direction)
+                   for worker, direction in zip(workers, directions) if direction is not None]
+        moved = sorted(action.unit_id for action in game.handle_movement_actions(actions))
+        assert moved == sorted(workers[i].id for i in expected), units
+
+
+def test_move_validation_cases():
+    N, E, S, W, C = DIRECTIONS
+    cases = [
+        # Off the map
+        ([(0, 0, 2)], (), [], W, False),
+        # Into an opponent city tile, or our own
+        ([(0, 1, 2)], [(1, 2, 2)], [], E, False),
+        ([(0, 1, 2), (0, 3, 2)], [(0, 2, 2)], [(1, W)], E, True),
+        # Into a cell that another unit of our team moves to, but not an opponent
+        ([(0, 1, 2), (0, 3, 2)], (), [(1, W)], E, False),
+        ([(0, 1, 2), (1, 3, 2)], (), [(1, W)], E, True),
+        # Again to the target of the unit's own validated move
+        ([(0, 1, 2)], (), [(0, E)], E, True),
+        # Into a unit of our team that stays, the collision is resolved when the units move
+        ([(0, 1, 2), (0, 2, 2)], (), [], E, True),
+        # Staying next to a unit of our team, but not next to an opponent or alone
+        ([(0, 1, 2), (0, 2, 2)], (), [], C, False),
+        ([(0, 1, 2), (1, 2, 2)], (), [], C, True),
+        ([(0, 1, 2), (0, 3, 2)], (), [], C, True),
+    ]
+    for units, city_tiles, validated_moves, direction, expected in cases:
+        game, workers = moves_game(units, city_tiles)
+        validated = [MoveAction(workers[i].team, workers[i].id, d) for i, d in validated_moves]
+        action = MoveAction(workers[0].team, workers[0].id, direction)
+        assert action.is_valid(game, ValidatedActions(game, validated)) == expected, (units, direction)
+        assert action.is_valid(game, validated) == expected, (units, direction)
+
+    # Units that can't act
+    game, workers = moves_game([(0, 1, 2)])
+    workers[0].cooldown = 1
+    assert not MoveAction(0, workers[0].id, E).is_valid(game, ValidatedActions(game))
+
+
+def chain_game(size):
+    """
+    Units in a snake through the whole map each move to the cell of the next unit, and an opponent unit stays on
+    the last cell.
+    :return: Tuple of the game, the moves and the opponent unit.
+    """
+    game = Game({"mapType": Constants.MAP_TYPES.EMPTY, "width": size, "height": size, "seed": 0})
+    path = [(x if y % 2 == 0 else size - 1 - x, y) for y in range(size) for x in range(size)]
+    actions = []
+    for (x, y), (next_x, next_y) in zip(path, path[1:]):
+        unit = game.spawn_worker(Constants.TEAM.A, x, y)
+        direction = game.map.get_cell(x, y).pos.direction_to(game.map.get_cell(next_x, next_y).pos)
+        actions.append(MoveAction(Constants.TEAM.A, unit.id, direction))
+    blocker = game.spawn_worker(Constants.TEAM.B, *path[-1])
+    return game, actions, blocker
+
+
+def test_move_collisions_chain():
+    # The whole chain is bumped by the unit that stays
+    game, actions, blocker = chain_game(32)
+    assert game.handle_movement_actions(actions) == []
+
+    # Without the stationary unit at the end, the whole chain moves
+    game.get_teams_units(Constants.TEAM.B).clear()
+    game.map.get_cell(blocker.pos.x, blocker.pos.y).remove_unit(blocker.id)
+    assert game.handle_movement_actions(actions) == actions
+
+
+@pytest.mark.benchmark
+def test_move_collisions_chain_speed():
+    game, actions, _ = chain_game(32)
+    start_time = time.time()
+    game.handle_movement_actions(actions)
+    print("Resolved a chain of %i moves in %.4f seconds." % (len(actions), time.time() - start_time))
@@ -0,0 +1,97 @@
+import json
+import os
+import random
+import time
+
+import pytest
+
+from luxai2021.env.agent import AgentFromReplay
+from luxai2021.env.lux_env import LuxEnvironment
+from luxai2021.game.constants import LuxMatchConfigs_Default
+from luxai2021.game.game import Game
+from luxai2021.game.replay import Replay
+from luxai2021.game.replay_index import IndexedReplay, convert_replay
+
+from .test_array_state import random_actions
+
+REPLAY_DIR = os.path.join(os.path.dirname(__file__), "replays_for_test")
+
+
+def test_convert_kaggle_replay(tmp_path):
+    json_path = os.path.join(REPLAY_DIR, "26688997.json")
+    path = str(tmp_path / "26688997.lri")
+    convert_replay(json_path, path)
+    with open(json_path, "r") as f:
+        json_args = json.load(f)
+
+    with IndexedReplay(path) as replay:
+        assert replay.seed == json_args["configuration"]["seed"]
+        assert len(replay) == len(json_args["steps"])
+        for i, step in enumerate(json_args["steps"]):
+            replay_step = replay.get_step(i)
+            for team in [0, 1]:
+                assert replay_step.commands[team] == [tuple(c.split(" ")) for c in step[team]["action"] or []]
+            assert replay_step.updates == [tuple(u.split(" ")) for u in step[0]["observation"]["updates"]]
+        assert replay.get_updates(10) == replay.get_step(11).updates
+        with pytest.raises(IndexError):
+            replay.get_step(len(replay))
+    assert os.path.getsize(path) < os.path.getsize(json_path)
+
+
+@pytest.mark.parametrize("replay_id", ["27095556", "26688997"])
+def test_run_indexed_replay(tmp_path, replay_id):
+    path = str(tmp_path / ("%s.lri" % replay_id))
+    convert_replay(os.path.join(REPLAY_DIR, "%s.json" % replay_id), path)
+
+    with IndexedReplay(path) as replay:
+        config = LuxMatchConfigs_Default.copy()
+        config["seed"] = replay.seed
+        env = LuxEnvironment(configs=config,
+                             learning_agent=AgentFromReplay(replay=replay),
+                             opponent_agent=AgentFromReplay(replay=replay),
+                             replay_validate=replay)
+        assert not env.run_no_learn()
+
+
+def test_convert_lux_replay(tmp_path):
+    json_path = str(tmp_path / "replay.json")
+    game = Game({"seed": 2})
+    replay = Replay(game, json_path)
+    rng = random.Random(2)
+    commands = []
+    for _ in range(30):
+        actions = random_actions(game, rng)
+        replay.add_actions(game, actions)
+        commands.append([[tuple(a.to_message(game).split(" ")) for a in actions if a.team == team] for team in [0, 1]])
+        game.run_turn_with_actions(actions)
+    replay.write(game)
+
+    path = str(tmp_path / "replay.lri")
+    convert_replay(json_path, path)
+    with IndexedReplay(path) as indexed:
+        assert indexed.seed == 2
+        assert len(indexed) == 31
+        for turn in range(30):
+            for team in [0, 1]:
+                assert indexed.get_commands(turn, team) == commands[turn][team]
+            assert indexed.get_updates(turn) == []
+
+
+@pytest.mark.benchmark
+def test_indexed_replay_seek_speed(tmp_path):
+    json_path = os.path.join(REPLAY_DIR, "26690562.json")
+    path = str(tmp_path / "26690562.lri")
+    convert_replay(json_path, path)
+
+    start_time = time.time()
+    with open(json_path, "r") as f:
+        json.load(f)["steps"][200][0]["observation"]["updates"]
+    json_time = time.time() - start_time
+
+    start_time = time.time()
+    with IndexedReplay(path) as replay:
+        replay.get_updates(199)
+    indexed_time = time.time() - start_time
+
+    print("Turn 200 in %.2fms from the JSON replay, %.2fms from the indexed replay." %
+          (json_time * 1000, indexed_time * 1000))
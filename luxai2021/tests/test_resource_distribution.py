@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from luxai2021.game.constants import Constants
+from luxai2021.game.game import Game
+
+from .test_command_parser import REPLAY_IDS, load_replay, observed_updates, replay_turns
+
+
+def mining_game(seed, n_workers=150):
+    """
+    Game with everything researched and many workers spawned on and next to resources, one per cell.
+    """
+    game = Game({"seed": seed, "width": 32, "height": 32})
+    for team in [Constants.TEAM.A, Constants.TEAM.B]:
+        game.state["teamStates"][team]["researchPoints"] = 200
+        for resource_type in game.state["teamStates"][team]["researched"]:
+            game.state["teamStates"][team]["researched"][resource_type] = True
+    cells = {}
+    for resource_cell in game.map.resources:
+        for cell in (resource_cell,) + game.map.get_adjacent_cells(resource_cell):
+            if not cell.is_city_tile() and not cell.has_units():
+                cells[cell] = None
+    for i, cell in enumerate(list(cells)[:n_workers]):
+        game.spawn_worker(i % 2, cell.pos.x, cell.pos.y)
+    return game
+
+
+@pytest.mark.parametrize("replay_id", REPLAY_IDS)
+def test_resource_distribution_matches_replay(replay_id):
+    # The resources, cargo, city fuel and everything else match the observation of every turn of the replay
+    turns = 0
+    for game, _, updates in replay_turns(load_replay(replay_id)):
+        assert observed_updates(game) == updates, "turn %i" % game.state["turn"]
+        turns += 1
+    assert turns == 360
+
+
+def test_resource_distribution_shares():
+    # Workers on all sides of a wood cell with less wood than they ask for split it equally, the rest is lost
+    game = Game({"mapType": Constants.MAP_TYPES.EMPTY, "width": 5, "height": 5, "seed": 0})
+    game.map.add_resource(2, 2, Constants.RESOURCE_TYPES.WOOD, 50)
+    workers = [game.spawn_worker(i % 2, x, y) for i, (x, y) in enumerate([(1, 2), (3, 2), (2, 1), (2, 3)])]
+    game.distribute_all_resources()
+    assert [worker.cargo.wood for worker in workers] == [12, 12, 12, 12]
+    assert not game.map.get_cell(2, 2).has_resource()
+    assert game.map.resources == []
+    assert [game.stats["teamStats"][team]["resourcesCollected"]["wood"] for team in [0, 1]] == [24, 24]
+
+
+@pytest.mark.benchmark
+def test_resource_distribution_speed():
+    game = mining_game(1)
+    start_time = time.time()
+    for _ in range(50):
+        for team in [Constants.TEAM.A, Constants.TEAM.B]:
+            for unit in game.get_teams_units(team).values():
+                unit.cargo = {"wood": 0, "coal": 0, "uranium": 0}
+        game.distribute_all_resources()
+    print("50 resource distributions of 150 workers: %.4f seconds." % (time.time() - start_time))
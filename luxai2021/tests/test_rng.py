@@ -0,0 +1,30 @@
+import random
+import shutil
+
+import pytest
+from luxai2021.env.rng.rng import get_n_values, get_n_values_js, lux_rng
+
+node_missing = shutil.which("node") is None
+
+# Sequential seeds cover the map seeds used in testing and training, plus a spread of large seeds
+# as they are generated by the kaggle environment.
+SEEDS = list(range(100)) + random.Random(0).sample(range(2 ** 31), 100)
+
+
+@pytest.mark.skipif(node_missing, reason="Node.js is needed to compare against the javascript implementation")
+def test_rng_matches_js():
+    for seed in SEEDS:
+        assert get_n_values(seed, N=2000) == get_n_values_js(seed, N=2000), f"RNG mismatch for seed {seed}"
+
+
+@pytest.mark.skipif(node_missing, reason="Node.js is needed to compare against the javascript implementation")
+def test_rng_matches_js_long_stream():
+    for seed in [0, 123456789, "562124210"]:
+        assert get_n_values(seed, N=200000) == get_n_values_js(seed, N=200000), f"RNG mismatch for seed {seed}"
+
+
+def test_rng_is_lazy_and_deterministic():
+    rng = lux_rng(123456789)
+    values = [rng.random() for _ in range(1000)]
+    assert values == get_n_values(123456789, N=1000)
+    assert all(0 <= v < 1 for v in values)
@@ -0,0 +1,114 @@
+import multiprocessing
+import time
+
+import pytest
+
+from luxai2021.env import rollout
+from luxai2021.env.rollout import RandomPolicy, RolloutEngine, idle_policy
+from luxai2021.game.actions import SpawnCityAction
+from luxai2021.game.constants import Constants
+from luxai2021.game.game import Game
+
+from .test_array_state import play_random_game
+
+
+def city_tile_value(game, team):
+    """
+    Share of the city tiles that the team owns.
+    """
+    counts = [0, 0]
+    for city in game.cities.values():
+        counts[city.team] += len(city.city_cells)
+    return counts[team] / max(sum(counts), 1)
+
+
+def build_game():
+    """
+    Game where a worker of team A can build a city tile this turn.
+    """
+    game = Game({"mapType": Constants.MAP_TYPES.EMPTY, "width": 12, "height": 12, "seed": 0})
+    game.spawn_city_tile(Constants.TEAM.A, 1, 1)
+    game.spawn_city_tile(Constants.TEAM.B, 10, 10)
+    worker = game.spawn_worker(Constants.TEAM.A, 5, 5, cargo={"wood": 100, "uranium": 0, "coal": 0})
+    return game, worker
+
+
+def test_rollouts_are_reproducible():
+    game = play_random_game(3, 40)
+    state = game.to_state_object()
+    snapshot = game.snapshot()
+    engine = RolloutEngine(game.configs, policy=RandomPolicy(), depth=20)
+    values = [engine.rollout(snapshot, Constants.TEAM.A, [], seed) for seed in [1, 2, 1]]
+    assert values[0] == values[2]
+
+    stats = engine.search(game, Constants.TEAM.A, [[], []], max_rollouts=10)
+    assert [s.visits for s in stats] == [5, 5]
+    assert game.to_state_object() == state
+
+
+def test_search_prefers_building():
+    game, worker = build_game()
+    candidates = [[], [SpawnCityAction(Constants.TEAM.A, worker.id)]]
+    engine = RolloutEngine(game.configs, policy=idle_policy, value=city_tile_value, depth=3)
+    stats = engine.search(game, Constants.TEAM.A, candidates, max_rollouts=20)
+    assert stats[1].value > stats[0].value
+    assert engine.best_actions(game, Constants.TEAM.A, candidates, max_rollouts=20) is candidates[1]
+
+
+def test_search_time_budget():
+    game = play_random_game(3, 40)
+    state = game.to_state_object()
+    candidates = [[], []]
+    with RolloutEngine(game.configs, depth=30) as engine:
+        stats = engine.search(game, Constants.TEAM.A, candidates, time_budget=0.2)
+    # The first rollout always runs, however slow the machine is
+    assert sum(s.visits for s in stats) > 0
+    assert [s.actions for s in stats] == candidates
+    assert game.to_state_object() == state
+
+
+@pytest.mark.benchmark
+def test_search_time_budget_speed():
+    game = play_random_game(3, 40)
+    with RolloutEngine(game.configs, depth=30) as engine:
+        start_time = time.time()
+        stats = engine.search(game, Constants.TEAM.A, [[], []], time_budget=0.2)
+        elapsed = time.time() - start_time
+    print("Ran %i rollouts in %.3f seconds, with a budget of 0.2 seconds." % (sum(s.visits for s in stats), elapsed))
+
+
+def test_worker_drops_rollouts_of_earlier_searches():
+    game, _ = build_game()
+    snapshot = game.snapshot()
+    generation = multiprocessing.Value("i", 1)
+    rollout._init_worker(dict(game.configs, headless=True), idle_policy, idle_policy, city_tile_value, 30, generation)
+    try:
+        assert rollout._run_worker_rollout((snapshot, Constants.TEAM.A, [], 0, 0)) is None
+        assert rollout._run_worker_rollout((snapshot, Constants.TEAM.A, [], 0, 1)) is not None
+
+        # A rollout whose search ends while it runs stops before its next turn
+        def ending_search(game, team):
+            generation.value = 2
+            return []
+        rollout._worker_engine.opponent_policy = ending_search
+        assert rollout._run_worker_rollout((snapshot, Constants.TEAM.A, [], 0, 1)) is None
+    finally:
+        rollout._worker_engine = None
+        rollout._worker_generation = None
+
+
+def test_search_process_pool():
+    game, worker = build_game()
+    candidates = [[], [SpawnCityAction(Constants.TEAM.A, worker.id)]]
+    with RolloutEngine(game.configs, policy=idle_policy, value=city_tile_value, depth=3, processes=2) as engine:
+        stats = engine.search(game, Constants.TEAM.A, candidates, max_rollouts=20)
+        assert sum(s.visits for s in stats) == 20
+        assert stats[1].value > stats[0].value
+
+        stats = engine.search(game, Constants.TEAM.A, candidates, time_budget=0.5)
+        assert sum(s.visits for s in stats) > 0
+
+        # Rollouts left in flight by the time budget are not counted by the next search
+        stats = engine.search(game, Constants.TEAM.A, candidates, max_rollouts=10)
+        assert sum(s.visits for s in stats) == 10
+        assert stats[1].value > stats[0].value
@@ -0,0 +1,66 @@
+import copy
+import pickle
+import random
+import time
+
+import pytest
+
+from luxai2021.game.game import Game
+
+from .test_array_state import play_random_game, random_actions
+
+
+def play_states(game, rng, turns):
+    """
+    Plays random turns and returns the state object after each turn.
+    """
+    states = []
+    for _ in range(turns):
+        done = game.run_turn_with_actions(random_actions(game, rng))
+        states.append(game.to_state_object())
+        if done:
+            break
+    return states
+
+
+def test_restore_continues_identically():
+    for seed in [1, 4, 7]:
+        game = play_random_game(seed, 60)
+        snapshot = game.snapshot()
+        state = game.to_state_object()
+        map_string = game.map.get_map_string()
+        expected = play_states(game, random.Random(seed), 60)
+
+        # Restoring rewinds the game, and it plays on the same way
+        game.restore(snapshot)
+        assert game.to_state_object() == state
+        assert game.map.get_map_string() == map_string
+        assert play_states(game, random.Random(seed), 60) == expected
+
+        # A snapshot can be restored any number of times, into any game with the same configs
+        other = Game(game.configs)
+        other.restore(pickle.loads(pickle.dumps(snapshot)))
+        assert other.to_state_object() == state
+        reference = play_random_game(seed, 60)
+        assert other.stats == reference.stats
+        assert [cell.pos for cell in other.map.resources] == [cell.pos for cell in reference.map.resources]
+        assert play_states(other, random.Random(seed), 60) == expected
+
+
+@pytest.mark.benchmark
+def test_restore_speed():
+    game = play_random_game(5, 60)
+    snapshot = game.snapshot()
+
+    # The log sink can't be copied, the copies share it
+    start_time = time.time()
+    for _ in range(20):
+        copy.deepcopy(game, {id(game.log_sink): game.log_sink})
+    deepcopy_time = time.time() - start_time
+
+    start_time = time.time()
+    for _ in range(20):
+        game.restore(snapshot)
+    restore_time = time.time() - start_time
+
+    print("20 restores took %.4f seconds, 20 deep copies %.4f seconds." % (restore_time, deepcopy_time))
@@ -0,0 +1,79 @@
+import random
+
+from luxai2021.game.constants import Constants
+from luxai2021.game.position import Position
+from luxai2021.game.spatial_index import SpatialIndex
+
+from .test_agent import crowded_game
+from .test_array_state import random_actions
+
+OBJECT_TYPES = [
+    (Constants.RESOURCE_TYPES.WOOD, None),
+    (Constants.RESOURCE_TYPES.COAL, None),
+    (Constants.RESOURCE_TYPES.URANIUM, None),
+    (Constants.UNIT_TYPES.WORKER, Constants.TEAM.A),
+    (Constants.UNIT_TYPES.WORKER, Constants.TEAM.B),
+    (Constants.UNIT_TYPES.WORKER, None),
+    (Constants.UNIT_TYPES.CART, None),
+    (SpatialIndex.CITY_TILE, Constants.TEAM.A),
+    (SpatialIndex.CITY_TILE, None),
+]
+
+
+def brute_force_objects(game, object_type, team):
+    """
+    All objects of a type in the order they are added to the spatial index.
+    """
+    if team is None and object_type in [Constants.RESOURCE_TYPES.WOOD, Constants.RESOURCE_TYPES.COAL,
+                                        Constants.RESOURCE_TYPES.URANIUM]:
+        return [cell for cell in game.map.resources if cell.resource.type == object_type]
+
+    teams = [team] if team is not None else [Constants.TEAM.A, Constants.TEAM.B]
+    objects = []
+    if object_type == SpatialIndex.CITY_TILE:
+        objects = [cell.city_tile for city in game.cities.values() if city.team in teams for cell in city.city_cells]
+    else:
+        for t in teams:
+            objects += [unit for unit in game.get_teams_units(t).values() if unit.type == object_type]
+    return objects
+
+
+def test_spatial_index_matches_brute_force():
+    rng = random.Random(0)
+    game = crowded_game()
+    checks = 0
+    while game.state["turn"] < 40:
+        index = game.get_spatial_index()
+        assert game.get_spatial_index() is index
+
+        for object_type, team in OBJECT_TYPES:
+            objects = brute_force_objects(game, object_type, team)
+            assert index.count(object_type, team) == len(objects)
+            for _ in range(10):
+                pos = Position(rng.randrange(game.map.width), rng.randrange(game.map.height))
+                exclude = rng.choice(objects) if len(objects) > 0 and rng.random() < 0.5 else None
+                distances = [(o.pos.distance_to(pos), i, o) for i, o in enumerate(objects) if o is not exclude]
+
+                k = rng.randint(1, 6)
+                expected = [(d, o) for d, _, o in sorted(distances, key=lambda d: (d[0], d[1]))[:k]]
+                assert index.nearest(pos, object_type, team, k=k, exclude=exclude) == expected
+
+                furthest = index.furthest(pos, object_type, team, exclude=exclude)
+                if len(distances) == 0:
+                    assert furthest is None
+                else:
+                    assert furthest[0] == max(d for d, _, _ in distances)
+                    assert furthest[1].pos.distance_to(pos) == furthest[0] and furthest[1] is not exclude
+                checks += 1
+
+        game.run_turn_with_actions(random_actions(game, rng))
+        assert game.spatial_index is None
+
+    assert checks > 0
+
+
+def test_spatial_index_invalidated_on_spawn():
+    game = crowded_game()
+    count = game.get_spatial_index().count(Constants.UNIT_TYPES.CART)
+    game.spawn_cart(Constants.TEAM.A, 0, 0)
+    assert game.get_spatial_index().count(Constants.UNIT_TYPES.CART) == count + 1
@@ -0,0 +1,80 @@
+import copy
+import random
+import time
+
+import pytest
+
+from luxai2021.game.game import Game
+
+from .test_array_state import random_actions
+
+
+def full_state_object(game):
+    """
+    Serializes the game without the cached cells and entities.
+    """
+    game.map._cell_states = None
+    game.entity_states = {}
+    return game.to_state_object()
+
+
+def test_incremental_state_object_matches_full():
+    for seed in [1, 2, 3]:
+        rng = random.Random(seed)
+        game = Game({"seed": seed, "logFile": None})
+        for i in range(20):
+            game.spawn_worker(i % 2, (i * 3) % game.map.width, (i * 7) % game.map.height)
+            game.spawn_cart(i % 2, (i * 5) % game.map.width, (i * 3) % game.map.height)
+
+        states = []
+        version = None
+        grid = None
+        for turn in range(200):
+            done = game.run_turn_with_actions(random_actions(game, rng))
+            state = game.to_state_object()
+            states.append((state, copy.deepcopy(state)))
+
+            # Every turn, including the nights that destroy cities
+            if turn % 10 == 0:
+                reference_game = copy.deepcopy(game)
+                assert state == full_state_object(reference_game)
+
+            # The deltas rebuild the map of every turn
+            if version is None:
+                grid = state["map"]
+            else:
+                _, delta = game.map.to_state_delta(version)
+                grid = [list(row) for row in grid]
+                for x, y, cell in delta:
+                    grid[y][x] = cell
+                assert grid == state["map"]
+            version = game.map.state_version
+            if done:
+                break
+
+        # Shared parts of the state objects of earlier turns are never modified
+        for state, state_copy in states:
+            assert state == state_copy
+
+        game.restore(game.snapshot())
+        assert game.to_state_object() == full_state_object(game)
+
+
+@pytest.mark.benchmark
+def test_incremental_state_object_speed():
+    times = []
+    for incremental in [True, False]:
+        game = Game({"seed": 4, "width": 32, "height": 32})
+        rng = random.Random(4)
+        serialize_time = 0.0
+        for _ in range(80):
+            game.run_turn_with_actions(random_actions(game, rng))
+            start_time = time.time()
+            if incremental:
+                game.to_state_object()
+            else:
+                full_state_object(game)
+            serialize_time += time.time() - start_time
+        times.append(serialize_time)
+
+    print("State objects of 80 turns in %.1fms, %.1fms without the caches." % (times[0] * 1000, times[1] * 1000))
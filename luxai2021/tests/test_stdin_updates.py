@@ -0,0 +1,103 @@
+import builtins
+import time
+
+import pytest
+
+from luxai2021.env.agent import AgentFromStdInOut
+from luxai2021.game.game import Game
+from .test_command_parser import REPLAY_IDS, load_replay, observation_configs, replay_messages
+
+
+def game_state(game):
+    """
+    State of a game, including what to_state_object() leaves out.
+    """
+    positions = lambda cells: [(cell.pos.x, cell.pos.y) for cell in cells]
+    cells = [cell for row in game.map.map for cell in row]
+    return {
+        "state": game.to_state_object(),
+        "units": {team: list(game.get_teams_units(team)) for team in [0, 1]},
+        "unitCells": [sorted(cell.units) for cell in cells],
+        "unitPositions": [(unit.pos.x, unit.pos.y) for team in [0, 1] for unit in game.get_teams_units(team).values()],
+        "actions": [(unit.current_actions, unit.can_act())
+                    for team in [0, 1] for unit in game.get_teams_units(team).values()],
+        "cities": {city_id: positions(city.city_cells) for city_id, city in game.cities.items()},
+        "cityTiles": [cell.city_tile.city_id if cell.city_tile else None for cell in cells],
+        "resources": positions(game.map.resources),
+        "resourcesByType": {t: positions(c) for t, c in game.map.resources_by_type.items()},
+        "roads": sorted(positions(game.cells_with_roads)),
+        "stats": game.stats,
+        "researched": [game.state["teamStates"][team]["researched"] for team in [0, 1]],
+    }
+
+
+@pytest.mark.parametrize("replay_id", REPLAY_IDS)
+def test_apply_updates_matches_reset(replay_id):
+    replay = load_replay(replay_id)
+    _, updates = replay_messages(replay)
+    configs = observation_configs(replay)
+
+    reference = Game(configs)
+    game = Game(configs)
+    reference.reset(updates=updates[0], increment_turn=False)
+    game.reset(updates=updates[0], increment_turn=False)
+    for step_updates in updates[1:]:
+        # Units that acted last turn have actions and overrides left, which the observation clears
+        for unit in game.get_teams_units(0).values():
+            unit.set_can_act_override(False)
+
+        reference.reset(updates=step_updates, increment_turn=True)
+        game.apply_updates(step_updates)
+        assert game_state(game) == game_state(reference)
+        assert game.map.to_state_delta(0)[0] > 0
+
+
+@pytest.mark.parametrize("in_place_updates", [True, False])
+def test_stdin_agent_updates(monkeypatch, in_place_updates):
+    replay = load_replay(REPLAY_IDS[0])
+    _, updates = replay_messages(replay)
+    configs = observation_configs(replay)
+
+    class Controller:
+        def set_opponent_team(self, agent, team):
+            self.opponent_team = team
+
+    agent = AgentFromStdInOut(in_place_updates=in_place_updates)
+    agent.set_controller(Controller())
+    game = Game(configs)
+    reference = Game(configs)
+    for step, step_updates in enumerate(updates[:40]):
+        lines = iter(step_updates)
+        monkeypatch.setattr(builtins, "input", lambda: next(lines))
+        game_map = game.map
+        agent.pre_turn(game, is_first_turn=step == 0)
+        reference.reset(updates=step_updates, increment_turn=step > 0)
+
+        # In place updates keep the map after the first turn, else every turn resets the game
+        assert (game.map is game_map) == (in_place_updates and step > 0)
+        assert game.state["turn"] == step
+        assert game_state(game) == game_state(reference)
+    assert agent.team == 1
+
+
+@pytest.mark.benchmark
+def test_apply_updates_speed():
+    times = {"reset": 0.0, "apply": 0.0}
+    for replay_id in REPLAY_IDS:
+        replay = load_replay(replay_id)
+        _, updates = replay_messages(replay)
+        configs = observation_configs(replay)
+        configs["headless"] = True
+
+        for method in times:
+            game = Game(configs)
+            game.reset(updates=updates[0], increment_turn=False)
+            start_time = time.time()
+            for step_updates in updates[1:]:
+                if method == "reset":
+                    game.reset(updates=step_updates, increment_turn=True)
+                else:
+                    game.apply_updates(step_updates)
+            times[method] += time.time() - start_time
+
+    print("Observation updates, reset: %.3fs, applied in place: %.3fs" % (times["reset"], times["apply"]))
@@ -0,0 +1,74 @@
+import json
+import os
+import random
+
+import pytest
+
+from luxai2021.game.game import Game
+from luxai2021.game.replay import Replay, StreamingReplay, load_replay_stream, write_viewer_json
+
+from .test_array_state import random_actions
+
+
+def play_with_replays(seed, turns, replays):
+    """
+    Plays random turns, recording them to each of the replays, and ends the replays.
+    """
+    rng = random.Random(seed)
+    game = Game({"seed": seed})
+    for replay in replays:
+        replay.clear(game)
+    for _ in range(turns):
+        actions = random_actions(game, rng)
+        for replay in replays:
+            replay.add_actions(game, actions)
+        done = game.run_turn_with_actions(actions)
+        for replay in replays:
+            replay.add_state(game)
+        if done:
+            break
+    for replay in replays:
+        replay.write(game)
+    return game
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_streaming_replay_matches_replay(tmp_path, compression):
+    for stateful in [False, True]:
+        json_path = str(tmp_path / "replay.json")
+        stream_path = str(tmp_path / "replay.jsonl")
+        viewer_path = str(tmp_path / "viewer.json")
+
+        game = Game({"seed": 3})
+        replay = Replay(game, json_path, stateful)
+        streaming_replay = StreamingReplay(game, stream_path, stateful, compression)
+        play_with_replays(3, 60, [replay, streaming_replay])
+
+        # The viewer JSON is byte for byte what the in-memory replay writes
+        write_viewer_json(stream_path, viewer_path)
+        with open(json_path) as f:
+            expected = f.read()
+        with open(viewer_path) as f:
+            assert f.read() == expected
+        assert load_replay_stream(stream_path) == json.loads(expected)
+
+        if stateful:
+            # Only the changed cells of the map are stored after the first turn
+            assert os.path.getsize(stream_path) * 2 < os.path.getsize(json_path)
+
+
+def test_streaming_replay_logging(tmp_path):
+    game = Game({"seed": 5})
+    game.start_replay_logging(stateful=True, replay_folder=str(tmp_path), streaming=True, compression="gzip")
+    assert isinstance(game.replay, StreamingReplay)
+    assert game.replay.file.endswith(".jsonl.gz")
+
+    rng = random.Random(5)
+    for _ in range(10):
+        game.run_turn_with_actions(random_actions(game, rng))
+    # A stream of an unfinished game can be read
+    game.replay.stream.flush()
+    data = load_replay_stream(game.replay.file)
+    assert len(data["allCommands"]) == 10
+    assert data["stateful"][-1]["map"] == json.loads(json.dumps(game.map.to_state_object()))
+    game.stop_replay_logging()
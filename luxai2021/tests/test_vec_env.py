@@ -0,0 +1,114 @@
+import random
+
+import numpy as np
+from gym import spaces
+from luxai2021.env.agent import AgentWithModel
+from luxai2021.env.lux_env import LuxEnvironment
+from luxai2021.env.lux_vec_env import LuxVecEnv
+from luxai2021.game.actions import MoveAction, ResearchAction, SpawnCityAction, SpawnWorkerAction
+from luxai2021.game.constants import Constants
+
+DIRECTIONS = [
+    Constants.DIRECTIONS.NORTH,
+    Constants.DIRECTIONS.EAST,
+    Constants.DIRECTIONS.SOUTH,
+    Constants.DIRECTIONS.WEST,
+]
+
+
+class PositionAgent(AgentWithModel):
+    """
+    Minimal agent that observes the position of the unit or city tile.
+    """
+    def __init__(self, mode="train", model=None, **kwargs):
+        super().__init__(mode, model, **kwargs)
+        self.action_space = spaces.Discrete(5)
+        self.observation_space = spaces.Box(low=0, high=1, shape=(4,), dtype=np.float32)
+
+    def get_observation(self, game, unit, city_tile, team, is_new_turn):
+        pos = unit.pos if unit is not None else city_tile.pos
+        return np.array([pos.x / 32, pos.y / 32, float(city_tile is not None), game.state["turn"] / 360])
+
+    def action_code_to_action(self, action_code, game, unit=None, city_tile=None, team=None):
+        if city_tile is not None:
+            if action_code % 2 == 0:
+                return SpawnWorkerAction(team, None, city_tile.pos.x, city_tile.pos.y)
+            return ResearchAction(team, city_tile.pos.x, city_tile.pos.y, None)
+        if action_code == 4:
+            return SpawnCityAction(team, unit.id)
+        return MoveAction(team, unit.id, DIRECTIONS[action_code])
+
+    def take_action(self, action_code, game, unit=None, city_tile=None, team=None):
+        self.match_controller.take_action(self.action_code_to_action(action_code, game, unit, city_tile, team))
+
+    def get_reward(self, game, is_game_finished, is_new_turn, is_game_error):
+        return len(game.state["teamStates"][self.team]["units"])
+
+
+class PositionModel:
+    """
+    Deterministic stand-in for a trained model.
+    """
+    def predict(self, obs, deterministic=False):
+        obs = np.asarray(obs)
+        codes = (np.round(obs[..., 0] * 32 * 3 + obs[..., 1] * 32 * 7 + obs[..., 3] * 360).astype(int)) % 5
+        return codes, None
+
+
+def test_vec_env_matches_env():
+    seed = 7
+    turns = 60
+    model = PositionModel()
+
+    random.seed(1)
+    env = LuxEnvironment(configs={"seed": seed}, learning_agent=PositionAgent(),
+                         opponent_agent=PositionAgent(mode="inference", model=model))
+    obs = env.reset()
+    while env.game.state["turn"] < turns:
+        action_code, _ = model.predict(obs)
+        obs, _, done, _ = env.step(int(action_code))
+        assert not done
+
+    random.seed(1)
+    vec_env = LuxVecEnv(configs={"seed": seed}, learning_agents=[PositionAgent()],
+                        opponent_agents=[PositionAgent(mode="inference", model=model)])
+    obs, mask = vec_env.reset()
+    while vec_env.games[0].state["turn"] < turns:
+        action_codes, _ = model.predict(obs)
+        obs, mask, _, dones, _ = vec_env.step(action_codes)
+        assert not dones.any()
+
+    assert vec_env.games[0].state["turn"] == env.game.state["turn"]
+    assert vec_env.games[0].to_state_object() == env.game.to_state_object()
+
+
+def test_vec_env_batches_decisions():
+    n_envs = 4
+    model = PositionModel()
+    vec_env = LuxVecEnv(
+        configs=[{"seed": seed} for seed in range(n_envs)],
+        learning_agents=[PositionAgent() for _ in range(n_envs)],
+        opponent_agents=[PositionAgent(mode="inference", model=model) for _ in range(n_envs)],
+    )
+    obs, mask = vec_env.reset()
+    finished = 0
+    for step in range(400):
+        assert obs.shape[:2] == mask.shape and obs.shape[2:] == (4,)
+        for i in range(n_envs):
+            # Every unit and city tile of the learning agent that can act gets a decision
+            team = vec_env.learning_agents[i].team
+            game = vec_env.games[i]
+            can_act = [u for u in game.state["teamStates"][team]["units"].values() if u.can_act()]
+            can_act += [cell for city in game.cities.values() if city.team == team
+                        for cell in city.city_cells if cell.city_tile.can_act()]
+            assert mask[i].sum() == len(can_act) == len(vec_env.get_decisions(i))
+
+        # One predict call for all decisions of all games
+        actions = np.zeros(mask.shape, dtype=int)
+        actions[mask], _ = model.predict(obs[mask])
+        obs, mask, rewards, dones, infos = vec_env.step(actions)
+        finished += dones.sum()
+        if finished >= 2:
+            break
+
+    assert finished >= 2